@@ -2,7 +2,23 @@
 Source code for T9_EC463_03-Miniproject
 """
 
-# Import main functions for easier access
-from .main import midi_to_freq, lux_to_freq, C_MAJOR_MIDI
+from importlib import import_module
 
-__all__ = ['midi_to_freq', 'lux_to_freq', 'C_MAJOR_MIDI']
+# Main functions for easier access. They are imported on first use, so the desktop
+# tools (conductor, dashboard, sim, audio.render, batch) run without the firmware's `machine`.
+_EXPORTS = {
+    'midi_to_freq': '.scale',
+    'lux_to_freq': '.scale',
+    'C_MAJOR_MIDI': '.scale',
+    'midi_to_freq_batch': '.batch',
+    'lux_to_freq_batch': '.batch',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(module, __name__), name)
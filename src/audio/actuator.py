@@ -0,0 +1,58 @@
+# actuator.py
+# The only code that touches a buzzer's PWM registers. It remembers what the
+# peripheral is set to and writes a register only when its value really changes:
+# the scale loop re-requesting the same note costs nothing, and a silent output does
+# not reprogram its frequency at all. Changes can be staged ahead of time and applied
+# together at the moment they are due, frequency first, then duty.
+
+
+class PwmActuator:
+    """Write-coalescing front end for one machine.PWM output."""
+
+    __slots__ = ("pwm", "freq", "duty", "_next_freq", "_next_duty", "writes", "requests")
+
+    def __init__(self, pwm):
+        self.pwm = pwm
+        self.freq = None        # what the registers hold (None: unknown, always write)
+        self.duty = None
+        self._next_freq = None  # staged by stage(), written by apply()
+        self._next_duty = 0
+        self.writes = 0         # register writes actually made
+        self.requests = 0       # apply() calls, written or not
+
+    def stage(self, freq, duty):
+        """Prepare an output state without touching the peripheral."""
+        self._next_freq = freq
+        self._next_duty = duty
+
+    def apply(self):
+        """Write the staged state, skipping registers that already hold it."""
+        self._write(self._next_freq, self._next_duty)
+
+    def play(self, freq, duty):
+        """Write freq / duty now; a staged state is left for its own apply()."""
+        self._write(freq, duty)
+
+    def mute(self):
+        """Silence now; a staged note still sounds when it is applied."""
+        self._write(self.freq, 0)
+
+    def _write(self, freq, duty):
+        self.requests += 1
+        # A silent output keeps its old frequency until it sounds again
+        if duty and freq is not None and freq != self.freq:
+            self.pwm.freq(freq)
+            self.freq = freq
+            self.writes += 1
+        if duty != self.duty:
+            self.pwm.duty_u16(duty)
+            self.duty = duty
+            self.writes += 1
+
+    def invalidate(self):
+        """Forget the register state (e.g. after deinit), so the next apply writes it all."""
+        self.freq = None
+        self.duty = None
+
+    def stats(self):
+        return {"writes": self.writes, "requests": self.requests}
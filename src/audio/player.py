@@ -0,0 +1,134 @@
+# player.py
+# One playback voice for the buzzer. Sequences of (freq, ms) notes run in a single
+# task: every note's start is an absolute deadline measured from the sequence start,
+# so sleep overshoot never accumulates, and cancelling the task silences the buzzer at
+# once. Sequences can be queued (bounded) behind the one playing; a queued sequence
+# starts on the deadline the previous one ended on, so back-to-back sequences stay
+# drift-free too. The buzzer is driven through a PwmActuator: each note is staged before
+# its deadline and applied on it, so register writes are the only work left at the onset.
+
+import asyncio
+
+try:
+    from ..timebase import ticks_ms, ticks_us, ticks_add, ticks_diff, sleep_until
+except ImportError:     # audio/ is a top-level package on the Pico
+    from timebase import (ticks_ms, ticks_us, ticks_add, ticks_diff,  # type: ignore[no-redef]
+                          sleep_until)
+
+DUTY_HALF = 32768           # 50% duty: the standard buzzer volume
+MAX_QUEUE = 8               # sequences waiting behind the one playing
+
+
+class Sequence:
+    """Notes to play, with their gap, duty, optional shared-clock start, and owner tag."""
+
+    __slots__ = ("notes", "gap_ms", "start_at_ms", "duty_u16", "owner")
+
+    def __init__(self, notes, gap_ms=0, start_at_ms=None, duty_u16=DUTY_HALF, owner=None):
+        self.notes = notes
+        self.gap_ms = gap_ms
+        self.start_at_ms = start_at_ms
+        self.duty_u16 = duty_u16
+        self.owner = owner
+
+
+class Player:
+    """Schedules note sequences on a PwmActuator.
+
+    clock_ms converts start_at_ms (shared-clock time) into a local delay; without it,
+    start_at_ms is read as ticks_ms() time. If onset_hist is given, each note's start
+    lateness against its deadline is recorded into it in microseconds.
+    """
+
+    def __init__(self, output, clock_ms=None, max_queue=MAX_QUEUE, onset_hist=None):
+        self.output = output
+        self.clock_ms = clock_ms or ticks_ms
+        self.max_queue = max_queue
+        self.onset_hist = onset_hist
+        self.owner = None           # owner tag of the sequence playing, None when idle
+        self._queue = []
+        self._task = None
+
+    @property
+    def busy(self):
+        return self._task is not None
+
+    def queued(self):
+        return len(self._queue)
+
+    def play(self, notes, gap_ms=0, start_at_ms=None, duty_u16=DUTY_HALF, owner=None):
+        """Play a sequence now, cancelling the current one and anything queued."""
+        self.stop()
+        self._queue.append(Sequence(notes, gap_ms, start_at_ms, duty_u16, owner))
+        self._run()
+
+    def enqueue(self, notes, gap_ms=0, start_at_ms=None, duty_u16=DUTY_HALF, owner=None):
+        """Queue a sequence behind the current one; returns False if the queue is full."""
+        if len(self._queue) >= self.max_queue:
+            return False
+        self._queue.append(Sequence(notes, gap_ms, start_at_ms, duty_u16, owner))
+        if self._task is None:
+            self._run()
+        return True
+
+    def stop(self):
+        """Silence the buzzer now and drop the current and queued sequences."""
+        self._queue = []
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.owner = None
+        self.output.mute()
+
+    def _run(self):
+        # Busy from now on, so nothing else writes the buzzer before the task starts
+        self.owner = self._queue[0].owner
+        self._task = asyncio.create_task(self._play_queue())
+
+    def _start_ticks(self, seq, follow):
+        """Local start deadline: start_at_ms if given, else where the last one ended."""
+        now = ticks_ms()
+        if seq.start_at_ms is not None:
+            return ticks_add(now, max(0, seq.start_at_ms - self.clock_ms()))
+        return now if follow is None else follow
+
+    async def _play_queue(self):
+        task = self._task
+        end = None
+        try:
+            while self._queue:
+                seq = self._queue.pop(0)
+                self.owner = seq.owner
+                end = await self._play_sequence(seq, self._start_ticks(seq, end))
+        finally:
+            # After stop() or a preempting play() the task (and the buzzer) is no
+            # longer ours: stop() has already muted it
+            if self._task is task:
+                self._task = None
+                self.owner = None
+                self.output.mute()
+
+    async def _play_sequence(self, seq, start):
+        """Play one sequence from the local start tick; returns the tick it ended on."""
+        output = self.output
+        gap_ms = seq.gap_ms
+        hist = self.onset_hist
+        # The start tick in microseconds, to time note onsets at full resolution
+        start_us = ticks_add(ticks_us(), ticks_diff(start, ticks_ms()) * 1000)
+        offset = 0
+        for freq, ms in seq.notes:
+            # Stage the note while waiting, so the deadline only costs the register writes
+            output.stage(int(freq), seq.duty_u16 if freq else 0)
+            await sleep_until(ticks_add(start, offset))
+            output.apply()
+            if hist is not None:
+                hist.record(ticks_diff(ticks_us(), ticks_add(start_us, offset * 1000)))
+            offset += ms
+            if gap_ms:
+                await sleep_until(ticks_add(start, offset))
+                output.mute()
+                offset += gap_ms
+        end = ticks_add(start, offset)
+        await sleep_until(end)
+        output.mute()
+        return end
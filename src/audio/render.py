@@ -0,0 +1,179 @@
+"""
+Offline rendering of patterns and songs to WAV, for auditioning without a Pico.
+Notes are synthesised as square waves with the same frequencies and duty cycles the
+synth engine writes to the buzzers. Samples are generated a block at a time
+(vectorised when NumPy is installed) and written straight to disk, so memory use does
+not grow with the length of the render.
+"""
+
+import heapq
+import sys
+import wave
+from array import array
+from typing import Any
+
+np: Any     # the numpy module, or None without it
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+from .synth import MIDI_FREQS, magnitude_to_duty
+
+SAMPLE_RATE = 44100
+BLOCK_SAMPLES = 8192
+VOICE_AMPLITUDE = 0.25      # per voice, so a few overlapping channels do not clip
+
+
+def notes_to_steps(notes, gap_ms=0, channel=0, duty=0.5):
+    """(freq, ms) notes, played back to back like the device does, as render steps.
+
+    Steps are (time_ms, channel, freq, duty) with duty as a fraction; duty 0 is silence.
+    """
+    t = 0
+    for freq, ms in notes:
+        yield t, channel, freq, duty if freq else 0.0
+        t += ms
+        if gap_ms:
+            yield t, channel, 0, 0.0
+            t += gap_ms
+    yield t, channel, 0, 0.0
+
+
+def _last_by_channel(events):
+    last = {}
+    for e in events:
+        last[e.channel] = e.timestamp_ms
+    return last
+
+
+def events_to_steps(events, last, last_ms=400):
+    """NoteEvents (in timestamp order) as render steps, with the synth engine's timing.
+
+    last maps each channel to its final event's timestamp (see _last_by_channel), so a
+    stream of events can be converted without holding it in memory.
+    """
+    offs = []       # heap of (time_ms, channel) for each channel's final note-off
+    for e in events:
+        while offs and offs[0][0] < e.timestamp_ms:
+            t, channel = heapq.heappop(offs)
+            yield t, channel, 0, 0.0
+        duty = magnitude_to_duty(e.magnitude) / 65536
+        freq = MIDI_FREQS[max(0, min(127, e.pitch))] if duty else 0
+        yield e.timestamp_ms, e.channel, freq, duty
+        if e.timestamp_ms == last.get(e.channel):
+            heapq.heappush(offs, (e.timestamp_ms + last_ms, e.channel))
+    while offs:
+        t, channel = heapq.heappop(offs)
+        yield t, channel, 0, 0.0
+
+
+class _WavWriter:
+    """Mixes the sounding voices block by block into a mono 16-bit WAV file."""
+
+    def __init__(self, path, sample_rate, block):
+        self.wav = wave.open(path, "wb")
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(sample_rate)
+        self.sample_rate = sample_rate
+        self.block = block
+        self.buf = np.zeros(block) if np is not None else [0.0] * block
+        self.fill = 0
+        self.cursor = 0         # samples rendered so far
+        self.voices = {}        # channel -> (freq, duty, first sample of the note)
+
+    def set_voice(self, channel, freq, duty):
+        if freq and duty:
+            self.voices[channel] = (freq, duty, self.cursor)
+        else:
+            self.voices.pop(channel, None)
+
+    def advance_to(self, sample):
+        """Render the sounding voices up to (not including) the given sample."""
+        while self.cursor < sample:
+            n = min(sample - self.cursor, self.block - self.fill)
+            self._render(self.fill, n)
+            self.fill += n
+            self.cursor += n
+            if self.fill == self.block:
+                self._flush()
+
+    def _render(self, pos, n):
+        buf = self.buf
+        if np is not None:
+            out = buf[pos:pos + n]
+            out[:] = 0.0
+            for freq, duty, first in self.voices.values():
+                k = np.arange(self.cursor - first, self.cursor - first + n, dtype=np.float64)
+                phase = (k * (freq / self.sample_rate)) % 1.0
+                out += np.where(phase < duty, VOICE_AMPLITUDE, -VOICE_AMPLITUDE)
+            return
+        for i in range(pos, pos + n):
+            buf[i] = 0.0
+        for freq, duty, first in self.voices.values():
+            step = freq / self.sample_rate
+            k = self.cursor - first
+            for i in range(pos, pos + n):
+                buf[i] += VOICE_AMPLITUDE if (k * step) % 1.0 < duty else -VOICE_AMPLITUDE
+                k += 1
+
+    def _flush(self):
+        if not self.fill:
+            return
+        if np is not None:
+            pcm = (np.clip(self.buf[:self.fill], -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        else:
+            pcm = array("h", (int(max(-1.0, min(1.0, x)) * 32767)
+                              for x in self.buf[:self.fill]))
+            if sys.byteorder == "big":
+                pcm.byteswap()
+        self.wav.writeframes(pcm)
+        self.fill = 0
+
+    def close(self):
+        self._flush()
+        self.wav.close()
+
+
+def render_steps(steps, path, sample_rate=SAMPLE_RATE, block=None):
+    """Render time-ordered (time_ms, channel, freq, duty) steps to a WAV file.
+
+    Samples are written block (default BLOCK_SAMPLES) at a time. Returns the number of
+    samples written.
+    """
+    writer = _WavWriter(path, sample_rate, block or BLOCK_SAMPLES)
+    try:
+        for t, channel, freq, duty in steps:
+            writer.advance_to(t * sample_rate // 1000)
+            writer.set_voice(channel, freq, duty)
+    finally:
+        writer.close()
+    return writer.cursor
+
+
+def render_notes(notes, path, gap_ms=0, sample_rate=SAMPLE_RATE):
+    """Render (freq, ms) notes (e.g. conductor.SONG) to a WAV file."""
+    return render_steps(notes_to_steps(notes, gap_ms), path, sample_rate)
+
+
+def render_events(events, path, last_ms=400, sample_rate=SAMPLE_RATE):
+    """Render a list of NoteEvents, mixing their channels, to a WAV file."""
+    return render_steps(events_to_steps(events, _last_by_channel(events), last_ms),
+                        path, sample_rate)
+
+
+def render_pattern(store, name, path, last_ms=400, sample_rate=SAMPLE_RATE):
+    """Render a PatternStore pattern to a WAV file, streaming its events from storage."""
+    last = _last_by_channel(store.iter_events(name))
+    return render_steps(events_to_steps(store.iter_events(name), last, last_ms),
+                        path, sample_rate)
+
+
+# Render the conductor's song: python -m src.audio.render song.wav
+if __name__ == "__main__":
+    from ..conductor import SONG, SONG_GAP_MS
+
+    out = sys.argv[1] if len(sys.argv) > 1 else "song.wav"
+    samples = render_notes(SONG, out, SONG_GAP_MS)
+    print(f"Wrote {samples / SAMPLE_RATE:.1f}s of audio to {out}")
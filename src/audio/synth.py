@@ -1,131 +1,171 @@
-# main.py for Raspberry Pi Pico W
-# Title: Pico Light Orchestra Instrument Code
-     
-import machine
-import time
-import json
-import asyncio
-import math
-
-# --- Pin Configuration ---
-photo_sensor_pin = machine.ADC(28)                  # photosensor on GP28 (ADC2)
-buzzer_pin = machine.PWM(machine.Pin(16))           # buzzer on GP16 (PWM)
-
-def stop_tone():
-    buzzer_pin.duty_u16(0)
-    buzzer_pin.deinit()
-
-# --- Wii-on-bright (PEAK TRIGGER: one-shot, for INVERTED sensor) ---
-# Bright = LOW ADC. Trigger once when we ENTER the lowest bin near your bright minimum.
-LOW_PEAK_ADC = 2000        # your "brightest" typical reading (tune this)
-PEAK_MARGIN  = 200         # accept <= (LOW_PEAK_ADC + margin) as "brightest"
-REARM_ABOVE  = 6000        # must rise above this (dimmer) to re-arm
-
-BPM = 112
-BEAT_SEC = 60.0 / BPM
-
-# Wii melody (MIDI, beats)
-WII_MELODY = [
-    (74,0.5),(78,0.5),(85,0.5),(78,0.5),(78,0.5),
-    (74,0.5),(74,0.5),(74,0.5),(73,0.5),(74,0.5),
-    (78,0.5),(81,0.5),(85,0.5),(81,0.5),(78,0.5),
-    (88,0.5),(87,0.5),(86,0.5),
-]
-
-# one-shot control
-_wii_playing = False
-_wii_armed   = True
-_wii_task    = None
-_was_lowbin  = False   # edge detector for the LOW (bright) bin
-
-C_MAJOR_MIDI = [
-    48, 50, 52, 53, 55, 57, 59,
-    60, 62, 64, 65, 67, 69, 71,
-    72, 74, 76, 77, 79, 81, 83,
-    84
-]
-
-def midi_to_freq(midi_note):
-    return 440 * (2 ** ((midi_note - 69) / 12))
-
-def lux_to_freq(x, theMin, theMax, use_log=True):
-    if use_log:
-        log_min = math.log(theMin)
-        log_max = math.log(theMax)
-        t = (math.log(x) - log_min) / (log_max - log_min)
-    else:
-        t = (x - theMin) / (theMax - theMin)
-    t = 1 - t
-    t = max(0, min(1, t))
-    idx = int(round(t * (len(C_MAJOR_MIDI) - 1)))
-    midi_note = C_MAJOR_MIDI[idx]
-    return midi_to_freq(midi_note)
-
-# --- One-shot Wii melody task ---
-async def play_wii_melody_once():
-    global _wii_playing
-    _wii_playing = True
-    for midi, beats in WII_MELODY:
-        dur = max(1, beats) * BEAT_SEC
-        if midi is None:
-            buzzer_pin.duty_u16(0)
-        else:
-            buzzer_pin.freq(int(midi_to_freq(midi)))
-            buzzer_pin.duty_u16(32768)  # 50% duty
-        await asyncio.sleep(dur)
-    buzzer_pin.duty_u16(0)
-    _wii_playing = False
-
-async def main():
-    global _wii_playing, _wii_armed, _wii_task, _was_lowbin
-
-    # scale mapping range (tune if needed)
-    min_light = 2000
-    max_light = 40000
-
-    while True:
+# synth.py
+# Multi-voice synth engine for the Pico buzzers.
+# Patterns are compiled once into flat, time-sorted step arrays holding the integer
+# frequency and duty_u16 each channel switches to, so playback only sleeps to the next
+# deadline and writes registers: no per-note float math. Channels map onto the PWM
+# outputs round-robin (channel % outputs); when several channels sound on one output
+# they are time-multiplexed, switching every mux_ms. Each output is wrapped in a
+# PwmActuator, so a step that leaves an output's registers as they are writes nothing.
+
+from array import array
+
+try:
+    from .actuator import PwmActuator
+except ImportError:     # run as a script, copied to the Pico next to actuator.py
+    from actuator import PwmActuator  # type: ignore[no-redef]
+try:
+    from ..timebase import ticks_ms, ticks_add, sleep_until
+except ImportError:     # audio/ is a top-level package on the Pico
+    from timebase import ticks_ms, ticks_add, sleep_until  # type: ignore[no-redef]
+
+DUTY_MAX = 32768            # magnitude 1.0 -> 50% duty, the loudest square on a piezo
+MUX_MS = 10                 # time slice per voice when channels share an output
+
+# Integer frequency for every MIDI note, built once
+MIDI_FREQS = [round(440 * (2 ** ((m - 69) / 12))) for m in range(128)]
+
+
+def magnitude_to_duty(magnitude, duty_max=DUTY_MAX):
+    """Note magnitude (0.0-1.0) to duty_u16; 0 (or less) is silence."""
+    return int(max(0.0, min(1.0, magnitude)) * duty_max)
+
+
+class CompiledPattern:
+    """Time-sorted steps: at times[i] ms, channels[i] switches to freqs[i] / duties[i]."""
+
+    __slots__ = ("times", "channels", "freqs", "duties", "duration_ms")
+
+    def __init__(self):
+        self.times = array("I")
+        self.channels = array("B")
+        self.freqs = array("H")
+        self.duties = array("H")
+        self.duration_ms = 0
+
+    def __len__(self):
+        return len(self.times)
+
+
+def compile_pattern(events, last_ms=400, duty_max=DUTY_MAX):
+    """Compile NoteEvents (in timestamp order) into a CompiledPattern.
+
+    Each note lasts until the next event on its channel; a channel's final note lasts
+    last_ms. Events with zero magnitude are rests.
+    """
+    steps = []
+    last = {}       # channel -> timestamp of its latest event
+    for e in events:
+        pitch = max(0, min(127, e.pitch))
+        duty = magnitude_to_duty(e.magnitude, duty_max)
+        steps.append((e.timestamp_ms, e.channel, MIDI_FREQS[pitch] if duty else 0, duty))
+        last[e.channel] = e.timestamp_ms
+    for channel, t in last.items():
+        steps.append((t + last_ms, channel, 0, 0))
+    steps.sort(key=lambda s: s[0])
+
+    pattern = CompiledPattern()
+    for t, channel, freq, duty in steps:
+        pattern.times.append(t)
+        pattern.channels.append(channel)
+        pattern.freqs.append(freq)
+        pattern.duties.append(duty)
+    if steps:
+        pattern.duration_ms = steps[-1][0]
+    return pattern
+
+
+class Synth:
+    """Plays compiled patterns on one or more PWM outputs."""
+
+    def __init__(self, pwms, mux_ms=MUX_MS):
+        self.outputs = [PwmActuator(pwm) for pwm in pwms]
+        self.mux_ms = mux_ms
+        # Per output: channel -> (freq, duty) of the voices sounding on it
+        self._voices = [{} for _ in self.outputs]
+        self._turn = [0] * len(self.outputs)
+
+    def output_for(self, channel):
+        return channel % len(self.outputs)
+
+    def _refresh(self, out):
+        """Write the voice whose turn it is on output out (or silence)."""
+        voices = self._voices[out]
+        output = self.outputs[out]
+        if not voices:
+            output.mute()
+            return
+        freq, duty = list(voices.values())[self._turn[out] % len(voices)]
+        output.play(freq, duty)
+
+    def _multiplexing(self):
+        return any(len(v) > 1 for v in self._voices)
+
+    def silence(self):
+        for voices in self._voices:
+            voices.clear()
+        for output in self.outputs:
+            output.mute()
+
+    async def play(self, pattern, start=None):
+        """Play a CompiledPattern from the local ticks_ms() start (default: now)."""
+        if start is None:
+            start = ticks_ms()
+        times, channels = pattern.times, pattern.channels
+        freqs, duties = pattern.freqs, pattern.duties
+        mux_at = None
+        i = 0
+        n = len(times)
         try:
-            adc = photo_sensor_pin.read_u16()
-
-            # --- LOW bin (bright) detection with rising-edge logic ---
-            is_lowbin = (adc <= (LOW_PEAK_ADC + PEAK_MARGIN))
-
-            # Trigger ONCE when we ENTER the low bin (i.e., go bright enough)
-            if _wii_armed and not _wii_playing and (not _was_lowbin) and is_lowbin:
-                _wii_armed = False
-                _wii_playing = True
-                buzzer_pin.duty_u16(0)      # mute scale immediately
-                print(f"[Wii] Peak BRIGHT trigger at ADC={adc} (≤ {LOW_PEAK_ADC + PEAK_MARGIN})")
-                _wii_task = asyncio.create_task(play_wii_melody_once())
-
-            # Re-arm ONLY after we get clearly dimmer again
-            if (not _wii_armed) and (not _wii_playing) and adc >= REARM_ABOVE:
-                _wii_armed = True
-                print(f"[Wii] Re-armed (ADC={adc} ≥ {REARM_ABOVE})")
-
-            # update edge detector
-            _was_lowbin = is_lowbin
-
-            # While melody plays, DO NOT play the C-major scale
-            if not _wii_playing:
-                frequency = lux_to_freq(adc, min_light, max_light)
-                buzzer_pin.freq(int(frequency))
-                buzzer_pin.duty_u16(32768)
-
-            await asyncio.sleep(0.05)
-
-        except KeyboardInterrupt:
-            print("Stopping main loop...")
-            stop_tone()
-            break
-
-# Run the main event loop
+            while i < n:
+                t = times[i]
+                # Rotate shared outputs on their own deadlines until the next step
+                while mux_at is not None and mux_at < t:
+                    await sleep_until(ticks_add(start, mux_at))
+                    for out, voices in enumerate(self._voices):
+                        if len(voices) > 1:
+                            self._turn[out] += 1
+                            self._refresh(out)
+                    mux_at += self.mux_ms
+                await sleep_until(ticks_add(start, t))
+                changed = 0
+                while i < n and times[i] == t:
+                    out = self.output_for(channels[i])
+                    if duties[i]:
+                        self._voices[out][channels[i]] = (freqs[i], duties[i])
+                    else:
+                        self._voices[out].pop(channels[i], None)
+                    changed |= 1 << out
+                    i += 1
+                for out in range(len(self.outputs)):
+                    if changed >> out & 1:
+                        self._refresh(out)
+                if self._multiplexing():
+                    if mux_at is None:
+                        mux_at = t + self.mux_ms
+                else:
+                    mux_at = None
+        finally:
+            self.silence()
+
+    async def play_pattern(self, store, name, last_ms=400, start=None):
+        """Compile and play a PatternStore pattern."""
+        await self.play(compile_pattern(store.load(name)[1], last_ms), start)
+
+
+# Play a saved pattern on two buzzers (GP16, GP17)
 if __name__ == "__main__":
-    print("Hello World!")
+    import asyncio
+    import sys
+    import machine
     try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        print("Program stopped.")
-        stop_tone()
-
+        from storage.pattern_store import PatternStore
+    except ImportError:
+        from src.storage.pattern_store import PatternStore
 
+    name = sys.argv[1] if len(sys.argv) > 1 else "demo"
+    outputs = [machine.PWM(machine.Pin(16)), machine.PWM(machine.Pin(17))]
+    synth = Synth(outputs)
+    try:
+        asyncio.run(synth.play_pattern(PatternStore("/patterns"), name))
+    except KeyboardInterrupt:
+        synth.silence()
@@ -0,0 +1,71 @@
+"""
+Batch versions of lux_to_freq / midi_to_freq for analysing recorded ADC traces
+on the desktop. NumPy arrays are processed vectorised when NumPy is installed;
+lists and array.array inputs work without it.
+"""
+
+from array import array
+from bisect import bisect_right
+from typing import Any
+
+np: Any     # the numpy module, or None without it
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+from .scale import ADC_MAX, C_MAJOR_MIDI, build_lux_steps, lux_to_index, midi_to_freq
+
+# midi_to_freq() for every MIDI note, so batches are table lookups of the exact same values
+_MIDI_FREQS = [midi_to_freq(m) for m in range(128)]
+
+
+def _in_table(x):
+    """True for readings the step table covers: whole numbers 0..ADC_MAX."""
+    if isinstance(x, float):
+        return x.is_integer() and 0 <= x <= ADC_MAX
+    return isinstance(x, int) and 0 <= x <= ADC_MAX
+
+
+def midi_to_freq_batch(midi_notes):
+    """midi_to_freq() over many notes. Returns an ndarray for ndarray input, else array('d')."""
+    if np is not None and isinstance(midi_notes, np.ndarray):
+        notes = midi_notes.astype(np.int64)
+        if notes.size and (notes.min() < 0 or notes.max() > 127 or (notes != midi_notes).any()):
+            return np.array([midi_to_freq(m) for m in midi_notes.tolist()], dtype=np.float64)
+        return np.asarray(_MIDI_FREQS, dtype=np.float64)[notes]
+    return array("d", (
+        _MIDI_FREQS[m] if isinstance(m, int) and 0 <= m < 128 else midi_to_freq(m)
+        for m in midi_notes
+    ))
+
+
+def lux_to_freq_batch(readings, theMin, theMax, use_log=True):
+    """lux_to_freq() over many readings.
+
+    Returns (freqs, midi_notes): ndarrays for ndarray input, else array('d') and
+    array('B'). Whole-number readings 0..ADC_MAX go through the precomputed step table;
+    anything else falls back to the scalar mapping, so results always match lux_to_freq()
+    (except that a reading of 0 maps like 1 instead of failing on log(0)).
+    """
+    starts, idxs = build_lux_steps(theMin, theMax, use_log)
+    step_midi = [C_MAJOR_MIDI[i] for i in idxs]
+
+    if np is not None and isinstance(readings, np.ndarray):
+        values = readings.astype(np.float64)
+        in_table = (np.floor(values) == values) & (values >= 0) & (values <= ADC_MAX)
+        steps = np.searchsorted(np.asarray(starts, dtype=np.float64), values, side="right") - 1
+        midi = np.asarray(step_midi, dtype=np.int64)[np.clip(steps, 0, None)]
+        if not in_table.all():
+            odd = np.flatnonzero(~in_table)
+            midi[odd] = [C_MAJOR_MIDI[lux_to_index(x, theMin, theMax, use_log)]
+                         for x in values[odd].tolist()]
+        return np.asarray(_MIDI_FREQS, dtype=np.float64)[midi], midi
+
+    midi = array("B")
+    for x in readings:
+        if _in_table(x):
+            midi.append(step_midi[max(0, bisect_right(starts, x) - 1)])
+        else:
+            midi.append(C_MAJOR_MIDI[lux_to_index(x, theMin, theMax, use_log)])
+    return array("d", (_MIDI_FREQS[m] for m in midi)), midi
@@ -4,6 +4,14 @@
 
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .net.udp_notes import NoteSender, MULTICAST_GROUP, NOTE_PORT
+    from .storage.note_event import events_to_notes
+except ImportError:     # run as a script from src/
+    from net.udp_notes import NoteSender, MULTICAST_GROUP, NOTE_PORT  # type: ignore[no-redef]
+    from storage.note_event import events_to_notes  # type: ignore[no-redef]
 
 # --- Configuration ---
 # Students should populate this list with the IP address(es of their Picos
@@ -11,6 +19,15 @@ PICO_IPS = [
     "192.168.1.101",
 ]
 
+# "live" sends one /tone per note; "scheduled" uploads the whole song once with
+# /melody and lets each device play it against the shared clock; "udp" sends each note
+# once as a datagram to every device, timed on the shared clock.
+PLAYBACK_MODE = "live"
+SCHEDULE_LEAD_MS = 500     # how far ahead of "now" a scheduled song starts
+SONG_GAP_MS = 40           # silence between notes (~10% of a 400ms note)
+NOTE_GROUP = MULTICAST_GROUP   # or the subnet broadcast address, e.g. "192.168.1.255"
+UDP_LEAD_MS = 50           # how far ahead of "now" a UDP note is timed to start
+
 # --- Music Definition ---
 # Notes mapped to frequencies (in Hz)
 C4 = 262
@@ -41,26 +58,263 @@ SONG = [
     (C4, 800),
 ]
 
+# --- Network Fan-out ---
+# Notes are sent to every device at once from a thread pool. All workers share one
+# keep-alive session so each Pico keeps an open connection between notes instead of
+# paying a TCP handshake per note.
+FANOUT_WORKERS = 64
+TIMED_OUT = float("inf")   # latency of a request sent but not answered within the timeout
+
+_session = None
+_executor = None
+
+
+def _get_session():
+    """Returns the shared HTTP session, sized so every device keeps a pooled connection."""
+    global _session
+    if _session is None:
+        pool_size = max(len(PICO_IPS), FANOUT_WORKERS)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=2)
+        _session = requests.Session()
+        _session.mount("http://", adapter)
+    return _session
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS)
+    return _executor
+
+
+def _timed_post(ip, path, payload, timeout, t_start):
+    """POSTs to one device and returns the seconds from fan-out start until it replied.
+
+    Returns TIMED_OUT if the request went out but the reply did not come back within
+    timeout, and None if the request never reached the device.
+    """
+    url = f"http://{ip}{path}"
+    try:
+        _get_session().post(url, json=payload, timeout=timeout)
+    except requests.exceptions.ConnectTimeout as e:
+        print(f"Error contacting {ip}: {e}")
+        return None
+    except requests.exceptions.Timeout:
+        # The request went out, we just don't wait for the reply
+        return TIMED_OUT
+    except requests.exceptions.RequestException as e:
+        print(f"Error contacting {ip}: {e}")
+        return None
+    return time.perf_counter() - t_start
+
+
+def fan_out(path, payload, ips=None, timeout=0.1, parallel=True):
+    """Sends the same POST to every device.
+
+    Returns a dict mapping each IP to its completion latency in seconds: the time from
+    fan-out start until the device replied (TIMED_OUT if it did not reply in time, None
+    if the request failed).
+    """
+    if ips is None:
+        ips = PICO_IPS
+    t_start = time.perf_counter()
+    if not parallel:
+        return {ip: _timed_post(ip, path, payload, timeout, t_start) for ip in ips}
+
+    executor = _get_executor()
+    futures = [
+        executor.submit(_timed_post, ip, path, payload, timeout, t_start) for ip in ips
+    ]
+    return {ip: f.result() for ip, f in zip(ips, futures)}
+
+
+def latency_spread_ms(latencies):
+    """Returns the gap in ms between the first and last device to answer a request.
+
+    Failed and timed-out requests are left out: their latency says nothing about when
+    the device got the request.
+    """
+    answered = [t for t in latencies.values() if t is not None and t != TIMED_OUT]
+    if not answered:
+        return 0.0
+    return (max(answered) - min(answered)) * 1000
+
+
+# --- Clock Sync ---
+# NTP-style exchange: the conductor stamps t0/t3 around a GET /time, the device replies
+# with its own receive/transmit stamps t1/t2. Only the lowest-RTT samples are trusted,
+# since queueing delay is what makes the path asymmetric.
+CLOCK_SYNC_SAMPLES = 16
+
+
+class ClockEstimator:
+    """Estimates one device's clock offset (conductor minus device) and drift."""
+
+    def __init__(self, keep_fraction=0.25, max_samples=64):
+        self.keep_fraction = keep_fraction
+        self.max_samples = max_samples
+        self.samples = []   # (t0, t1, t2, t3)
+
+    def add_sample(self, t0, t1, t2, t3):
+        self.samples.append((t0, t1, t2, t3))
+        if len(self.samples) > self.max_samples:
+            self.samples.pop(0)
+
+    @staticmethod
+    def _rtt(sample):
+        t0, t1, t2, t3 = sample
+        return (t3 - t0) - (t2 - t1)
+
+    @staticmethod
+    def _offset(sample):
+        t0, t1, t2, t3 = sample
+        return ((t0 + t3) - (t1 + t2)) / 2
+
+    def best_samples(self):
+        """The lowest-RTT samples, in the order they were taken."""
+        keep = max(1, int(len(self.samples) * self.keep_fraction))
+        best = sorted(self.samples, key=self._rtt)[:keep]
+        return sorted(best, key=lambda sample: sample[0])
+
+    def min_rtt_ms(self):
+        return min(self._rtt(s) for s in self.samples)
+
+    def drift_ppm(self):
+        """Least-squares slope of offset over conductor time, in parts per million.
+
+        Returns 0.0 until the best samples span at least a second.
+        """
+        best = self.best_samples()
+        if len(best) < 2 or best[-1][0] - best[0][0] < 1000:
+            return 0.0
+        ts = [s[0] for s in best]
+        offsets = [self._offset(s) for s in best]
+        t_mean = sum(ts) / len(ts)
+        o_mean = sum(offsets) / len(offsets)
+        num = sum((t - t_mean) * (o - o_mean) for t, o in zip(ts, offsets))
+        den = sum((t - t_mean) ** 2 for t in ts)
+        return num / den * 1e6
+
+    def offset_ms(self):
+        """Offset at the time of the latest sample, corrected for drift."""
+        best = self.best_samples()
+        mean_t = sum(s[0] for s in best) / len(best)
+        mean_offset = sum(self._offset(s) for s in best) / len(best)
+        return mean_offset + self.drift_ppm() * (self.samples[-1][0] - mean_t) / 1e6
+
+
+def sync_clock(ip, estimator=None, samples=CLOCK_SYNC_SAMPLES, timeout=0.5):
+    """Runs the clock-sync exchange with one device and pushes the result to it.
+
+    Pass the same estimator on every call to refine the drift estimate over time.
+    """
+    if estimator is None:
+        estimator = ClockEstimator()
+    session = _get_session()
+    for _ in range(samples):
+        try:
+            t0 = time.time() * 1000
+            res = session.get(f"http://{ip}/time", timeout=timeout)
+            t3 = time.time() * 1000
+            res.raise_for_status()
+            reply = res.json()
+            t1, t2 = reply["t1"], reply["t2"]
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            # A bad reply costs one sample, not the whole sync
+            print(f"Clock sync with {ip} failed: {e!r}")
+            continue
+        estimator.add_sample(t0, t1, t2, t3)
+
+    if estimator.samples:
+        payload = {"offset_ms": round(estimator.offset_ms()),
+                   "drift_ppm": estimator.drift_ppm()}
+        try:
+            session.post(f"http://{ip}/clock", json=payload, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Could not set clock on {ip}: {e}")
+    return estimator
+
+
+def sync_all_clocks(ips=None, estimators=None, samples=CLOCK_SYNC_SAMPLES):
+    """Syncs every device in parallel. Returns a dict of IP to ClockEstimator."""
+    if ips is None:
+        ips = PICO_IPS
+    if estimators is None:
+        estimators = {}
+    executor = _get_executor()
+    futures = {ip: executor.submit(sync_clock, ip, estimators.get(ip), samples) for ip in ips}
+    for ip, f in futures.items():
+        estimators[ip] = f.result()
+    return estimators
+
+
 # --- Conductor Logic ---
 
 
-def play_note_on_all_picos(freq, ms):
-    """Sends a /tone POST request to every Pico in the list."""
+def play_note_on_all_picos(freq, ms, parallel=True):
+    """Sends a /tone POST request to every Pico in the list.
+
+    Returns the per-device completion latencies from fan_out().
+    """
     print(f"Playing note: {freq}Hz for {ms}ms on all devices.")
 
     payload = {"freq": freq, "ms": ms, "duty": 0.5}
 
-    for ip in PICO_IPS:
-        url = f"http://{ip}/tone"
-        try:
-            # We use a short timeout because we don't need to wait for a response
-            # This makes the orchestra play more in sync.
-            requests.post(url, json=payload, timeout=0.1)
-        except requests.exceptions.Timeout:
-            # This is expected, we can ignore it
-            pass
-        except requests.exceptions.RequestException as e:
-            print(f"Error contacting {ip}: {e}")
+    # We use a short timeout because we don't need to wait for a response
+    # This makes the orchestra play more in sync.
+    return fan_out("/tone", payload, timeout=0.1, parallel=parallel)
+
+
+_note_sender = None
+
+
+def _get_note_sender():
+    global _note_sender
+    if _note_sender is None:
+        _note_sender = NoteSender(NOTE_GROUP, NOTE_PORT)
+    return _note_sender
+
+
+def play_note_udp(freq, ms, lead_ms=UDP_LEAD_MS):
+    """Sends one note to every Pico in a single datagram, whatever the fleet size.
+
+    The note is timed lead_ms ahead on the shared clock, so every device starts it
+    together (lead_ms=None plays it on arrival). Returns (seq, start_at_ms).
+    """
+    start_at_ms = None if lead_ms is None else int(time.time() * 1000) + lead_ms
+    seq = _get_note_sender().note(freq, ms, start_at_ms)
+    return seq, start_at_ms
+
+
+def stop_all_udp():
+    """Silences every Pico listening for UDP notes."""
+    return _get_note_sender().stop()
+
+
+def song_to_notes(song):
+    """Converts a (freq, ms) song into the /melody notes list."""
+    return [{"freq": freq, "ms": ms} for freq, ms in song]
+
+
+def pattern_to_notes(events, last_ms=400):
+    """Converts PatternStore NoteEvents into the /melody notes list.
+
+    Each note lasts until the next event's timestamp; the final note lasts last_ms.
+    Events with zero magnitude become rests (freq 0).
+    """
+    return [{"freq": freq, "ms": ms} for freq, ms in events_to_notes(events, last_ms)]
+
+
+def schedule_song_on_all_picos(notes, gap_ms=SONG_GAP_MS, lead_ms=SCHEDULE_LEAD_MS):
+    """Uploads a whole melody to every Pico with a shared start time.
+
+    Returns (start_at_ms, latencies). start_at_ms is on the conductor's clock; the
+    devices translate it with their clock-sync offset.
+    """
+    start_at_ms = int(time.time() * 1000) + lead_ms
+    payload = {"notes": notes, "gap_ms": gap_ms, "start_at_ms": start_at_ms}
+    print(f"Scheduling {len(notes)} notes on all devices, starting in {lead_ms}ms.")
+    return start_at_ms, fan_out("/melody", payload, timeout=1)
 
 
 if __name__ == "__main__":
@@ -76,13 +330,34 @@ if __name__ == "__main__":
         time.sleep(1)
         print("1...")
         time.sleep(1)
+        if PLAYBACK_MODE in ("scheduled", "udp"):
+            for ip, est in sync_all_clocks().items():
+                if est.samples:
+                    print(f"  {ip}: offset {est.offset_ms():.1f}ms, "
+                          f"best RTT {est.min_rtt_ms():.1f}ms")
         print("Go!\n")
 
         # Play the song
-        for note, duration in SONG:
-            play_note_on_all_picos(note, duration)
-            # Wait for the note's duration plus a small gap before playing the next one
-            time.sleep(duration / 1000 * 1.1)
+        if PLAYBACK_MODE == "scheduled":
+            notes = song_to_notes(SONG)
+            start_at_ms, latencies = schedule_song_on_all_picos(notes)
+            print(f"  Upload spread across devices: {latency_spread_ms(latencies):.1f}ms")
+            song_ms = sum(n["ms"] + SONG_GAP_MS for n in notes)
+            time.sleep(max(0, start_at_ms + song_ms - time.time() * 1000) / 1000)
+        elif PLAYBACK_MODE == "udp":
+            # One datagram per note, timed on the shared clock; each note is sent a
+            # little ahead of its start so devices can queue it behind the current one
+            start_at_ms = int(time.time() * 1000) + SCHEDULE_LEAD_MS
+            for note, duration in SONG:
+                _get_note_sender().note(note, duration, start_at_ms)
+                start_at_ms += duration + SONG_GAP_MS
+                time.sleep(max(0, start_at_ms - UDP_LEAD_MS - time.time() * 1000) / 1000)
+        else:
+            for note, duration in SONG:
+                latencies = play_note_on_all_picos(note, duration)
+                print(f"  Reply spread across devices: {latency_spread_ms(latencies):.1f}ms")
+                # Wait for the note's duration plus a small gap before playing the next one
+                time.sleep(duration / 1000 * 1.1)
 
         print("\nSong finished!")
 
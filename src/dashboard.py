@@ -1,8 +1,20 @@
 # dashboard.py
 # To be run on a student's computer (not the Pico)
 
+import asyncio
+import json
 import requests
+import shutil
+import sys
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+try:
+    from .metrics.histogram import bucket_percentile
+except ImportError:     # run as a script from src/
+    from metrics.histogram import bucket_percentile  # type: ignore[no-redef]
 
 # --- Configuration ---
 # Students should populate this list with the IP address(es) of their Pico
@@ -11,21 +23,69 @@ PICO_IPS = [
 ]
 
 
+# Set to True to stream GET /events from every device instead of polling
+USE_EVENTS = False
+# Set to True (or run with --metrics) to show the fleet's /metrics timing histograms
+# and slowest boards instead of the light levels
+SHOW_METRICS = False
+
+REFRESH_SEC = 1.0
+METRICS_REFRESH_SEC = 5.0
+EVENTS_REFRESH_SEC = 0.1
+EVENTS_RECONNECT_SEC = 1.0
+POLL_TIMEOUT = 1
+POLL_WORKERS = 100
+
+# All workers share one keep-alive session that pools one connection per device, so a
+# device is polled over the same open connection on every refresh whichever worker
+# polls it (and never holds several idle sockets open on the Pico).
+_session = None
+_executor = None
+
+# ip -> False once a device has answered 404 to the combined /status endpoint
+_has_status_endpoint: Dict[str, bool] = {}
+
+
+def _get_session():
+    """Returns the shared HTTP session, with a pooled connection for every device."""
+    global _session
+    if _session is None:
+        pool_size = max(len(PICO_IPS), POLL_WORKERS)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=1)
+        _session = requests.Session()
+        _session.mount("http://", adapter)
+    return _session
+
+
+def _get_json(session, ip, path):
+    res = session.get(f"http://{ip}{path}", timeout=POLL_TIMEOUT)
+    res.raise_for_status()
+    return res.json()
+
+
 def get_device_status(ip):
-    """Fetches /health and /sensor data from a single device."""
+    """Fetches /status (or /health and /sensor) data from a single device."""
     status = {"ip": ip, "device_id": "N/A", "status": "Error", "norm": 0.0}
+    session = _get_session()
     try:
+        if _has_status_endpoint.get(ip, True):
+            res = session.get(f"http://{ip}/status", timeout=POLL_TIMEOUT)
+            if res.status_code == 404:
+                _has_status_endpoint[ip] = False
+            else:
+                res.raise_for_status()
+                combined = res.json()
+                status.update(combined)
+                status["status"] = combined.get("status", "Unknown")
+                return status
+
         # Get health status
-        health_res = requests.get(f"http://{ip}/health", timeout=1)
-        health_res.raise_for_status()
-        health_data = health_res.json()
+        health_data = _get_json(session, ip, "/health")
         status.update(health_data)
         status["status"] = health_data.get("status", "Unknown")
 
         # Get sensor data
-        sensor_res = requests.get(f"http://{ip}/sensor", timeout=1)
-        sensor_res.raise_for_status()
-        sensor_data = sensor_res.json()
+        sensor_data = _get_json(session, ip, "/sensor")
         status["norm"] = sensor_data.get("norm", 0.0)
 
     except requests.exceptions.RequestException as e:
@@ -34,6 +94,173 @@ def get_device_status(ip):
     return status
 
 
+def poll_all(ips=None):
+    """Polls every device in parallel; returns statuses in the same order as ips."""
+    global _executor
+    if ips is None:
+        ips = PICO_IPS
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=POLL_WORKERS)
+    return list(_executor.map(get_device_status, ips))
+
+
+# --- Fleet metrics (GET /metrics) ---
+# Devices report power-of-two microsecond histograms; bucket counts add up across the
+# fleet, and per-device p99s pick out the slow boards.
+METRIC_KEYS = ("tick_jitter_us", "tick_work_us", "handler_us", "onset_late_us")
+
+
+def get_device_metrics(ip):
+    """Fetches /metrics from one device; None if it is offline or has no /metrics."""
+    try:
+        return _get_json(_get_session(), ip, "/metrics")
+    except requests.exceptions.RequestException:
+        return None
+
+
+def poll_metrics(ips=None):
+    """Polls /metrics on every device in parallel; returns {ip: metrics or None}."""
+    global _executor
+    if ips is None:
+        ips = PICO_IPS
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=POLL_WORKERS)
+    return dict(zip(ips, _executor.map(get_device_metrics, ips)))
+
+
+def merge_histograms(histograms):
+    """Adds up device histograms (the /metrics dict form) into one fleet histogram."""
+    merged = {"count": 0, "max": 0, "buckets": []}
+    for h in histograms:
+        merged["count"] += h["count"]
+        merged["max"] = max(merged["max"], h["max"])
+        buckets = merged["buckets"]
+        buckets.extend([0] * (len(h["buckets"]) - len(buckets)))
+        for i, n in enumerate(h["buckets"]):
+            buckets[i] += n
+    for name, q in (("p50", 0.5), ("p99", 0.99)):
+        merged[name] = bucket_percentile(merged["buckets"], merged["count"], q, merged["max"])
+    return merged
+
+
+def aggregate_metrics(per_device):
+    """Fleet-wide histograms for each metric, from poll_metrics() results."""
+    reported = [m for m in per_device.values() if m]
+    return {key: merge_histograms(m[key] for m in reported if key in m) for key in METRIC_KEYS}
+
+
+def slowest_devices(per_device, key="tick_jitter_us", n=5):
+    """The n devices with the worst p99 for one metric, as [(ip, p99_us), ...]."""
+    ranked = [(ip, m[key]["p99"]) for ip, m in per_device.items() if m and key in m]
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return ranked[:n]
+
+
+def render_metrics(per_device):
+    """Prints the fleet-wide p50/p99/max per metric and the slowest boards."""
+    fleet = aggregate_metrics(per_device)
+    print(f"{'Metric':<16} {'p50 us':>8} {'p99 us':>8} {'max us':>8} {'samples':>9}")
+    for key, h in fleet.items():
+        print(f"{key:<16} {h['p50']:>8} {h['p99']:>8} {h['max']:>8} {h['count']:>9}")
+    slow = ", ".join(f"{ip} ({p99}us)" for ip, p99 in slowest_devices(per_device))
+    print(f"Slowest tick p99: {slow or 'n/a'}")
+    offline = [ip for ip, m in per_device.items() if not m]
+    print(f"Reporting: {len(per_device) - len(offline)}/{len(per_device)}"
+          + (f" (no /metrics: {', '.join(offline)})" if offline else ""))
+
+
+def run_metrics_dashboard(ips=None, refresh_sec=METRICS_REFRESH_SEC, rounds=None):
+    """Polls /metrics across the fleet and prints the summary every refresh_sec.
+
+    Runs forever unless rounds is given.
+    """
+    done = 0
+    while rounds is None or done < rounds:
+        started = time.monotonic()
+        print("--- Pico Orchestra Fleet Metrics --- (Press Ctrl+C to exit)")
+        render_metrics(poll_metrics(ips))
+        done += 1
+        if rounds is None or done < rounds:
+            time.sleep(max(0.0, refresh_sec - (time.monotonic() - started)))
+
+
+# --- Server-Sent Events ingestion ---
+# Every device stream is a plain asyncio connection, so a single event loop can follow
+# the whole fleet. Devices send an unchunked text/event-stream body.
+
+
+async def _read_events(ip, on_event):
+    """Connects to one device's /events stream and calls on_event(ip, data) per event."""
+    host, _, port = ip.partition(":")
+    reader, writer = await asyncio.open_connection(host, int(port or 80))
+    try:
+        writer.write(f"GET /events HTTP/1.1\r\nHost: {ip}\r\n"
+                     f"Accept: text/event-stream\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        if status_line.split(b" ")[1:2] != [b"200"]:
+            raise ConnectionError(f"/events answered {status_line.strip()!r}")
+        while (await reader.readline()).strip():
+            pass    # skip the response headers
+
+        data = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("stream closed")
+            line = line.rstrip(b"\r\n")
+            if line.startswith(b"data:"):
+                data.append(line[5:].lstrip())
+            elif not line and data:
+                on_event(ip, json.loads(b"\n".join(data)))
+                data = []
+    finally:
+        writer.close()
+
+
+async def stream_device(ip, on_event, on_error=None):
+    """Follows one device's event stream forever, reconnecting after errors."""
+    while True:
+        try:
+            await _read_events(ip, on_event)
+        except (OSError, ValueError) as e:
+            if on_error is not None:
+                on_error(ip, e)
+        await asyncio.sleep(EVENTS_RECONNECT_SEC)
+
+
+async def stream_all(ips, on_event, on_error=None):
+    """Multiplexes the event streams of every device in the current event loop."""
+    await asyncio.gather(*(stream_device(ip, on_event, on_error) for ip in ips))
+
+
+async def run_streaming_dashboard(ips=None, render=None):
+    """Dashboard main loop fed by /events instead of polling."""
+    if render is None:
+        render = render_dashboard
+    if ips is None:
+        ips = PICO_IPS
+    # One poll for identities, then the streams keep the light levels current
+    loop = asyncio.get_running_loop()
+    statuses = await loop.run_in_executor(None, poll_all, ips)
+    by_ip = {s["ip"]: s for s in statuses}
+
+    def on_event(ip, event):
+        by_ip[ip]["norm"] = event.get("norm", 0.0)
+        by_ip[ip]["status"] = "ok"
+
+    def on_error(ip, e):
+        by_ip[ip]["status"] = f"Offline ({type(e).__name__})"
+
+    streams = asyncio.ensure_future(stream_all(ips, on_event, on_error))
+    try:
+        while True:
+            render(statuses)
+            await asyncio.sleep(EVENTS_REFRESH_SEC)
+    finally:
+        streams.cancel()
+
+
 def render_dashboard(statuses):
     """Renders the collected statuses to the console."""
 
@@ -56,14 +283,151 @@ def render_dashboard(statuses):
     print("-" * 60)
 
 
+# --- Incremental rendering ---
+# Draws the table once, then uses ANSI cursor addressing to rewrite only the cells whose
+# text changed. Nothing is ever scrolled, so the scrollback stays clean at any refresh
+# rate, and each frame costs terminal bandwidth proportional to what actually changed.
+HISTORY_LEN = 20
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+# (column, width) of each cell in a device row, 1-based like the terminal
+_COLUMNS = [(1, 16), (18, 25), (44, 10), (55, HISTORY_LEN + 2), (56 + HISTORY_LEN + 2, 5)]
+_HEADER_ROWS = 4
+
+
+def sparkline(values, width=HISTORY_LEN):
+    """Renders the last `width` 0..1 values as block characters, right-aligned."""
+    top = len(SPARK_CHARS) - 1
+    chars = [SPARK_CHARS[max(0, min(top, int(v * top + 0.5)))] for v in values]
+    return "".join(chars[-width:]).rjust(width)
+
+
+class IncrementalRenderer:
+    """Renders dashboard frames, redrawing only the cells that changed.
+
+    Rows that do not fit in the terminal (lines, default the current height) are left
+    out and counted on the last line instead.
+    """
+
+    def __init__(self, out=None, history_len=HISTORY_LEN, lines=None):
+        self.out = out if out is not None else sys.stdout
+        self.history_len = history_len
+        self.lines = lines
+        self.history = {}   # ip -> deque of recent norm values
+        self._last = {}     # ip -> (status, norm) last added to its history
+        self._cells = {}    # (row, col) -> text currently on screen
+        self._rows = 0      # rows in use below the header, "more" line included
+        self._more_row = None
+        self._started = False
+
+    def _row_cells(self, status):
+        ip = status["ip"]
+        history = self.history.get(ip)
+        if history is None:
+            history = self.history[ip] = deque(maxlen=self.history_len)
+        light_level = status.get("norm", 0.0)
+        # Only a new reading goes in the history, however often frames are drawn: each
+        # poll brings new status dicts, a stream updates its dict in place
+        last = self._last.get(ip)
+        if last is None or last[0] is not status or last[1] != light_level:
+            history.append(light_level)
+            self._last[ip] = (status, light_level)
+        return [
+            status["ip"],
+            status["device_id"],
+            status["status"].capitalize(),
+            f"[{sparkline(history, self.history_len)}]",
+            f"{light_level:.2f}",
+        ]
+
+    def _header(self):
+        return ("\x1b[2J\x1b[H\x1b[?25l"
+                "--- Pico Orchestra Dashboard --- (Press Ctrl+C to exit)\r\n"
+                + "-" * 80 + "\r\n"
+                + f"{'IP Address':<16} {'Device ID':<25} {'Status':<10} {'Light Level':<20}"
+                + "\r\n" + "-" * 80)
+
+    def _clear_row(self, row, parts):
+        parts.append(f"\x1b[{_HEADER_ROWS + row + 1};1H\x1b[2K")
+        for col in range(len(_COLUMNS)):
+            self._cells.pop((row, col), None)
+
+    def render(self, statuses):
+        """Writes one frame; returns the number of cells that were redrawn."""
+        parts = []
+        if not self._started:
+            parts.append(self._header())
+            self._started = True
+
+        rows = [self._row_cells(status) for status in statuses]   # every history moves on
+        height = self.lines or shutil.get_terminal_size().lines
+        room = max(1, height - _HEADER_ROWS - 1)    # the bottom line keeps the cursor
+        more = None
+        if len(rows) > room:
+            rows = rows[:room - 1]
+            more = f"... {len(statuses) - len(rows)} more devices, enlarge the terminal"
+        more_row = None if more is None else len(rows)
+        if self._more_row is not None and self._more_row != more_row:
+            self._clear_row(self._more_row, parts)
+
+        redrawn = 0
+        for row, cells in enumerate(rows):
+            y = _HEADER_ROWS + row + 1
+            for col, ((x, width), text) in enumerate(zip(_COLUMNS, cells)):
+                text = text[:width].ljust(width)
+                if self._cells.get((row, col)) != text:
+                    self._cells[(row, col)] = text
+                    parts.append(f"\x1b[{y};{x}H{text}")
+                    redrawn += 1
+        if more is not None and self._cells.get((more_row, 0)) != more:
+            for col in range(len(_COLUMNS)):
+                self._cells.pop((more_row, col), None)
+            self._cells[(more_row, 0)] = more
+            parts.append(f"\x1b[{_HEADER_ROWS + more_row + 1};1H\x1b[2K{more}")
+            redrawn += 1
+        self._more_row = more_row
+
+        # Blank out rows left over from a larger fleet (or a taller terminal)
+        used = len(rows) + (more is not None)
+        for row in range(used, min(self._rows, room)):
+            self._clear_row(row, parts)
+        for row in range(room, self._rows):
+            for col in range(len(_COLUMNS)):
+                self._cells.pop((row, col), None)
+        self._rows = used
+
+        if parts:
+            parts.append(f"\x1b[{_HEADER_ROWS + self._rows + 1};1H")
+            self.out.write("".join(parts))
+            self.out.flush()
+        return redrawn
+
+    def close(self):
+        """Restores the cursor below the table."""
+        self.out.write("\x1b[?25h\r\n")
+        self.out.flush()
+
+
 if __name__ == "__main__":
+    show_metrics = SHOW_METRICS or "--metrics" in sys.argv[1:]
+    renderer = IncrementalRenderer() if sys.stdout.isatty() and not show_metrics else None
+    render = renderer.render if renderer else render_dashboard
     try:
+        if show_metrics:
+            run_metrics_dashboard()
+        if USE_EVENTS:
+            asyncio.run(run_streaming_dashboard(render=render))
+
         while True:
-            all_statuses = [get_device_status(ip) for ip in PICO_IPS]
-            render_dashboard(all_statuses)
-            time.sleep(1)  # Refresh every second
+            started = time.monotonic()
+            all_statuses = poll_all()
+            render(all_statuses)
+            # Refresh every second, however long the poll took
+            time.sleep(max(0.0, REFRESH_SEC - (time.monotonic() - started)))
 
     except KeyboardInterrupt:
+        if renderer:
+            renderer.close()
         print("\nDashboard stopped.")
     except Exception as e:
         print(f"\nAn error occurred: {e}")
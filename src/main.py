@@ -5,15 +5,162 @@ import machine
 import time
 import json
 import asyncio
-import math
+
+try:
+    from .audio.actuator import PwmActuator
+    from .audio.player import Player
+    from .metrics.histogram import Histogram
+    from .net.http_server import HttpServer
+    from .net.udp_notes import NoteListener, NOTE_PORT, CMD_NOTE, CMD_STOP
+    from .sensor.sampler import Sampler
+    from .sensor.triggers import TriggerEngine, TriggerRule, EDGE_FALLING
+    from .storage.note_event import iter_notes
+    from .storage.pattern_store import PatternStore
+    from .scale import (C_MAJOR_MIDI, ADC_MAX, midi_to_freq, lux_to_index, lux_to_freq,
+                        build_lux_steps, build_lux_table, lux_to_freq_lut)
+    from .timebase import ticks_ms, ticks_us, ticks_add, ticks_diff, sleep_until
+except ImportError:     # running as the top-level firmware script on the Pico
+    from audio.actuator import PwmActuator  # type: ignore[no-redef]
+    from audio.player import Player  # type: ignore[no-redef]
+    from metrics.histogram import Histogram  # type: ignore[no-redef]
+    from net.http_server import HttpServer  # type: ignore[no-redef]
+    from net.udp_notes import NoteListener, NOTE_PORT, CMD_NOTE, CMD_STOP  # type: ignore[no-redef]
+    from sensor.sampler import Sampler  # type: ignore[no-redef]
+    from sensor.triggers import TriggerEngine, TriggerRule, EDGE_FALLING  # type: ignore[no-redef]
+    from storage.note_event import iter_notes  # type: ignore[no-redef]
+    from storage.pattern_store import PatternStore  # type: ignore[no-redef]
+    from scale import (C_MAJOR_MIDI, ADC_MAX, midi_to_freq,  # type: ignore[no-redef]
+                       lux_to_index, lux_to_freq, build_lux_steps, build_lux_table,
+                       lux_to_freq_lut)
+    from timebase import (ticks_ms, ticks_us, ticks_add, ticks_diff,  # type: ignore[no-redef]
+                          sleep_until)
 
 # --- Pin Configuration ---
 photo_sensor_pin = machine.ADC(28)                  # photosensor on GP28 (ADC2)
 buzzer_pin = machine.PWM(machine.Pin(16))           # buzzer on GP16 (PWM)
+# Every playback path writes the buzzer through this, so unchanged registers are skipped
+buzzer = PwmActuator(buzzer_pin)
+
+# --- Sensor sampling ---
+# The ADC is read at SAMPLE_RATE_HZ into a ring buffer; everything else reads the
+# filtered value instead of taking its own single noisy sample.
+SAMPLE_RATE_HZ = 200
+SAMPLE_HISTORY = 256        # ring buffer length (~1.3 s at 200 Hz)
+SAMPLE_WINDOW  = 8          # readings averaged into the filtered value
+sampler = Sampler(photo_sensor_pin, size=SAMPLE_HISTORY, window=SAMPLE_WINDOW)
 
 def stop_tone():
-    buzzer_pin.duty_u16(0)
+    buzzer.mute()
     buzzer_pin.deinit()
+    buzzer.invalidate()
+
+# --- Clock ---
+# Offset from the local tick clock (timebase.py) to the conductor's shared clock (ms),
+# plus the estimated drift since the offset was measured. Set by the conductor via
+# POST /clock.
+_clock_offset_ms = 0
+_clock_drift_ppm = 0.0
+_clock_ref_ticks = 0
+_clock_synced    = False
+
+def clock_ms():
+    """Current time on the shared (conductor) clock, in ms."""
+    now = ticks_ms()
+    offset = _clock_offset_ms
+    if _clock_drift_ppm:
+        offset += int(ticks_diff(now, _clock_ref_ticks) * _clock_drift_ppm / 1e6)
+    return now + offset
+
+def handle_time(body=None):
+    """GET /time: receive/transmit timestamps on the local tick clock for clock sync."""
+    t1 = ticks_ms()
+    return 200, {"t1": t1, "t2": ticks_ms()}
+
+def handle_clock_get(body=None):
+    """GET /clock: the offset and drift this device is currently applying."""
+    return 200, {"offset_ms": _clock_offset_ms, "drift_ppm": _clock_drift_ppm,
+                 "synced": _clock_synced}
+
+def handle_clock_set(body):
+    """POST /clock: apply the conductor's offset (and optional drift) estimate."""
+    global _clock_offset_ms, _clock_drift_ppm, _clock_ref_ticks, _clock_synced
+    _clock_offset_ms = int(body["offset_ms"])
+    _clock_drift_ppm = float(body.get("drift_ppm", 0.0))
+    _clock_ref_ticks = ticks_ms()
+    _clock_synced = True
+    return handle_clock_get()
+
+# --- Device identity / sensor scaling ---
+API_VERSION = "1.0.0"
+MIN_LIGHT = 2000           # brightest expected ADC reading (sensor is inverted)
+MAX_LIGHT = 40000          # darkest expected ADC reading
+
+def device_id():
+    return "pico-w-" + "".join("%02X" % b for b in machine.unique_id())
+
+def sensor_reading(raw, value=None):
+    """Builds the /sensor fields from a raw ADC value (bright = LOW ADC).
+
+    norm and lux_est are computed from value (the filtered reading) when given.
+    """
+    if value is None:
+        value = raw
+    norm = 1 - (value - MIN_LIGHT) / (MAX_LIGHT - MIN_LIGHT)
+    norm = max(0.0, min(1.0, norm))
+    # photoresistor vs. the 10k divider resistor, with a rough lux ~ 500 / R(kOhm) fit
+    r_kohm = 10 * value / max(1, 65535 - value)
+    lux_est = 500 / max(r_kohm, 0.01)
+    return {"raw": raw, "norm": round(norm, 3), "lux_est": round(lux_est, 1)}
+
+def handle_health(body=None):
+    """GET /health"""
+    return 200, {"status": "ok", "device_id": device_id(), "api": API_VERSION}
+
+def handle_sensor(body=None):
+    """GET /sensor"""
+    return 200, sensor_reading(sampler.latest(), sampler.filtered())
+
+def handle_sensor_history(body=None):
+    """GET /sensor/history: the raw readings in the ring buffer, oldest first."""
+    return 200, {"rate_hz": SAMPLE_RATE_HZ, "samples": sampler.history()}
+
+async def sample_loop():
+    """Reads the ADC into the sampler at SAMPLE_RATE_HZ on fixed deadlines."""
+    period_ms = 1000 // SAMPLE_RATE_HZ
+    next_tick = ticks_ms()
+    while True:
+        sampler.sample()
+        next_tick = ticks_add(next_tick, period_ms)
+        await sleep_until(next_tick)
+
+def handle_status(body=None):
+    """GET /status: /health and /sensor in one round trip."""
+    status = handle_health()[1]
+    status.update(handle_sensor()[1])
+    return 200, status
+
+# --- Server-Sent Events (GET /events) ---
+EVENTS_INTERVAL_MS = 50
+
+async def stream_events(writer, interval_ms=EVENTS_INTERVAL_MS):
+    """GET /events: streams sensor readings as SSE until the client disconnects."""
+    writer.write(b"HTTP/1.1 200 OK\r\n"
+                 b"Content-Type: text/event-stream\r\n"
+                 b"Cache-Control: no-cache\r\n"
+                 b"Connection: keep-alive\r\n\r\n")
+    next_tick = ticks_ms()
+    try:
+        while True:
+            event = sensor_reading(sampler.latest(), sampler.filtered())
+            event["ts"] = clock_ms()
+            writer.write(b"data: " + json.dumps(event).encode() + b"\n\n")
+            await writer.drain()
+            next_tick = ticks_add(next_tick, interval_ms)
+            await sleep_until(next_tick)
+    except OSError:
+        pass    # client went away
+    finally:
+        writer.close()
 
 # --- Wii-on-bright (PEAK TRIGGER: one-shot, for INVERTED sensor) ---
 # Bright = LOW ADC. Trigger once when we ENTER the lowest bin near your bright minimum.
@@ -32,96 +179,278 @@ WII_MELODY = [
     (88,0.5),(87,0.5),(86,0.5),
 ]
 
-# one-shot control
-_wii_playing = False
-_wii_armed   = True
-_wii_task    = None
-_was_lowbin  = False   # edge detector for the LOW (bright) bin
-
-C_MAJOR_MIDI = [
-    48, 50, 52, 53, 55, 57, 59,
-    60, 62, 64, 65, 67, 69, 71,
-    72, 74, 76, 77, 79, 81, 83,
-    84
+# --- Gesture triggers ---
+# Each rule plays its pattern once when the filtered reading crosses its threshold,
+# then waits for the reading to pass its re-arm level. A pattern is either a
+# (MIDI, beats) melody or the name of a pattern saved in the PatternStore.
+TRIGGER_RULES = [
+    TriggerRule("wii", WII_MELODY, threshold=LOW_PEAK_ADC + PEAK_MARGIN,
+                rearm=REARM_ABOVE, edge=EDGE_FALLING),
 ]
+triggers = TriggerEngine(TRIGGER_RULES)
+PATTERN_DIR = "/patterns"  # saved packed (fmt="bin"), so playback streams them from flash
 
-def midi_to_freq(midi_note):
-    return 440 * (2 ** ((midi_note - 69) / 12))
-
-def lux_to_freq(x, theMin, theMax, use_log=True):
-    if use_log:
-        log_min = math.log(theMin)
-        log_max = math.log(theMax)
-        t = (math.log(x) - log_min) / (log_max - log_min)
-    else:
-        t = (x - theMin) / (theMax - theMin)
-    t = 1 - t
-    t = max(0, min(1, t))
-    idx = int(round(t * (len(C_MAJOR_MIDI) - 1)))
-    midi_note = C_MAJOR_MIDI[idx]
-    return midi_to_freq(midi_note)
-
-# --- One-shot Wii melody task ---
-async def play_wii_melody_once():
-    global _wii_playing
-    _wii_playing = True
-    for midi, beats in WII_MELODY:
-        dur = max(1, beats) * BEAT_SEC
-        if midi is None:
-            buzzer_pin.duty_u16(0)
-        else:
-            buzzer_pin.freq(int(midi_to_freq(midi)))
-            buzzer_pin.duty_u16(32768)  # 50% duty
-        await asyncio.sleep(dur)
-    buzzer_pin.duty_u16(0)
-    _wii_playing = False
-
-async def main():
-    global _wii_playing, _wii_armed, _wii_task, _was_lowbin
-
-    # scale mapping range (tune if needed)
-    min_light = 2000
-    max_light = 40000
+_pattern_store = None
 
-    while True:
+# --- Playback ---
+# One voice drives the buzzer: /tone and /melody preempt whatever is playing, trigger
+# patterns queue behind it. The owner tag says who is playing; the light-controlled
+# scale only sounds while the player is idle.
+OWNER_REMOTE = "remote"
+OWNER_TRIGGER = "trigger"
+onset_late = Histogram()    # note starts vs their deadlines (us), recorded by the player
+player = Player(buzzer, clock_ms, onset_hist=onset_late)
+
+# --- One-shot trigger pattern task ---
+def melody_to_notes(melody, beat_sec=BEAT_SEC):
+    """(MIDI, beats) pairs -> (freq, ms) notes; every note lasts at least one beat."""
+    return [(0 if midi is None else int(midi_to_freq(midi)), int(max(1, beats) * beat_sec * 1000))
+            for midi, beats in melody]
+
+def get_pattern_store():
+    global _pattern_store
+    if _pattern_store is None:
+        _pattern_store = PatternStore(PATTERN_DIR, fmt="bin")
+    return _pattern_store
+
+def pattern_notes(pattern):
+    """Notes for a trigger rule's pattern: a melody list or a saved pattern name.
+
+    Saved patterns are streamed from flash as they play, in constant memory. The first
+    note is read here, so a missing or unreadable pattern raises before it is queued.
+    """
+    if isinstance(pattern, str):
+        notes = iter_notes(get_pattern_store().iter_events(pattern))
+        first = next(notes, None)
+        return [] if first is None else _stream_notes(pattern, first, notes)
+    return melody_to_notes(pattern)
+
+def _stream_notes(name, first, notes):
+    yield first
+    try:
+        for note in notes:
+            yield note
+    except Exception as e:     # corrupt further in: play what was readable
+        print(f"[Trigger] pattern {name!r} cut short: {e}")
+
+def missing_trigger_patterns(rules=TRIGGER_RULES):
+    """Names of the saved patterns the rules refer to that are not in the store."""
+    names = [rule.pattern for rule in rules if isinstance(rule.pattern, str)]
+    if not names:
+        return []
+    store = get_pattern_store()
+    return [name for name in names if not store.exists(name)]
+
+def start_trigger(rule):
+    """Plays a fired rule: cuts the scale at once, but queues behind remote playback.
+
+    Returns False if the pattern could not be loaded or queued.
+    """
+    try:
+        notes = pattern_notes(rule.pattern)
+    except Exception as e:     # a missing or corrupt saved pattern must not stop the loop
+        print(f"[Trigger] {rule.name}: cannot load pattern {rule.pattern!r}: {e}")
+        return False
+    if not player.busy:
+        buzzer.mute()
+    return player.enqueue(notes, owner=OWNER_TRIGGER)
+
+# --- Remote playback (POST /tone, /melody) ---
+def duty_to_u16(duty):
+    """Contract duty (0.0-1.0) to a PWM duty_u16 value; 0.5 -> 32768."""
+    return max(0, min(65535, int(duty * 65536)))
+
+def handle_tone(body):
+    """POST /tone: play one tone now, cancelling any remote melody or tone."""
+    ms = int(body["ms"])
+    duty = duty_to_u16(float(body.get("duty", 0.5)))
+    player.play([(body["freq"], ms)], duty_u16=duty, owner=OWNER_REMOTE)
+    return 202, {"playing": True, "until_ms_from_now": ms}
+
+MAX_START_AHEAD_MS = 60000  # a start further out than this is a bad clock, not a plan
+
+def check_start_at(start_at_ms):
+    """None if a shared-clock start time can be scheduled, else the reply refusing it.
+
+    Without a clock sync the shared clock is just the local ticks, so a conductor's
+    epoch time would be read as a start decades away and hold the player forever.
+    """
+    if not _clock_synced:
+        return 409, {"error": "clock not synced, POST /clock first"}
+    if start_at_ms - clock_ms() > MAX_START_AHEAD_MS:
+        return 400, {"error": f"start_at_ms more than {MAX_START_AHEAD_MS}ms ahead"}
+    return None
+
+def handle_melody(body):
+    """POST /melody: play a melody, cancelling current playback unless "enqueue" is set."""
+    notes = [(n.get("freq", 0), int(n["ms"])) for n in body["notes"]]
+    start_at_ms = body.get("start_at_ms")
+    if start_at_ms is not None:
+        refused = check_start_at(int(start_at_ms))
+        if refused is not None:
+            return refused
+    args = (notes, int(body.get("gap_ms", 0)), start_at_ms)
+    if not body.get("enqueue"):
+        player.play(*args, owner=OWNER_REMOTE)
+    elif not player.enqueue(*args, owner=OWNER_REMOTE):
+        return 503, {"error": "playback queue full"}
+    return 202, {"queued": len(notes)}
+
+def handle_stop(body=None):
+    """POST /stop: silence the buzzer and drop queued melodies."""
+    player.stop()
+    return 200, {"playing": False}
+
+# --- Remote playback over UDP (see net/udp_notes.py) ---
+# The conductor can send each note once as a datagram instead of a /tone POST to every
+# device. Timed notes queue up to their start time, untimed ones preempt like /tone.
+note_overflow = 0       # timed notes dropped because the playback queue was full
+note_refused = 0        # timed notes dropped by check_start_at() (no clock sync, too far)
+
+def handle_note_command(command):
+    global note_overflow, note_refused
+    if command.cmd == CMD_STOP:
+        player.stop()
+    elif command.cmd == CMD_NOTE:
+        notes = [(command.freq, command.ms)]
+        if not command.start_at_ms:
+            player.play(notes, duty_u16=command.duty_u16, owner=OWNER_REMOTE)
+        elif check_start_at(command.start_at_ms) is not None:
+            note_refused += 1
+        elif not player.enqueue(notes, start_at_ms=command.start_at_ms,
+                                duty_u16=command.duty_u16, owner=OWNER_REMOTE):
+            note_overflow += 1
+
+note_listener = NoteListener(handle_note_command)
+
+# --- Instrumentation (GET /metrics) ---
+# Fixed-size microsecond histograms, filled without allocating on the hot paths.
+TICK_MS = 50
+tick_jitter = Histogram()   # how late each main-loop tick woke up
+tick_work = Histogram()     # pitch lookup + PWM update per tick
+handler_time = Histogram()  # API handler run time
+_boot_ticks = ticks_ms()
+
+def timed(handler):
+    """Wraps an API handler so its run time is recorded into handler_time."""
+    def run(body=None):
+        started = ticks_us()
         try:
-            adc = photo_sensor_pin.read_u16()
+            return handler(body)
+        finally:
+            handler_time.record(ticks_diff(ticks_us(), started))
+    return run
+
+def handle_metrics(body=None):
+    """GET /metrics: the instrumentation histograms, for the dashboard to aggregate."""
+    return 200, {
+        "device_id": device_id(),
+        "uptime_ms": ticks_diff(ticks_ms(), _boot_ticks),
+        "tick_ms": TICK_MS,
+        "tick_jitter_us": tick_jitter.to_dict(),
+        "tick_work_us": tick_work.to_dict(),
+        "handler_us": handler_time.to_dict(),
+        "onset_late_us": onset_late.to_dict(),
+        "pwm": buzzer.stats(),
+        "udp": dict(note_listener.tracker.stats(), overflow=note_overflow,
+                    refused=note_refused),
+    }
+
+# --- Device HTTP service ---
+HTTP_PORT = 80
+ROUTES = {
+    ("GET", "/health"): handle_health,
+    ("GET", "/sensor"): handle_sensor,
+    ("GET", "/sensor/history"): handle_sensor_history,
+    ("GET", "/status"): handle_status,
+    ("GET", "/time"): handle_time,
+    ("GET", "/clock"): handle_clock_get,
+    ("POST", "/clock"): handle_clock_set,
+    ("POST", "/tone"): handle_tone,
+    ("POST", "/melody"): handle_melody,
+    ("POST", "/stop"): handle_stop,
+    ("GET", "/metrics"): handle_metrics,
+}
+STREAMS = {
+    ("GET", "/events"): stream_events,
+}
+http_server = HttpServer({route: timed(h) for route, h in ROUTES.items()}, STREAMS)
 
-            # --- LOW bin (bright) detection with rising-edge logic ---
-            is_lowbin = (adc <= (LOW_PEAK_ADC + PEAK_MARGIN))
+def connect_wifi(config_path="wifi_config.json"):
+    """Joins the WiFi network in wifi_config.json; returns the IP (None off-device)."""
+    try:
+        import network
+    except ImportError:
+        return None     # CPython: already on the host's network
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    sta_if = network.WLAN(network.STA_IF)
+    sta_if.active(True)
+    sta_if.connect(config["ssid"], config["passw"])
+    while not sta_if.isconnected():
+        time.sleep(0.5)
+    return sta_if.ifconfig()[0]
 
-            # Trigger ONCE when we ENTER the low bin (i.e., go bright enough)
-            if _wii_armed and not _wii_playing and (not _was_lowbin) and is_lowbin:
-                _wii_armed = False
-                _wii_playing = True
-                buzzer_pin.duty_u16(0)      # mute scale immediately
-                print(f"[Wii] Peak BRIGHT trigger at ADC={adc} (≤ {LOW_PEAK_ADC + PEAK_MARGIN})")
-                _wii_task = asyncio.create_task(play_wii_melody_once())
+async def main(host="0.0.0.0", port=HTTP_PORT, note_port=NOTE_PORT):
+    # scale mapping range (tune MIN_LIGHT / MAX_LIGHT if needed)
+    min_light = MIN_LIGHT
+    max_light = MAX_LIGHT
+    freq_table = build_lux_table(min_light, max_light)
+    for name in missing_trigger_patterns(triggers.rules):
+        print(f"[Trigger] warning: no saved pattern {name!r}")
+    sampler_task = asyncio.create_task(sample_loop())
+    server = None
+    if port is not None:        # port=None runs the instrument without the API
+        server = await http_server.start(host, port)
+        print(f"Device service listening on port {port}")
+    note_task = None
+    if note_port is not None:   # note_port=None runs without the UDP note listener
+        note_listener.bind(host, note_port)
+        note_task = asyncio.create_task(note_listener.serve())
+        print(f"Listening for UDP notes on port {note_port}")
 
-            # Re-arm ONLY after we get clearly dimmer again
-            if (not _wii_armed) and (not _wii_playing) and adc >= REARM_ABOVE:
-                _wii_armed = True
-                print(f"[Wii] Re-armed (ADC={adc} ≥ {REARM_ABOVE})")
+    tick_us = TICK_MS * 1000
+    wake_at = None
+    while True:
+        try:
+            if wake_at is not None:
+                tick_jitter.record(ticks_diff(ticks_us(), wake_at))
+            adc = sampler.filtered()
 
-            # update edge detector
-            _was_lowbin = is_lowbin
+            # --- Gesture triggers (one pass over the rule table) ---
+            rule = triggers.update(adc, busy=player.owner == OWNER_TRIGGER)
+            if rule is not None:
+                print(f"[Trigger] {rule.name} at ADC={adc}")
+                start_trigger(rule)
 
             # While melody plays, DO NOT play the C-major scale
-            if not _wii_playing:
-                frequency = lux_to_freq(adc, min_light, max_light)
-                buzzer_pin.freq(int(frequency))
-                buzzer_pin.duty_u16(32768)
+            if not player.busy:
+                started = ticks_us()
+                frequency = lux_to_freq_lut(adc, freq_table)
+                buzzer.play(int(frequency), 32768)  # no-op while the note is unchanged
+                tick_work.record(ticks_diff(ticks_us(), started))
 
-            await asyncio.sleep(0.05)
+            wake_at = ticks_add(ticks_us(), tick_us)
+            await asyncio.sleep(TICK_MS / 1000)
 
         except KeyboardInterrupt:
             print("Stopping main loop...")
+            sampler_task.cancel()
+            if server is not None:
+                server.close()
+            if note_task is not None:
+                note_task.cancel()
+                note_listener.close()
+            player.stop()
             stop_tone()
             break
 
 # Run the main event loop
 if __name__ == "__main__":
     print("Hello World!")
+    ip = connect_wifi()
+    if ip:
+        print(f"Connected to WiFi as {ip}")
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -0,0 +1,65 @@
+# histogram.py
+# Fixed-size latency histograms for on-device instrumentation. Buckets are powers of
+# two of microseconds, counted in a preallocated array, so record() is a few integer
+# operations with no allocation and can sit in the hot loop and the playback path.
+# (No running sum: on the Pico it would outgrow a small int and start allocating.)
+
+from array import array
+
+BUCKETS = 20    # bucket 0 holds 0us, bucket i holds [2**(i-1), 2**i) us; the last is open
+
+
+class Histogram:
+    """Counts microsecond durations into power-of-two buckets; negatives count as 0."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.counts = array("I", (0 for _ in range(buckets)))
+        self.count = 0
+        self.max = 0
+
+    def record(self, us):
+        if us < 0:
+            us = 0
+        i = 0
+        v = us
+        last = len(self.counts) - 1
+        while v and i < last:
+            v >>= 1
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        if us > self.max:
+            self.max = us
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.max = 0
+
+    def percentile(self, q):
+        """Upper bound (us) of the bucket holding the q-th quantile (0-1); 0 when empty."""
+        return bucket_percentile(self.counts, self.count, q, self.max)
+
+    def to_dict(self):
+        """The /metrics form: totals, p50/p99 bucket bounds, and the raw bucket counts."""
+        return {
+            "count": self.count,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "buckets": list(self.counts),
+        }
+
+
+def bucket_percentile(counts, count, q, max_us):
+    """percentile() over plain bucket counts, so merged fleet histograms can use it."""
+    if not count:
+        return 0
+    rank = q * count
+    seen = 0
+    for i, n in enumerate(counts):
+        seen += n
+        if n and seen >= rank:
+            return min(1 << i, max_us) if i else 0
+    return max_us
@@ -0,0 +1,173 @@
+# http_server.py
+# Minimal non-blocking HTTP/1.1 server for the device API, built on asyncio streams so
+# it shares the event loop with the sensor loop and melody playback. Every read is
+# bounded, handlers are plain functions that return at once, and connections are kept
+# alive so the conductor and dashboard can reuse them.
+
+import asyncio
+import json
+
+MAX_LINE = 512              # request line / header line
+MAX_HEADERS = 32
+MAX_BODY = 4096
+IDLE_TIMEOUT_S = 10         # close keep-alive connections idle this long
+
+_REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message=""):
+        super().__init__(message)
+        self.status = status
+
+
+class _BoundedReader:
+    """Line reads over a StreamReader that never buffer more than MAX_LINE + 1 bytes.
+
+    StreamReader.readline() has no limit on MicroPython, so a header without a newline
+    would grow the heap until the board runs out; here reads stop at the cap instead.
+    Bytes read past the end of a line are kept for the next line or the body.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.buf = b""
+
+    async def readline(self, status):
+        """One line including its newline (b"" at EOF); HttpError(status) if too long."""
+        while True:
+            end = self.buf.find(b"\n") + 1
+            if end:
+                line, self.buf = self.buf[:end], self.buf[end:]
+                break
+            if len(self.buf) > MAX_LINE:
+                raise HttpError(status, "line too long")
+            chunk = await self.reader.read(MAX_LINE + 1 - len(self.buf))
+            if not chunk:
+                line, self.buf = self.buf, b""
+                break
+            self.buf += chunk
+        if len(line) > MAX_LINE:
+            raise HttpError(status, "line too long")
+        return line
+
+    async def readexactly(self, n):
+        data, self.buf = self.buf[:n], self.buf[n:]
+        if len(data) < n:
+            data += await self.reader.readexactly(n - len(data))
+        return data
+
+
+class HttpServer:
+    """Routes requests to handler(body) -> (status, dict) functions.
+
+    routes maps (method, path) to a handler. streams maps (method, path) to a coroutine
+    taking the StreamWriter, for responses that take over the connection (e.g. SSE).
+    """
+
+    def __init__(self, routes, streams=None):
+        self.routes = routes
+        self.streams = streams or {}
+        self.requests = 0
+
+    async def start(self, host="0.0.0.0", port=80):
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def _read_request(self, reader):
+        """Returns (method, path, headers, body), or None when the client hung up."""
+        line = await reader.readline(400)
+        if not line:
+            return None
+        parts = line.decode().split()
+        if len(parts) != 3:
+            raise HttpError(400, "malformed request line")
+        method, target, _ = parts
+        path = target.split("?", 1)[0]
+
+        headers = {}
+        while True:
+            line = await reader.readline(431)
+            if not line or line in (b"\r\n", b"\n"):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(431, "too many headers")
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HttpError(400, "bad Content-Length")
+        if length < 0:
+            raise HttpError(400, "bad Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    def _dispatch(self, method, path, body):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(p == path for _, p in self.routes):
+                raise HttpError(405)
+            raise HttpError(404)
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            raise HttpError(400, "invalid JSON")
+        try:
+            return handler(data)
+        except (KeyError, ValueError, TypeError) as e:
+            raise HttpError(400, f"bad request body: {e}")
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        """Serves requests on one connection until the client closes it."""
+        reader = _BoundedReader(reader)
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT_S)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    self.requests += 1
+                    keep_alive = headers.get("connection", "").lower() != "close"
+
+                    stream = self.streams.get((method, path))
+                    if stream is not None:
+                        await stream(writer)
+                        return
+                    status, payload = self._dispatch(method, path, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e) or _REASONS.get(e.status, "")}
+                except asyncio.TimeoutError:
+                    break   # idle or stalled client: free the socket
+                except Exception as e:
+                    print(f"[HTTP] handler error: {e}")
+                    status, payload = 500, {"error": "internal error"}
+
+                await self._respond(writer, status, payload, keep_alive and status < 400)
+                if not keep_alive or status >= 400:
+                    break
+        except (OSError, EOFError):
+            pass    # client went away
+        finally:
+            writer.close()
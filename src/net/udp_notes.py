@@ -0,0 +1,185 @@
+# udp_notes.py
+# Datagram transport for conductor note commands. Instead of one HTTP POST per device
+# per note, the conductor sends each note once to a multicast group (or the subnet
+# broadcast address) and every device picks it up from a non-blocking socket polled in
+# its asyncio loop. Packets are a fixed 23-byte struct carrying a sender session, a
+# sequence number and the target start time on the shared clock. There are no
+# retransmits: a gap in the sequence counts as lost notes, and late or duplicate
+# packets are dropped rather than played out of order.
+
+import asyncio
+import random
+import socket
+import struct
+
+NOTE_PORT = 5005
+MULTICAST_GROUP = "239.255.42.1"    # organisation-local scope, stays on the LAN
+POLL_MS = 5                         # listener sleep when the socket is empty
+
+MAGIC = b"PL"
+CMD_NOTE = 1
+CMD_STOP = 2
+
+# magic, command, session, seq, start_at_ms (0 = now), freq, ms, duty_u16
+PACKET = "!2sBHIqHHH"
+PACKET_SIZE = struct.calcsize(PACKET)
+SEQ_MOD = 1 << 32
+
+
+class NoteCommand:
+    __slots__ = ("cmd", "session", "seq", "start_at_ms", "freq", "ms", "duty_u16")
+
+    def __init__(self, cmd, session, seq, start_at_ms, freq, ms, duty_u16):
+        self.cmd = cmd
+        self.session = session
+        self.seq = seq
+        self.start_at_ms = start_at_ms
+        self.freq = freq
+        self.ms = ms
+        self.duty_u16 = duty_u16
+
+
+def pack_command(cmd, session, seq, start_at_ms=0, freq=0, ms=0, duty_u16=0):
+    return struct.pack(PACKET, MAGIC, cmd, session, seq % SEQ_MOD, start_at_ms or 0,
+                       freq, ms, duty_u16)
+
+
+def unpack_command(data):
+    """The NoteCommand in a datagram, or None if it is not one of ours."""
+    if len(data) != PACKET_SIZE:
+        return None
+    magic, cmd, session, seq, start_at_ms, freq, ms, duty_u16 = struct.unpack(PACKET, data)
+    if magic != MAGIC:
+        return None
+    return NoteCommand(cmd, session, seq, start_at_ms, freq, ms, duty_u16)
+
+
+def _is_multicast(host):
+    first = host.split(".", 1)[0]
+    return first.isdigit() and 224 <= int(first) <= 239
+
+
+def _ip_bytes(host):
+    return bytes(int(part) for part in host.split("."))
+
+
+class SeqTracker:
+    """Loss detection from sequence numbers, per sender session.
+
+    A packet more than one ahead of the last one means the ones in between were lost;
+    one at or behind it is stale (duplicated or reordered) and should not be played.
+    A new session (conductor restart) starts counting afresh.
+    """
+
+    def __init__(self):
+        self.session = None
+        self.last = 0
+        self.received = 0
+        self.lost = 0
+        self.stale = 0
+        self.invalid = 0
+
+    def accept(self, command):
+        """Records command; returns False if it is stale and should be dropped."""
+        if command.session != self.session:
+            self.session = command.session
+            self.last = command.seq
+            self.received += 1
+            return True
+        ahead = (command.seq - self.last) % SEQ_MOD
+        if ahead == 0 or ahead >= SEQ_MOD // 2:
+            self.stale += 1
+            return False
+        self.lost += ahead - 1
+        self.last = command.seq
+        self.received += 1
+        return True
+
+    def stats(self):
+        return {"received": self.received, "lost": self.lost, "stale": self.stale,
+                "invalid": self.invalid}
+
+
+class NoteSender:
+    """Conductor side: one datagram per note, whatever the size of the fleet.
+
+    host is a multicast group, a broadcast address, or a single device's address.
+    """
+
+    def __init__(self, host=MULTICAST_GROUP, port=NOTE_PORT, session=None, ttl=1):
+        self.address = (host, port)
+        self.session = random.getrandbits(16) if session is None else session
+        self.seq = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if _is_multicast(host):
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+
+    def _send(self, cmd, start_at_ms=0, freq=0, ms=0, duty_u16=0):
+        self.seq = (self.seq + 1) % SEQ_MOD
+        packet = pack_command(cmd, self.session, self.seq, start_at_ms, freq, ms, duty_u16)
+        self.sock.sendto(packet, self.address)
+        return self.seq
+
+    def note(self, freq, ms, start_at_ms=None, duty_u16=32768):
+        """Sends one note; start_at_ms is on the shared clock (None: play on arrival)."""
+        return self._send(CMD_NOTE, start_at_ms, int(freq), int(ms), duty_u16)
+
+    def stop(self):
+        return self._send(CMD_STOP)
+
+    def close(self):
+        self.sock.close()
+
+
+class NoteListener:
+    """Device side: receives note commands and passes each new one to handler(command)."""
+
+    def __init__(self, handler, tracker=None):
+        self.handler = handler
+        self.tracker = tracker or SeqTracker()
+        self.sock = None
+
+    def bind(self, host="0.0.0.0", port=NOTE_PORT, group=MULTICAST_GROUP):
+        """Opens the socket; joins group if given (broadcasts arrive either way)."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(socket.getaddrinfo(host, port)[0][-1])
+        if group:
+            mreq = _ip_bytes(group) + _ip_bytes("0.0.0.0")
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+            except OSError as e:
+                print(f"Could not join {group}: {e}")
+        sock.setblocking(False)
+        self.sock = sock
+        return self
+
+    @property
+    def port(self):
+        return self.sock.getsockname()[1]
+
+    def poll(self):
+        """Handles every datagram already waiting; returns how many were read."""
+        n = 0
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(64)
+            except OSError:     # EAGAIN: nothing more waiting
+                return n
+            n += 1
+            command = unpack_command(data)
+            if command is None:
+                self.tracker.invalid += 1
+            elif self.tracker.accept(command):
+                self.handler(command)
+
+    async def serve(self):
+        while True:
+            # Yield after every batch, so a packet flood cannot starve the other tasks
+            await asyncio.sleep(0 if self.poll() else POLL_MS / 1000)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
@@ -0,0 +1,89 @@
+# scale.py
+# The light-to-pitch mapping: a light reading picks a note of the C major scale (on a
+# log scale by default). Kept apart from main.py so the desktop tools (batch.py) use the
+# exact same mapping without importing the firmware and its `machine` module.
+
+import math
+
+C_MAJOR_MIDI = [
+    48, 50, 52, 53, 55, 57, 59,
+    60, 62, 64, 65, 67, 69, 71,
+    72, 74, 76, 77, 79, 81, 83,
+    84
+]
+
+
+def midi_to_freq(midi_note):
+    return 440 * (2 ** ((midi_note - 69) / 12))
+
+
+def lux_to_index(x, theMin, theMax, use_log=True):
+    """Index into C_MAJOR_MIDI for a light reading (bright/low reading = high note)."""
+    if use_log:
+        log_min = math.log(theMin)
+        log_max = math.log(theMax)
+        t = (math.log(x) - log_min) / (log_max - log_min)
+    else:
+        t = (x - theMin) / (theMax - theMin)
+    t = 1 - t
+    t = max(0, min(1, t))
+    return int(round(t * (len(C_MAJOR_MIDI) - 1)))
+
+
+def lux_to_freq(x, theMin, theMax, use_log=True):
+    midi_note = C_MAJOR_MIDI[lux_to_index(x, theMin, theMax, use_log)]
+    return midi_to_freq(midi_note)
+
+
+# --- Precomputed lux -> frequency mapping ---
+# The mapping is a step function of the 16-bit ADC reading, so it is fully described by
+# the reading where each step starts. Build it once, then each sample costs a binary
+# search over ~22 integers instead of three logs and a float power.
+ADC_MAX = 65535
+
+
+def build_lux_steps(theMin, theMax, use_log=True):
+    """Returns (starts, idxs): readings >= starts[i] map to C_MAJOR_MIDI[idxs[i]].
+
+    Gives exactly lux_to_index() for every integer reading 1..ADC_MAX (0 maps like 1,
+    where lux_to_freq would fail on log(0)).
+    """
+    lo = 1 if use_log else 0
+    idx = lux_to_index(lo, theMin, theMax, use_log)
+    last_idx = lux_to_index(ADC_MAX, theMin, theMax, use_log)
+    starts = [0]
+    idxs = [idx]
+    while idx != last_idx:
+        # lux_to_index() never increases with x: find the first reading past this step
+        a, b = lo, ADC_MAX
+        while b - a > 1:
+            mid = (a + b) // 2
+            if lux_to_index(mid, theMin, theMax, use_log) == idx:
+                a = mid
+            else:
+                b = mid
+        lo = b
+        idx = lux_to_index(lo, theMin, theMax, use_log)
+        starts.append(lo)
+        idxs.append(idx)
+    return starts, idxs
+
+
+def build_lux_table(theMin, theMax, use_log=True):
+    """Returns (starts, freqs): readings >= starts[i] map to freqs[i] until starts[i+1]."""
+    starts, idxs = build_lux_steps(theMin, theMax, use_log)
+    return starts, [midi_to_freq(C_MAJOR_MIDI[i]) for i in idxs]
+
+
+def lux_to_freq_lut(x, table):
+    """lux_to_freq() for an integer ADC reading, using a build_lux_table() table."""
+    starts, freqs = table
+    lo = 0
+    hi = len(starts) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) >> 1
+        if starts[mid] <= x:
+            lo = mid
+        else:
+            hi = mid - 1
+    return freqs[lo]
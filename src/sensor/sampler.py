@@ -0,0 +1,78 @@
+# sampler.py
+# Fixed-rate ADC sampling into a preallocated ring buffer, with cheap filtering.
+# Runs on the Pico: no per-sample allocation, integer math only.
+
+from array import array
+
+FILTER_MEAN = "mean"
+FILTER_MEDIAN = "median"
+
+
+class Sampler:
+    """Keeps the last `size` ADC readings and filters over the last `window` of them."""
+
+    def __init__(self, adc, size=256, window=8, filter_mode=FILTER_MEAN):
+        if not 0 < window <= size:
+            raise ValueError("window must be between 1 and size")
+        self.adc = adc
+        self.size = size
+        self.window = window
+        self.filter_mode = filter_mode
+        self.buf = array("H", (0 for _ in range(size)))
+        self.head = 0       # next slot to write
+        self.count = 0      # valid samples, up to size
+        self._sum = 0       # running sum of the last `window` samples
+        self._scratch = array("H", (0 for _ in range(window)))
+
+    def sample(self):
+        """Reads the ADC once and stores the reading."""
+        self.push(self.adc.read_u16())
+
+    def push(self, raw):
+        if self.count >= self.window:
+            self._sum -= self.buf[(self.head - self.window) % self.size]
+        self._sum += raw
+        self.buf[self.head] = raw
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def _ensure_sample(self):
+        if not self.count:
+            self.sample()
+
+    def latest(self):
+        """Most recent raw reading."""
+        self._ensure_sample()
+        return self.buf[(self.head - 1) % self.size]
+
+    def mean(self):
+        """Moving average over the window (O(1): kept as a running sum)."""
+        self._ensure_sample()
+        return self._sum // min(self.count, self.window)
+
+    def median(self):
+        """Median over the window, sorted in a preallocated scratch buffer."""
+        self._ensure_sample()
+        n = min(self.count, self.window)
+        scratch = self._scratch
+        for i in range(n):
+            value = self.buf[(self.head - 1 - i) % self.size]
+            j = i
+            while j > 0 and scratch[j - 1] > value:
+                scratch[j] = scratch[j - 1]
+                j -= 1
+            scratch[j] = value
+        return scratch[n // 2]
+
+    def filtered(self):
+        """The reading trigger and pitch logic should act on."""
+        if self.filter_mode == FILTER_MEDIAN:
+            return self.median()
+        return self.mean()
+
+    def history(self, n=None):
+        """Up to n most recent readings, oldest first (allocates: not for the hot loop)."""
+        n = self.count if n is None else min(n, self.count)
+        start = self.head - n
+        return [self.buf[(start + i) % self.size] for i in range(n)]
@@ -0,0 +1,64 @@
+# triggers.py
+# Table-driven light gestures: each rule watches the filtered reading for an edge
+# through its threshold, with hysteresis before it can fire again, and names the
+# pattern to play. One pass over the table per sample, constant work per rule.
+
+EDGE_FALLING = 0    # fires when the reading drops to/below threshold (brighter: sensor is inverted)
+EDGE_RISING = 1     # fires when the reading climbs to/above threshold (darker)
+
+
+class TriggerRule:
+    """One gesture: fire on entering the threshold bin, re-arm once past `rearm`."""
+
+    __slots__ = ("name", "pattern", "threshold", "rearm", "edge", "armed", "_was_in")
+
+    def __init__(self, name, pattern, threshold, rearm, edge=EDGE_FALLING):
+        if (edge == EDGE_FALLING and rearm <= threshold) or \
+                (edge == EDGE_RISING and rearm >= threshold):
+            raise ValueError("rearm level must be on the far side of the threshold")
+        self.name = name
+        self.pattern = pattern      # melody [(midi, beats), ...] or a PatternStore name
+        self.threshold = threshold
+        self.rearm = rearm
+        self.edge = edge
+        self.armed = True
+        self._was_in = False        # edge detector: was the last reading inside the bin?
+
+    def update(self, value, busy):
+        """Feeds one reading; returns True if the rule fires."""
+        if self.edge == EDGE_FALLING:
+            is_in = value <= self.threshold
+            past_rearm = value >= self.rearm
+        else:
+            is_in = value >= self.threshold
+            past_rearm = value <= self.rearm
+
+        fired = self.armed and not busy and is_in and not self._was_in
+        if fired:
+            self.armed = False
+        elif not self.armed and not busy and past_rearm:
+            self.armed = True
+        self._was_in = is_in
+        return fired
+
+
+class TriggerEngine:
+    """Evaluates a table of TriggerRules against each sample."""
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+
+    def add(self, rule):
+        self.rules.append(rule)
+
+    def update(self, value, busy=False):
+        """Runs every rule on one reading; returns the rule that fired, or None.
+
+        Only one pattern can play at a time: once a rule fires, later rules in the
+        table see busy=True for this sample (their edge detectors still update).
+        """
+        fired = None
+        for rule in self.rules:
+            if rule.update(value, busy or fired is not None):
+                fired = rule
+        return fired
@@ -0,0 +1,139 @@
+"""
+End-to-end benchmarks against a simulated fleet (see fleet.py):
+
+* onset skew of conductor.play_note_on_all_picos across the fleet,
+* dashboard refresh time (dashboard.poll_all),
+* PatternStore save/load throughput for each storage format.
+
+Results are written as JSON so runs can be compared from release to release:
+
+    python -m src.sim.bench --devices 16 --latency-ms 5 --jitter-ms 10 --out bench.json
+"""
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+
+from .. import conductor, dashboard
+from ..storage.note_event import NoteEvent
+from ..storage.pattern_store import PatternStore
+from .fleet import SimFleet
+
+RESULTS_VERSION = 1
+
+
+def summarize(values):
+    """count / mean / p50 / p95 / max of a list of numbers (empty -> count 0)."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    n = len(ordered)
+    return {
+        "count": n,
+        "mean": sum(ordered) / n,
+        "p50": ordered[(n - 1) // 2],
+        "p95": ordered[min(n - 1, int(n * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def bench_onset_skew(fleet, notes=20, note_ms=50, settle_s=0.3):
+    """Plays notes with play_note_on_all_picos; skew is the first-to-last onset in ms."""
+    saved = conductor.PICO_IPS
+    conductor.PICO_IPS = fleet.ips
+    skews = []
+    missed = 0
+    try:
+        for _ in range(notes):
+            fleet.clear()
+            conductor.play_note_on_all_picos(440, note_ms)
+            time.sleep(settle_s)    # let delayed requests land
+            onsets = [t for t in fleet.onsets("/tone") if t is not None]
+            missed += len(fleet.devices) - len(onsets)
+            if onsets:
+                skews.append((max(onsets) - min(onsets)) * 1000)
+    finally:
+        conductor.PICO_IPS = saved
+    result = summarize(skews)
+    result["missed_onsets"] = missed
+    return result
+
+
+def bench_dashboard_refresh(fleet, rounds=20):
+    """Wall time in ms for dashboard.poll_all() to refresh the whole fleet."""
+    times = []
+    offline = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        statuses = dashboard.poll_all(fleet.ips)
+        times.append((time.perf_counter() - start) * 1000)
+        offline += sum(1 for s in statuses if s["status"] != "ok")
+    result = summarize(times)
+    result["offline_results"] = offline
+    return result
+
+
+def bench_store(events=20000, rounds=3):
+    """PatternStore save / cold load throughput in events per second, per format."""
+    pattern = [NoteEvent(i * 10, 48 + i % 36, 0.5 + (i % 5) / 10, i % 4) for i in range(events)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("json", "bin"):
+            save_s = []
+            load_s = []
+            for _ in range(rounds):
+                store = PatternStore(tmp, fmt=fmt, cache_events=0)
+                start = time.perf_counter()
+                store.save("bench", {"fmt": fmt}, pattern)
+                save_s.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                store.load("bench")
+                load_s.append(time.perf_counter() - start)
+            results[fmt] = {
+                "events": events,
+                "save_events_per_s": events / min(save_s),
+                "load_events_per_s": events / min(load_s),
+            }
+    return results
+
+
+def run_all(devices=8, latency_ms=5.0, jitter_ms=5.0, loss=0.0, notes=20, rounds=20,
+            store_events=20000, seed=1):
+    """Runs every benchmark; returns the results as a JSON-ready dict."""
+    with SimFleet(devices, latency_ms, jitter_ms, loss, seed=seed) as fleet:
+        onset_skew = bench_onset_skew(fleet, notes)
+        refresh = bench_dashboard_refresh(fleet, rounds)
+    return {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "fleet": {"devices": devices, "latency_ms": latency_ms, "jitter_ms": jitter_ms,
+                  "loss": loss},
+        "onset_skew_ms": onset_skew,
+        "dashboard_refresh_ms": refresh,
+        "store": bench_store(store_events),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the conductor and dashboard "
+                                                 "against a simulated Pico fleet.")
+    parser.add_argument("--devices", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--notes", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--store-events", type=int, default=20000)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_all(args.devices, args.latency_ms, args.jitter_ms, args.loss, args.notes,
+                      args.rounds, args.store_events)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
@@ -0,0 +1,234 @@
+"""
+A simulated fleet of Pico device services, for exercising the conductor and dashboard
+on one computer. Each SimDevice is an in-process HTTP server speaking the device API
+(/health, /sensor, /status, /time, /clock, /tone, /melody, /metrics) that holds every
+request for a configurable latency plus random jitter, and drops a configurable
+fraction of them. Devices record when each tone or melody would have started, so tests and
+benchmarks can measure onset skew across the fleet.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ..metrics.histogram import Histogram
+
+API_VERSION = "1.0.0"
+MIN_LIGHT = 2000
+MAX_LIGHT = 40000
+
+
+class _DeviceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the firmware's server
+
+    def setup(self):
+        super().setup()
+        self.server.device.count_connection()
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        device = self.server.device
+        body = self._body() if method == "POST" else None
+        if not device.deliver():
+            self.close_connection = True    # lost: the device never answers
+            return
+        handler = device.routes.get((method, self.path))
+        if handler is None:
+            self._reply(404, {"error": "Not Found"})
+            return
+        try:
+            self._reply(*handler(body))
+        except (KeyError, TypeError, ValueError) as e:
+            self._reply(400, {"error": f"bad request body: {e}"})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, *args):
+        pass
+
+
+class SimDevice:
+    """One simulated Pico.
+
+    latency_ms is added to every request, plus a uniform random 0..jitter_ms; loss is
+    the probability (0-1) that a request is dropped without a reply. The light sensor
+    follows a slow sine wave, with each device at its own phase.
+    """
+
+    def __init__(self, name="sim", latency_ms=0.0, jitter_ms=0.0, loss=0.0, seed=None,
+                 host="127.0.0.1", port=0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.phase = self.random.random() * 2 * math.pi
+        self.requests = 0
+        self.dropped = 0
+        self.connections = 0    # TCP connections accepted (keep-alive reuse keeps it low)
+        self.onsets = []        # (wall-clock seconds, path) of every tone / melody start
+        self.clock_offset_ms = 0
+        self.delays = Histogram()   # latency applied to each request (/metrics handler_us)
+        self._lock = threading.Lock()
+        self.routes = {
+            ("GET", "/health"): self.handle_health,
+            ("GET", "/sensor"): self.handle_sensor,
+            ("GET", "/status"): self.handle_status,
+            ("GET", "/time"): self.handle_time,
+            ("POST", "/clock"): self.handle_clock,
+            ("POST", "/tone"): self.handle_tone,
+            ("POST", "/melody"): self.handle_melody,
+            ("GET", "/metrics"): self.handle_metrics,
+        }
+        self.server = ThreadingHTTPServer((host, port), _DeviceHandler)
+        self.server.daemon_threads = True
+        self.server.device = self
+        self._thread = None
+
+    @property
+    def address(self):
+        """host:port, the form the conductor and dashboard use for PICO_IPS."""
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, args=(0.01,),
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def deliver(self):
+        """Applies latency and jitter; returns False if this request is lost."""
+        with self._lock:
+            self.requests += 1
+            lost = self.random.random() < self.loss
+            delay_ms = self.latency_ms + self.random.random() * self.jitter_ms
+            if lost:
+                self.dropped += 1
+            else:
+                self.delays.record(int(delay_ms * 1000))
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        return not lost
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def clear(self):
+        with self._lock:
+            self.onsets = []
+
+    def _record_onset(self, at, path):
+        with self._lock:
+            self.onsets.append((at, path))
+
+    def raw_reading(self):
+        t = time.time() / 5 + self.phase
+        return int(MIN_LIGHT + (MAX_LIGHT - MIN_LIGHT) * (0.5 + 0.5 * math.sin(t)))
+
+    def handle_health(self, body=None):
+        return 200, {"status": "ok", "device_id": f"pico-w-{self.name}", "api": API_VERSION}
+
+    def handle_sensor(self, body=None):
+        raw = self.raw_reading()
+        norm = 1 - (raw - MIN_LIGHT) / (MAX_LIGHT - MIN_LIGHT)
+        r_kohm = 10 * raw / max(1, 65535 - raw)
+        return 200, {"raw": raw, "norm": round(norm, 3), "lux_est": round(500 / r_kohm, 1)}
+
+    def handle_status(self, body=None):
+        status = self.handle_health()[1]
+        status.update(self.handle_sensor()[1])
+        return 200, status
+
+    def handle_time(self, body=None):
+        now = int(time.time() * 1000) - self.clock_offset_ms
+        return 200, {"t1": now, "t2": now}
+
+    def handle_clock(self, body):
+        return 200, {"offset_ms": body["offset_ms"], "drift_ppm": body.get("drift_ppm", 0.0),
+                     "synced": True}
+
+    def handle_metrics(self, body=None):
+        idle = Histogram().to_dict()
+        return 200, {"device_id": f"pico-w-{self.name}", "tick_ms": 50,
+                     "tick_jitter_us": idle, "tick_work_us": idle,
+                     "handler_us": self.delays.to_dict(), "onset_late_us": idle}
+
+    def handle_tone(self, body):
+        ms = int(body["ms"])
+        self._record_onset(time.time(), "/tone")
+        return 202, {"playing": True, "until_ms_from_now": ms}
+
+    def handle_melody(self, body):
+        notes = body["notes"]
+        start_at_ms = body.get("start_at_ms")
+        at = time.time()
+        if start_at_ms is not None:
+            at = max(at, start_at_ms / 1000)
+        self._record_onset(at, "/melody")
+        return 202, {"queued": len(notes)}
+
+
+class SimFleet:
+    """n SimDevices sharing the same network conditions; a context manager."""
+
+    def __init__(self, n=8, latency_ms=0.0, jitter_ms=0.0, loss=0.0, seed=None):
+        rng = random.Random(seed)
+        self.devices = [
+            SimDevice(f"SIM{i:04d}", latency_ms, jitter_ms, loss, seed=rng.random())
+            for i in range(n)
+        ]
+
+    @property
+    def ips(self):
+        return [d.address for d in self.devices]
+
+    def start(self):
+        for device in self.devices:
+            device.start()
+        return self
+
+    def stop(self):
+        for device in self.devices:
+            device.stop()
+
+    def clear(self):
+        for device in self.devices:
+            device.clear()
+
+    def onsets(self, path=None):
+        """Each device's first recorded onset (for path, if given), None if it has none."""
+        firsts = []
+        for device in self.devices:
+            times = [t for t, p in device.onsets if path is None or p == path]
+            firsts.append(min(times) if times else None)
+        return firsts
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,229 @@
+"""
+Replays a recorded ADC trace through the firmware's main loop in virtual time.
+
+The firmware (main.main) runs unchanged on an asyncio event loop whose clock only
+moves when every task is waiting: instead of blocking, the loop jumps straight to the
+next timer. The ADC reads from the trace at the current virtual time and every PWM
+freq/duty write is captured with its virtual timestamp, so an hour of light data
+replays in seconds with the real sampler, trigger and pitch logic.
+
+Both firmware clocks (ticks_ms and ticks_us) read virtual time, and the replay gets
+fresh instrumentation histograms, so tick jitter and note-onset lateness come out in
+virtual time too. Work durations (tick_work_us) read 0: virtual time stands still
+while code runs.
+"""
+
+import asyncio
+import selectors
+import time
+
+from .. import main, timebase
+from ..audio.actuator import PwmActuator
+from ..audio.player import Player
+from ..metrics.histogram import Histogram
+from ..sensor.sampler import Sampler
+from ..sensor.triggers import TriggerEngine, TriggerRule
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    """Never blocks: a select() that would wait moves the loop's clock forward instead."""
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._selector = selectors.DefaultSelector()    # the loop's own wake-up pipe
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError("virtual-time loop would wait forever: no timers pending")
+        self._loop.advance(timeout)
+        return self._selector.select(0)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """An event loop whose time() is virtual seconds since the loop was created."""
+
+    def __init__(self):
+        self._now = 0.0
+        super().__init__(_VirtualSelector(self))
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        self._now += max(0.0, seconds)
+
+    def ticks_ms(self):
+        # Rounded: truncating 4.9999 to 4 would wake every deadline a tick late
+        return int(self._now * 1000 + 0.5)
+
+
+class TraceSampler(Sampler):
+    """The firmware's Sampler, fed from a trace instead of an ADC.
+
+    sample_loop() would wake SAMPLE_RATE_HZ times a second just to read the ADC. Here
+    the readings the loop would have taken (one per sample period, up to the current
+    virtual time) are pushed when the buffer is next read, which gives the same buffer
+    contents without the wake-ups.
+    """
+
+    def __init__(self, trace, trace_rate_hz, sample_rate_hz, loop, size, window):
+        super().__init__(None, size, window)
+        self.trace = trace
+        self.trace_rate_hz = trace_rate_hz
+        self.period_ms = 1000 // sample_rate_hz
+        self.loop = loop
+        self.next_ms = 0
+        self.reads = 0
+
+    def catch_up(self):
+        now = self.loop.ticks_ms()
+        last = len(self.trace) - 1
+        while self.next_ms <= now:
+            self.push(self.trace[min(self.next_ms * self.trace_rate_hz // 1000, last)])
+            self.next_ms += self.period_ms
+            self.reads += 1
+
+    def _ensure_sample(self):
+        self.catch_up()
+
+    def history(self, n=None):
+        self.catch_up()
+        return super().history(n)
+
+
+class CapturePWM:
+    """machine.PWM stand-in recording (virtual ms, "freq" | "duty", value) writes."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.writes = []
+
+    def freq(self, value=None):
+        if value is not None:
+            self.writes.append((self.loop.ticks_ms(), "freq", value))
+
+    def duty_u16(self, value=None):
+        if value is not None:
+            self.writes.append((self.loop.ticks_ms(), "duty", value))
+
+    def deinit(self):
+        pass
+
+
+class _RecordingEngine(TriggerEngine):
+    """TriggerEngine that notes (virtual ms, rule name) each time a rule fires."""
+
+    def __init__(self, rules, loop):
+        super().__init__(rules)
+        self.loop = loop
+        self.fired = []
+
+    def update(self, value, busy=False):
+        rule = super().update(value, busy)
+        if rule is not None:
+            self.fired.append((self.loop.ticks_ms(), rule.name))
+        return rule
+
+
+class ReplayResult:
+    def __init__(self, writes, triggers, virtual_s, wall_s, adc_reads, metrics):
+        self.writes = writes        # [(ms, "freq" | "duty", value), ...]
+        self.triggers = triggers    # [(ms, rule name), ...]
+        self.virtual_s = virtual_s
+        self.wall_s = wall_s
+        self.adc_reads = adc_reads
+        self.metrics = metrics      # /metrics histogram name -> Histogram, in virtual time
+
+    @property
+    def speedup(self):
+        return self.virtual_s / self.wall_s if self.wall_s else float("inf")
+
+    def sounding(self):
+        """[(ms, freq)] each time the tone changes; freq 0 while muted."""
+        out = []
+        freq = 0
+        duty = 0
+        for t, kind, value in self.writes:
+            if kind == "freq":
+                freq = value
+            else:
+                duty = value
+            current = freq if duty else 0
+            if not out or out[-1][1] != current:
+                out.append((t, current))
+        return out
+
+
+def _fresh_rules(rules):
+    return [TriggerRule(r.name, r.pattern, r.threshold, r.rearm, r.edge) for r in rules]
+
+
+def replay_trace(trace, rate_hz=None, rules=None, tail_s=0.0):
+    """Runs main.main() over an ADC trace sampled at rate_hz (default SAMPLE_RATE_HZ).
+
+    rules defaults to main.TRIGGER_RULES (with fresh arming state). Playback runs on
+    for tail_s after the trace ends. The firmware's globals are restored afterwards. If
+    the firmware loop raises, so does the replay.
+    """
+    rate_hz = rate_hz or main.SAMPLE_RATE_HZ
+    duration_s = len(trace) / rate_hz + tail_s
+    loop = VirtualTimeLoop()
+    sampler = TraceSampler(trace, rate_hz, main.SAMPLE_RATE_HZ, loop,
+                           main.SAMPLE_HISTORY, main.SAMPLE_WINDOW)
+    pwm = CapturePWM(loop)
+    buzzer = PwmActuator(pwm)
+    metrics = {"tick_jitter_us": Histogram(), "tick_work_us": Histogram(),
+               "onset_late_us": Histogram()}
+    engine = _RecordingEngine(_fresh_rules(rules or main.TRIGGER_RULES), loop)
+
+    async def sample_loop():
+        await asyncio.sleep(duration_s)     # TraceSampler samples on demand
+
+    patches = [
+        (main, "tick_jitter", metrics["tick_jitter_us"]),
+        (main, "tick_work", metrics["tick_work_us"]),
+        (main, "buzzer_pin", pwm),
+        (main, "sampler", sampler),
+        (main, "sample_loop", sample_loop),
+        (main, "buzzer", buzzer),
+        (main, "player", Player(buzzer, main.clock_ms,
+                                onset_hist=metrics["onset_late_us"])),
+        (main, "triggers", engine),
+    ]
+    saved = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    for module, name, value in patches:
+        setattr(module, name, value)
+    real_seconds = timebase.set_time_source(loop.time)   # every module's ticks_*()
+
+    wall_start = time.perf_counter()
+    try:
+        task = loop.create_task(main.main(port=None, note_port=None))
+        loop.run_until_complete(asyncio.sleep(duration_s))
+        pending = asyncio.all_tasks(loop)
+        for t in pending:
+            t.cancel()
+        loop.run_until_complete(asyncio.gather(task, *pending, return_exceptions=True))
+        if not task.cancelled():
+            task.result()   # the firmware loop died mid-trace: raise what killed it
+    finally:
+        loop.close()
+        timebase.set_time_source(real_seconds)
+        for module, name, value in saved:
+            setattr(module, name, value)
+    return ReplayResult(pwm.writes, engine.fired, duration_s,
+                        time.perf_counter() - wall_start, sampler.reads, metrics)
@@ -0,0 +1,24 @@
+import os
+
+
+def sync_file(f):
+    """Flush a file and make sure its contents reached storage."""
+    f.flush()
+    try:
+        os.fsync(f.fileno())
+    except (AttributeError, OSError):
+        pass    # MicroPython: flush() already commits to the filesystem
+
+
+def replace_file(src: str, dst: str):
+    """Atomically move src over dst (as far as the filesystem allows)."""
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # MicroPython has no os.replace; littlefs renames over an existing file, FAT
+        # needs it removed first
+        try:
+            os.rename(src, dst)
+        except OSError:
+            os.remove(dst)
+            os.rename(src, dst)
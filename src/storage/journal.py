@@ -0,0 +1,122 @@
+import os
+import struct
+from binascii import crc32
+from typing import Dict, Iterator, Optional
+from .fileutil import replace_file, sync_file
+from .note_event import NoteEvent, EVENT_FORMAT, EVENT_SIZE
+
+# Journal layout: a sequence of self-checking chunks, each a header followed by `count`
+# packed NoteEvent records. A chunk is only trusted if its CRC matches, so a power loss
+# in the middle of a write costs at most that one chunk.
+CHUNK_MAGIC = b"JC"
+CHUNK_HEADER = "<2sHI"      # magic, event count, crc32 of the records
+CHUNK_HEADER_SIZE = struct.calcsize(CHUNK_HEADER)
+
+
+class RecordingJournal:
+    """
+    Append-only recorder for live NoteEvent capture.
+    Events are packed into a preallocated buffer and written one chunk at a time, so
+    recording never holds more than chunk_size events in RAM or rewrites the file.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 32):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._buf = bytearray(chunk_size * EVENT_SIZE)
+        self._count = 0
+        self._recover()
+        self._file = open(path, "ab")     # None once closed
+
+    def _recover(self):
+        """Cut a torn chunk left by a crash off the end, so new chunks stay readable."""
+        try:
+            size = os.stat(self.path)[6]
+        except OSError:
+            return
+        valid = self.valid_length(self.path)
+        if valid == size:
+            return
+        if hasattr(os, "truncate"):
+            os.truncate(self.path, valid)
+            return
+        tmp_path = self.path + ".tmp"
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            while valid > 0:
+                block = src.read(min(512, valid))
+                dst.write(block)
+                valid -= len(block)
+        replace_file(tmp_path, self.path)
+
+    def append(self, event: NoteEvent):
+        """Buffer one event; writes a chunk once chunk_size events are waiting."""
+        if self._file is None:
+            raise ValueError(f"Journal {self.path} is closed")
+        struct.pack_into(EVENT_FORMAT, self._buf, self._count * EVENT_SIZE,
+                         event.timestamp_ms, event.pitch, event.magnitude, event.channel)
+        self._count += 1
+        if self._count == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered events as one chunk and commit it to storage."""
+        if not self._count:
+            return
+        records = memoryview(self._buf)[:self._count * EVENT_SIZE]
+        self._file.write(struct.pack(CHUNK_HEADER, CHUNK_MAGIC, self._count, crc32(records)))
+        self._file.write(records)
+        sync_file(self._file)
+        self._count = 0
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _chunks(path: str) -> Iterator[bytes]:
+        """Yield the records of each intact chunk, stopping at the first damaged one."""
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(CHUNK_HEADER_SIZE)
+                if len(header) < CHUNK_HEADER_SIZE:
+                    return
+                magic, count, crc = struct.unpack(CHUNK_HEADER, header)
+                records = f.read(count * EVENT_SIZE)
+                if magic != CHUNK_MAGIC or len(records) < count * EVENT_SIZE \
+                        or crc32(records) != crc:
+                    return
+                yield records
+
+    @staticmethod
+    def valid_length(path: str) -> int:
+        """Number of bytes at the start of the journal made of intact chunks."""
+        return sum(CHUNK_HEADER_SIZE + len(r) for r in RecordingJournal._chunks(path))
+
+    @staticmethod
+    def iter_events(path: str) -> Iterator[NoteEvent]:
+        """Yield every event from the intact chunks of a journal file."""
+        for records in RecordingJournal._chunks(path):
+            for i in range(len(records) // EVENT_SIZE):
+                yield NoteEvent.unpack_from(records, i * EVENT_SIZE)
+
+    def compact(self, store, name: str, metadata: Dict, fmt: Optional[str] = "bin",
+                remove: bool = False):
+        """Save everything recorded so far as a regular PatternStore pattern.
+
+        remove=True also closes the journal and deletes its file; appending to it
+        afterwards raises ValueError.
+        """
+        self.flush()
+        store.save(name, metadata, self.iter_events(self.path), fmt=fmt)
+        if remove:
+            self.close()
+            os.remove(self.path)
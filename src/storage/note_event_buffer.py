@@ -0,0 +1,88 @@
+from array import array
+from typing import Iterable, Iterator, List
+from .note_event import NoteEvent, MAGNITUDE_DIGITS
+
+
+class NoteEventBuffer:
+    """
+    Struct-of-arrays storage for many NoteEvents.
+    Each field lives in its own array.array column (timestamp u32, pitch i16,
+    magnitude float32, channel u8), so an event costs 11 bytes instead of a Python
+    object. Magnitudes come back rounded like NoteEvent.unpack_from(). Slicing returns
+    a view over the same columns without copying.
+    """
+
+    __slots__ = ("_ts", "_pitch", "_mag", "_ch", "_start", "_stop")
+
+    def __init__(self):
+        self._ts = array("I")
+        self._pitch = array("h")
+        self._mag = array("f")
+        self._ch = array("B")
+        self._start = 0
+        self._stop = None   # None: the buffer owns its columns and can grow
+
+    @classmethod
+    def from_events(cls, events: Iterable[NoteEvent]) -> 'NoteEventBuffer':
+        buf = cls()
+        for e in events:
+            buf.append(e.timestamp_ms, e.pitch, e.magnitude, e.channel)
+        return buf
+
+    def to_events(self) -> List[NoteEvent]:
+        return list(self)
+
+    def append(self, timestamp_ms: int, pitch: int, magnitude: float, channel: int = 0):
+        if self._stop is not None:
+            raise TypeError("cannot append to a NoteEventBuffer slice")
+        self._ts.append(timestamp_ms)
+        self._pitch.append(pitch)
+        self._mag.append(magnitude)
+        self._ch.append(channel)
+
+    def append_event(self, event: NoteEvent):
+        self.append(event.timestamp_ms, event.pitch, event.magnitude, event.channel)
+
+    def _end(self) -> int:
+        return len(self._ts) if self._stop is None else self._stop
+
+    def __len__(self) -> int:
+        return self._end() - self._start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("NoteEventBuffer slices must be contiguous")
+            view = NoteEventBuffer.__new__(NoteEventBuffer)
+            view._ts, view._pitch, view._mag, view._ch = self._ts, self._pitch, self._mag, self._ch
+            view._start = self._start + start
+            view._stop = self._start + max(start, stop)
+            return view
+        n = len(self)
+        if key < 0:
+            key += n
+        if not 0 <= key < n:
+            raise IndexError("NoteEventBuffer index out of range")
+        i = self._start + key
+        return NoteEvent(self._ts[i], self._pitch[i], round(self._mag[i], MAGNITUDE_DIGITS),
+                         self._ch[i])
+
+    def __iter__(self) -> Iterator[NoteEvent]:
+        ts, pitch, mag, ch = self._ts, self._pitch, self._mag, self._ch
+        for i in range(self._start, self._end()):
+            yield NoteEvent(ts[i], pitch[i], round(mag[i], MAGNITUDE_DIGITS), ch[i])
+
+    # Zero-copy column access. While a returned memoryview is alive the owning buffer
+    # cannot grow (array.array refuses to resize an exported buffer).
+    def timestamps(self) -> memoryview:
+        return memoryview(self._ts)[self._start:self._end()]
+
+    def pitches(self) -> memoryview:
+        return memoryview(self._pitch)[self._start:self._end()]
+
+    def magnitudes(self) -> memoryview:
+        return memoryview(self._mag)[self._start:self._end()]
+
+    def channels(self) -> memoryview:
+        return memoryview(self._ch)[self._start:self._end()]
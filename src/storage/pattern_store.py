@@ -1,58 +1,353 @@
 import json
 import os
-from typing import List, Dict, Tuple
-from .note_event import NoteEvent
+import struct
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+from .fileutil import replace_file, sync_file
+from .note_event import NoteEvent, EVENT_FORMAT, EVENT_SIZE
+
+# Packed binary patterns: header, metadata as JSON, then one fixed-width record per event.
+# The magic number lets load() tell the formats apart without trusting the extension.
+BINARY_MAGIC = b"PLO1"
+BINARY_HEADER = "<4sII"     # magic, metadata length, event count
+BINARY_HEADER_SIZE = struct.calcsize(BINARY_HEADER)
+
+FORMAT_EXTENSIONS = {"json": ".json", "bin": ".pat"}
+
+# Metadata index kept next to the patterns, so listing and searching never has to open
+# the pattern files. Its extension keeps it out of list_patterns(). It is re-read on every
+# use rather than cached, so several stores on one directory see each other's saves, and
+# checked against the directory listing so files copied onto the board get indexed.
+INDEX_FILE = "patterns.idx"
+
+# Binary saves pack this many records into one buffer per write() call
+WRITE_BATCH = 64
 
 
 class PatternStore:
     """
     Manages saving, loading, and listing patterns.
-    Each pattern is stored as a JSON file with metadata and events.
+    Each pattern is stored as a JSON file with metadata and events, or as a packed
+    binary file (fmt="bin") that is smaller and faster to load on the Pico.
+    Files are written to a temporary name and renamed into place, so a reset mid-save
+    leaves the previous version intact. Recently loaded patterns are kept in an LRU
+    cache of up to cache_events events, so repeated playback does not touch flash.
     """
 
-    def __init__(self, base_path: str = "/patterns"):
+    def __init__(self, base_path: str = "/patterns", fmt: str = "json",
+                 cache_events: int = 2048):
+        if fmt not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unknown pattern format: {fmt}")
         self.base_path = base_path
+        self.fmt = fmt
+        self.cache_events = cache_events
+        self._cache: OrderedDict = OrderedDict()   # name -> (metadata, events)
+        self._cached_events = 0
         try:
             os.mkdir(self.base_path)
         except OSError:
             pass
 
-    def save(self, name: str, metadata: Dict, events: List[NoteEvent]):
-        """Save a pattern to storage."""
+    def _path(self, name: str, fmt: str) -> str:
+        return f"{self.base_path}/{name}{FORMAT_EXTENSIONS[fmt]}"
+
+    def _find(self, name: str) -> str:
+        """Path of the saved pattern in whichever format it was written."""
+        for fmt in FORMAT_EXTENSIONS:
+            file_path = self._path(name, fmt)
+            try:
+                os.stat(file_path)
+                return file_path
+            except OSError:
+                pass
+        raise OSError(2, "No such pattern", name)   # ENOENT
+
+    def save(self, name: str, metadata: Dict, events: Iterable[NoteEvent],
+             fmt: Optional[str] = None):
+        """Save a pattern to storage, in the store's format unless fmt is given.
+
+        events may be any iterable; binary saves stream it without building a list.
+        Binary saves store magnitudes as float32: they load back rounded to
+        MAGNITUDE_DIGITS (6) decimals, so e.g. 0.8 stays 0.8 but 1/3 loses precision.
+        """
+
+        fmt = fmt or self.fmt
+        file_path = self._path(name, fmt)
+        tmp_path = file_path + ".tmp"
+        info = {"metadata": metadata, "format": fmt}
+        events = self._summarize(events, info)
+        self._evict(name)
+        if fmt == "bin":
+            meta = json.dumps(metadata).encode()
+            with open(tmp_path, "wb") as f:
+                f.write(struct.pack(BINARY_HEADER, BINARY_MAGIC, len(meta), 0))
+                f.write(meta)
+                count = self._write_records(f, events)
+                # The event count is only known now: patch it into the header
+                f.seek(0)
+                f.write(struct.pack(BINARY_HEADER, BINARY_MAGIC, len(meta), count))
+                sync_file(f)
+        else:
+            data = {
+                "metadata": metadata,
+                "events": [e.to_dict() for e in events]
+            }
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+                sync_file(f)
+        replace_file(tmp_path, file_path)
+
+        # Drop a copy left behind in the other format
+        for other in FORMAT_EXTENSIONS:
+            if other != fmt:
+                try:
+                    os.remove(self._path(name, other))
+                except OSError:
+                    pass
+
+        index = self._read_index()
+        index[name] = info
+        self._write_index(index)
+
+    @staticmethod
+    def _write_records(f, events: Iterable[NoteEvent]) -> int:
+        """Write packed events WRITE_BATCH at a time; returns how many were written."""
+        buf = bytearray(WRITE_BATCH * EVENT_SIZE)
+        view = memoryview(buf)
+        count = 0
+        n = 0
+        for e in events:
+            struct.pack_into(EVENT_FORMAT, buf, n * EVENT_SIZE,
+                             e.timestamp_ms, e.pitch, e.magnitude, e.channel)
+            n += 1
+            if n == WRITE_BATCH:
+                f.write(buf)
+                count += n
+                n = 0
+        if n:
+            f.write(view[:n * EVENT_SIZE])
+        return count + n
 
-        file_path = f"{self.base_path}/{name}.json"
-        data = {
-            "metadata": metadata,
-            "events": [e.to_dict() for e in events]
-        }
+    def _evict(self, name: str):
+        entry = self._cache.pop(name, None)
+        if entry is not None:
+            self._cached_events -= len(entry[1])
 
-        with open(file_path, "w") as f:
-            json.dump(data, f)
+    def _remember(self, name: str, metadata: Dict, events: List[NoteEvent]):
+        """Add a loaded pattern to the LRU cache, evicting the oldest to stay in budget."""
+        if len(events) > self.cache_events:
+            return
+        self._evict(name)
+        while self._cached_events + len(events) > self.cache_events:
+            self._evict(next(iter(self._cache)))
+        self._cache[name] = (metadata, events)
+        self._cached_events += len(events)
+
+    @staticmethod
+    def _summarize(events: Iterable[NoteEvent], info: Dict) -> Iterator[NoteEvent]:
+        """Pass events through while collecting the index fields into info."""
+        count = 0
+        duration = 0
+        low = high = None
+        for e in events:
+            count += 1
+            duration = max(duration, e.timestamp_ms)
+            low = e.pitch if low is None else min(low, e.pitch)
+            high = e.pitch if high is None else max(high, e.pitch)
+            yield e
+        info.update({"events": count, "duration_ms": duration,
+                     "pitch_min": low, "pitch_max": high})
 
     def load(self, name: str) -> Tuple[Dict, List[NoteEvent]]:
-        """Load a pattern from storage."""
+        """Load a pattern from storage (or the cache).
+
+        The returned dict and list are copies, but cached NoteEvents are shared between
+        loads: treat them as read-only.
+        """
+
+        entry = self._cache.pop(name, None)
+        if entry is None:
+            entry = self._read(name)
+            self._remember(name, *entry)
+        else:
+            self._cache[name] = entry   # most recently used goes last
+        metadata, events = entry
 
-        file_path = f"{self.base_path}/{name}.json"
-        with open(file_path, "r") as f:
-            data = json.load(f)
+        return dict(metadata), list(events)
+
+    def _read(self, name: str) -> Tuple[Dict, List[NoteEvent]]:
+        file_path = self._find(name)
+        with open(file_path, "rb") as f:
+            if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+                return self._load_binary(f)
+            f.seek(0)
+            data = json.loads(f.read())
         metadata = data.get("metadata", {})
         events = [NoteEvent.from_dict(e) for e in data.get("events", [])]
 
         return metadata, events
 
+    def _load_binary(self, f) -> Tuple[Dict, List[NoteEvent]]:
+        meta_len, count = self._read_header(f)
+        metadata = json.loads(f.read(meta_len))
+        records = f.read(count * EVENT_SIZE)
+        events = [NoteEvent.unpack_from(records, i * EVENT_SIZE) for i in range(count)]
+
+        return metadata, events
+
+    @staticmethod
+    def _read_header(f) -> Tuple[int, int]:
+        """Reads a binary pattern header; returns (metadata length, event count)."""
+        f.seek(0)
+        _, meta_len, count = struct.unpack(BINARY_HEADER, f.read(BINARY_HEADER_SIZE))
+        return meta_len, count
+
+    @staticmethod
+    def _first_index_at(f, first: int, count: int, start_ms: int) -> int:
+        """Binary search for the first record with timestamp_ms >= start_ms."""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(first + mid * EVENT_SIZE)
+            if struct.unpack(EVENT_FORMAT, f.read(EVENT_SIZE))[0] < start_ms:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def iter_events(self, name: str, start_ms: int = 0,
+                    chunk_size: int = 64) -> Iterator[NoteEvent]:
+        """Yield a pattern's events from start_ms onwards without loading it whole.
+
+        Binary patterns seek straight to start_ms (events must be in timestamp order)
+        and are read chunk_size records at a time into one reused buffer, so memory
+        use does not grow with the pattern. JSON patterns are parsed in full first.
+        Cached patterns are served from RAM.
+        """
+
+        if name in self._cache:
+            for event in self.load(name)[1]:
+                if event.timestamp_ms >= start_ms:
+                    yield event
+            return
+
+        file_path = self._find(name)
+        with open(file_path, "rb") as f:
+            if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+                meta_len, count = self._read_header(f)
+                first = BINARY_HEADER_SIZE + meta_len
+                index = self._first_index_at(f, first, count, start_ms) if start_ms else 0
+                f.seek(first + index * EVENT_SIZE)
+                buf = bytearray(chunk_size * EVENT_SIZE)
+                view = memoryview(buf)
+                while index < count:
+                    n = min(chunk_size, count - index)
+                    f.readinto(view[:n * EVENT_SIZE])
+                    for i in range(n):
+                        yield NoteEvent.unpack_from(buf, i * EVENT_SIZE)
+                    index += n
+                return
+
+        for event in self.load(name)[1]:
+            if event.timestamp_ms >= start_ms:
+                yield event
+
+    def _scan_patterns(self) -> List[str]:
+        names = []
+        for f in os.listdir(self.base_path):
+            for ext in FORMAT_EXTENSIONS.values():
+                if f.endswith(ext) and f[:-len(ext)] not in names:
+                    names.append(f[:-len(ext)])
+        return names
+
+    def _read_index(self) -> Dict[str, Dict]:
+        """The index as it is on disk now ({} if it is missing or unreadable)."""
+        try:
+            with open(f"{self.base_path}/{INDEX_FILE}", "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _get_index(self) -> Dict[str, Dict]:
+        """The index, brought in line with the pattern files actually on disk.
+
+        Only files missing from the index are opened; entries whose file is gone are
+        dropped. The index file is rewritten only if something changed.
+        """
+        index = self._read_index()
+        names = self._scan_patterns()
+        changed = False
+        for name in names:
+            if name not in index:
+                index[name] = self._index_entry(name)
+                changed = True
+        for name in [n for n in index if n not in names]:
+            del index[name]
+            changed = True
+        if changed:
+            self._write_index(index)
+        return index
+
+    def _index_entry(self, name: str) -> Dict:
+        file_path = self._find(name)
+        fmt = "json" if file_path.endswith(FORMAT_EXTENSIONS["json"]) else "bin"
+        metadata, events = self.load(name)
+        info = {"metadata": metadata, "format": fmt}
+        for _ in self._summarize(events, info):
+            pass
+        return info
+
+    def _write_index(self, index: Dict[str, Dict]):
+        index_path = f"{self.base_path}/{INDEX_FILE}"
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(index, f)
+            sync_file(f)
+        replace_file(index_path + ".tmp", index_path)
+
+    def rebuild_index(self):
+        """Re-read every pattern file into the index (e.g. after a file was edited in place)."""
+        index = {name: self._index_entry(name) for name in self._scan_patterns()}
+        self._write_index(index)
+
     def list_patterns(self) -> List[str]:
         """List all saved patterns."""
 
-        return [f[:-5] for f in os.listdir(self.base_path) if f.endswith(".json")]
+        return list(self._get_index())
+
+    def pattern_info(self, pattern_name: str) -> Dict:
+        """Indexed summary of a pattern (metadata, format, events, duration, pitch range)."""
+
+        return self._get_index()[pattern_name]
+
+    def find_patterns(self, predicate=None, **metadata) -> List[str]:
+        """Find patterns by metadata values, e.g. find_patterns(tempo=120).
+
+        predicate, if given, is called with each pattern_info() entry. Answered from the
+        index without opening any pattern file.
+        """
+
+        names = []
+        for name, info in self._get_index().items():
+            meta = info["metadata"]
+            if all(key in meta and meta[key] == value for key, value in metadata.items()) \
+                    and (predicate is None or predicate(info)):
+                names.append(name)
+        return names
 
     def delete(self, pattern_name: str):
         """Delete a pattern given a pattern name."""
 
-        file_path = f"{self.base_path}/{pattern_name}.json"
-        os.remove(file_path)
+        self._evict(pattern_name)
+        os.remove(self._find(pattern_name))
+        index = self._read_index()
+        if index.pop(pattern_name, None) is not None:
+            self._write_index(index)
 
     def exists(self, pattern_name: str) -> bool:
         """Check if a pattern exists given a pattern name."""
 
-        file_path = f"{self.base_path}/{pattern_name}.json"
-        return os.path.exists(file_path)
+        try:
+            self._find(pattern_name)
+            return True
+        except OSError:
+            return False
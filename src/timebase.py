@@ -0,0 +1,45 @@
+# timebase.py
+# The firmware's tick clock, in one place. MicroPython has wrapping ticks_ms() /
+# ticks_us() with ticks_add() / ticks_diff() to do arithmetic on them; CPython (tests,
+# local runs, the simulators) falls back to plain integers from one monotonic seconds
+# source, so ms and us ticks always agree. sleep_until() sleeps to a ticks_ms deadline.
+
+import asyncio
+import time
+
+try:
+    ticks_ms = time.ticks_ms  # type: ignore[attr-defined]
+    ticks_us = time.ticks_us  # type: ignore[attr-defined]
+    ticks_add = time.ticks_add  # type: ignore[attr-defined]
+    ticks_diff = time.ticks_diff  # type: ignore[attr-defined]
+except AttributeError:      # CPython
+    _seconds = time.perf_counter
+
+    def ticks_ms():
+        # Rounded, so a source landing on 4.9999 ms still reads as the 5 ms deadline
+        return int(_seconds() * 1000 + 0.5)
+
+    def ticks_us():
+        return int(_seconds() * 1000000 + 0.5)
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+def set_time_source(seconds):
+    """CPython only: read the ticks from seconds() instead; returns the previous source.
+
+    Lets a simulator (e.g. a virtual-time event loop) drive every module's clock at once.
+    """
+    global _seconds
+    previous = _seconds
+    _seconds = seconds
+    return previous
+
+
+async def sleep_until(deadline):
+    """Sleeps until the given ticks_ms() deadline (returns at once if it has passed)."""
+    await asyncio.sleep(max(0, ticks_diff(deadline, ticks_ms())) / 1000)
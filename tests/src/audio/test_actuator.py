@@ -0,0 +1,69 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, call
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.audio.actuator import PwmActuator
+
+
+class TestPwmActuator(unittest.TestCase):
+    """Test cases for the write-coalescing PWM front end."""
+
+    def setUp(self):
+        self.pwm = MagicMock()
+        self.out = PwmActuator(self.pwm)
+
+    def test_repeated_note_writes_once(self):
+        """Test that re-requesting the sounding note touches no register."""
+        for _ in range(5):
+            self.out.play(440, 32768)
+        self.assertEqual(self.pwm.mock_calls, [call.freq(440), call.duty_u16(32768)])
+        self.assertEqual(self.out.stats(), {"writes": 2, "requests": 5})
+
+    def test_note_change_writes_freq_only(self):
+        """Test that a new pitch at the same duty writes just the frequency."""
+        self.out.play(440, 32768)
+        self.out.play(523, 32768)
+        self.assertEqual(self.pwm.mock_calls[2:], [call.freq(523)])
+
+    def test_silent_output_keeps_frequency(self):
+        """Test that muting writes duty only and a rest never reprograms the frequency."""
+        self.out.play(440, 32768)
+        self.out.mute()
+        self.out.play(523, 0)
+        self.out.mute()
+        self.assertEqual(self.pwm.mock_calls,
+                         [call.freq(440), call.duty_u16(32768), call.duty_u16(0)])
+        self.out.play(523, 32768)
+        self.assertEqual(self.pwm.mock_calls[3:], [call.freq(523), call.duty_u16(32768)])
+
+    def test_stage_defers_writes_until_apply(self):
+        """Test that staged changes reach the registers together, frequency first."""
+        self.out.stage(440, 16384)
+        self.assertEqual(self.pwm.mock_calls, [])
+        self.out.apply()
+        self.assertEqual(self.pwm.mock_calls, [call.freq(440), call.duty_u16(16384)])
+
+    def test_mute_keeps_staged_note(self):
+        """Test that muting between stage() and apply() does not drop the staged note."""
+        self.out.play(440, 32768)
+        self.out.stage(523, 32768)
+        self.out.mute()
+        self.out.apply()
+        self.assertEqual(self.pwm.mock_calls[2:],
+                         [call.duty_u16(0), call.freq(523), call.duty_u16(32768)])
+
+    def test_invalidate_forces_rewrite(self):
+        """Test that after invalidate() the next update writes every register again."""
+        self.out.play(440, 32768)
+        self.out.invalidate()
+        self.out.play(440, 32768)
+        self.assertEqual(self.out.writes, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import sys
+import os
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.audio.actuator import PwmActuator
+from src.audio.player import Player, ticks_ms
+
+
+class TestPlayer(unittest.TestCase):
+    """Test cases for the buzzer playback scheduler."""
+
+    def setUp(self):
+        self.pwm = MagicMock()
+        self.onsets = []
+        self.pwm.freq.side_effect = lambda f: self.onsets.append((f, ticks_ms()))
+
+    def test_no_drift_over_many_notes(self):
+        """Test that the last of many short notes starts on its absolute deadline."""
+        notes = [(400 + i, 5) for i in range(60)]
+
+        async def scenario():
+            player = Player(PwmActuator(self.pwm))
+            player.play(notes, gap_ms=2)
+            start = ticks_ms()
+            await player._task
+            return start
+
+        start = asyncio.run(scenario())
+        self.assertEqual(len(self.onsets), 60)
+        # 59 notes of 5ms + 2ms gap before the last one
+        self.assertAlmostEqual(self.onsets[-1][1] - start, 59 * 7, delta=15)
+        self.pwm.duty_u16.assert_called_with(0)
+
+    def test_queued_sequences_follow_on(self):
+        """Test that a queued sequence starts where the previous one ended."""
+        async def scenario():
+            player = Player(PwmActuator(self.pwm))
+            start = ticks_ms()
+            player.enqueue([(440, 30)], owner="a")
+            player.enqueue([(523, 30)], owner="b")
+            await asyncio.sleep(0.01)
+            owner = player.owner
+            await player._task
+            return start, owner, player.owner
+
+        start, first_owner, last_owner = asyncio.run(scenario())
+        self.assertEqual([f for f, _ in self.onsets], [440, 523])
+        self.assertAlmostEqual(self.onsets[1][1] - start, 30, delta=10)
+        self.assertEqual((first_owner, last_owner), ("a", None))
+
+    def test_queue_is_bounded(self):
+        """Test that enqueue() refuses sequences once the queue is full."""
+        async def scenario():
+            player = Player(PwmActuator(self.pwm), max_queue=2)
+            results = [player.enqueue([(440, 50)]) for _ in range(4)]
+            player.stop()
+            return results
+
+        # the first is taken off the queue only once the task runs
+        self.assertEqual(asyncio.run(scenario()), [True, True, False, False])
+
+    def test_play_preempts_immediately(self):
+        """Test that play() silences the current sequence and drops the queue."""
+        async def scenario():
+            player = Player(PwmActuator(self.pwm))
+            player.play([(440, 1000)])
+            player.enqueue([(660, 10)])
+            await asyncio.sleep(0.01)
+            player.play([(523, 10)], owner="new")
+            owner = player.owner
+            await asyncio.sleep(0.05)
+            return owner, player
+
+        owner, player = asyncio.run(scenario())
+        self.assertEqual([f for f, _ in self.onsets], [440, 523])
+        self.assertEqual(owner, "new")
+        self.assertFalse(player.busy)
+
+    def test_outside_mute_keeps_next_note(self):
+        """Test that muting the output mid-note does not cancel the next staged note."""
+        async def scenario():
+            output = PwmActuator(self.pwm)
+            player = Player(output)
+            player.play([(440, 40), (523, 40)])
+            await asyncio.sleep(0.02)
+            output.mute()
+            await player._task
+
+        asyncio.run(scenario())
+        self.assertEqual([f for f, _ in self.onsets], [440, 523])
+
+    def test_start_at_uses_clock(self):
+        """Test that start_at_ms is converted through the given clock."""
+        offset = 1000000
+
+        async def scenario():
+            player = Player(PwmActuator(self.pwm), clock_ms=lambda: ticks_ms() + offset)
+            start = ticks_ms()
+            player.play([(440, 10)], start_at_ms=start + offset + 40)
+            await player._task
+            return start
+
+        start = asyncio.run(scenario())
+        self.assertAlmostEqual(self.onsets[0][1] - start, 40, delta=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import os
+import subprocess
+import tempfile
+import unittest
+import wave
+from array import array
+from unittest.mock import MagicMock, patch
+
+
+sys.modules['machine'] = MagicMock()
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..', '..')
+sys.path.insert(0, ROOT)
+
+from src.audio import render
+from src.audio.render import render_notes, render_events, render_pattern, render_steps
+from src.storage.note_event import NoteEvent
+from src.storage.pattern_store import PatternStore
+
+
+def read_samples(path):
+    with wave.open(path, "rb") as wav:
+        rate = wav.getframerate()
+        samples = array("h", wav.readframes(wav.getnframes()))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return rate, samples
+
+
+def rising_edges(samples):
+    return sum(1 for a, b in zip(samples, samples[1:]) if a < 0 <= b)
+
+
+class TestRender(unittest.TestCase):
+    """Test cases for offline WAV rendering."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out.wav")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_notes_length_and_pitch(self):
+        """Test that each note lasts its ms and plays at its frequency."""
+        samples_written = render_notes([(440, 500), (880, 250)], self.path, gap_ms=250)
+        rate, samples = read_samples(self.path)
+        self.assertEqual(samples_written, len(samples))
+        self.assertEqual(len(samples), rate * 5 // 4)   # each note is followed by its gap
+        first = samples[:rate // 2]
+        self.assertAlmostEqual(rising_edges(first), 220, delta=2)
+        self.assertTrue(all(s == 0 for s in samples[rate // 2:rate * 3 // 4]))
+
+    def test_events_mix_channels(self):
+        """Test that overlapping channels are summed and a zero magnitude is a rest."""
+        events = [NoteEvent(0, 69, 1.0, 0), NoteEvent(0, 69, 1.0, 1),
+                  NoteEvent(100, 69, 0.0, 1)]
+        render_events(events, self.path, last_ms=200)
+        rate, samples = read_samples(self.path)
+        self.assertEqual(len(samples), rate * 300 // 1000)
+        both = max(samples[:rate // 10])
+        alone = max(samples[rate // 10 + 10:rate * 3 // 10])
+        self.assertAlmostEqual(both, 2 * alone, delta=2)
+
+    def test_pattern_streams_in_small_blocks(self):
+        """Test rendering a stored pattern block by block."""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PatternStore(tmp, fmt="bin")
+            store.save("riff", {}, [NoteEvent(t * 50, 60 + t % 12, 1.0) for t in range(40)])
+            with patch.object(render, "BLOCK_SAMPLES", 64):
+                render_pattern(store, "riff", self.path, last_ms=50)
+        rate, samples = read_samples(self.path)
+        self.assertEqual(len(samples), rate * 2)
+
+    @unittest.skipIf(render.np is None, "NumPy not installed")
+    def test_numpy_and_pure_python_agree(self):
+        """Test that the fallback renders the same samples as the vectorised path."""
+        steps = [(0, 0, 440, 0.5), (0, 1, 523, 0.25), (30, 0, 0, 0.0), (60, 1, 0, 0.0)]
+        render_steps(steps, self.path, block=500)
+        expected = read_samples(self.path)[1]
+        with patch.object(render, "np", None):
+            render_steps(steps, self.path, block=500)
+        self.assertEqual(read_samples(self.path)[1], expected)
+
+    def test_command_line_runs_without_firmware(self):
+        """Test `python -m src.audio.render` in a fresh interpreter with no machine module."""
+        proc = subprocess.run([sys.executable, "-m", "src.audio.render", self.path],
+                              cwd=ROOT, capture_output=True, text=True, timeout=60)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        with wave.open(self.path, "rb") as wav:
+            self.assertGreater(wav.getnframes(), render.SAMPLE_RATE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.audio.synth import Synth, compile_pattern, magnitude_to_duty, MIDI_FREQS, DUTY_MAX
+from src.audio.player import ticks_ms
+from src.storage.note_event import NoteEvent
+from src.storage.pattern_store import PatternStore
+
+
+def recording_pwm(log, out):
+    """A mock PWM that logs (output, freq) on every freq() write."""
+    pwm = MagicMock()
+    pwm.freq.side_effect = lambda f: log.append((out, f, ticks_ms()))
+    return pwm
+
+
+class TestCompilePattern(unittest.TestCase):
+    """Test cases for compiling NoteEvents into PWM steps."""
+
+    def test_steps_carry_integer_pwm_parameters(self):
+        """Test that frequencies and duties are precomputed integers."""
+        events = [NoteEvent(0, 69, 1.0, 0), NoteEvent(0, 60, 0.5, 1),
+                  NoteEvent(100, 72, 0.0, 0)]
+        pattern = compile_pattern(events, last_ms=50)
+        self.assertEqual(list(pattern.times), [0, 0, 50, 100, 150])
+        self.assertEqual(list(pattern.freqs), [440, MIDI_FREQS[60], 0, 0, 0])
+        self.assertEqual(list(pattern.duties), [DUTY_MAX, DUTY_MAX // 2, 0, 0, 0])
+        self.assertEqual(pattern.duration_ms, 150)
+
+    def test_magnitude_to_duty_clamps(self):
+        """Test that magnitudes outside 0-1 are clamped."""
+        self.assertEqual(magnitude_to_duty(2.0), DUTY_MAX)
+        self.assertEqual(magnitude_to_duty(-1.0), 0)
+
+
+class TestSynth(unittest.TestCase):
+    """Test cases for multi-output playback."""
+
+    def test_channels_map_to_outputs(self):
+        """Test that each channel plays on its own output at its own time."""
+        log = []
+        pwms = [recording_pwm(log, 0), recording_pwm(log, 1)]
+        events = [NoteEvent(0, 69, 1.0, 0), NoteEvent(30, 81, 0.25, 1)]
+
+        start = ticks_ms()
+        asyncio.run(Synth(pwms).play(compile_pattern(events, last_ms=20), start))
+
+        self.assertEqual([(out, f) for out, f, _ in log], [(0, 440), (1, 880)])
+        self.assertAlmostEqual(log[1][2] - start, 30, delta=10)
+        pwms[1].duty_u16.assert_any_call(DUTY_MAX // 4)
+        for pwm in pwms:
+            pwm.duty_u16.assert_called_with(0)
+
+    def test_shared_output_is_multiplexed(self):
+        """Test that two channels on one output alternate every mux_ms."""
+        log = []
+        pwm = recording_pwm(log, 0)
+        events = [NoteEvent(0, 69, 1.0, 0), NoteEvent(0, 81, 1.0, 1)]
+
+        asyncio.run(Synth([pwm], mux_ms=10).play(compile_pattern(events, last_ms=60)))
+
+        freqs = [f for _, f, _ in log]
+        self.assertGreaterEqual(len(freqs), 5)
+        self.assertEqual(set(freqs), {440, 880})
+        self.assertTrue(all(a != b for a, b in zip(freqs, freqs[1:])))
+
+    def test_play_saved_pattern(self):
+        """Test playing a pattern straight from a PatternStore."""
+        log = []
+        pwm = recording_pwm(log, 0)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PatternStore(tmp, fmt="bin")
+            store.save("riff", {}, [NoteEvent(0, 69, 1.0), NoteEvent(10, 71, 1.0)])
+            asyncio.run(Synth([pwm]).play_pattern(store, "riff", last_ms=10))
+        self.assertEqual([f for _, f, _ in log], [440, MIDI_FREQS[71]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.metrics.histogram import Histogram, bucket_percentile
+
+
+class TestHistogram(unittest.TestCase):
+    """Test cases for the power-of-two latency histogram."""
+
+    def test_buckets(self):
+        """Test that values land in the bucket of their bit length."""
+        h = Histogram(buckets=8)
+        for us in (0, 1, 2, 3, 4, 100, 10 ** 6, -5):
+            h.record(us)
+        # 0 and -5 -> 0; 1 -> 1; 2, 3 -> 2; 4 -> 3; 100 -> 7; 10**6 clamps into the last
+        self.assertEqual(list(h.counts), [2, 1, 2, 1, 0, 0, 0, 2])
+        self.assertEqual(h.count, 8)
+        self.assertEqual(h.max, 10 ** 6)
+
+    def test_percentiles(self):
+        """Test percentiles are the upper bound of the bucket, capped at max."""
+        h = Histogram()
+        for _ in range(98):
+            h.record(300)       # bucket [256, 512)
+        h.record(5000)
+        h.record(6000)
+        self.assertEqual(h.percentile(0.5), 512)
+        self.assertEqual(h.percentile(0.99), 6000)
+        self.assertEqual(h.to_dict()["p99"], 6000)
+        self.assertEqual(Histogram().percentile(0.5), 0)
+
+    def test_reset(self):
+        """Test that reset() clears counts in place."""
+        h = Histogram()
+        counts = h.counts
+        h.record(10)
+        h.reset()
+        self.assertIs(h.counts, counts)
+        self.assertEqual((sum(h.counts), h.count, h.max), (0, 0, 0))
+
+    def test_bucket_percentile_on_merged_counts(self):
+        """Test the percentile helper on plain bucket lists."""
+        self.assertEqual(bucket_percentile([0, 0, 5, 5], 10, 0.5, 7), 4)
+        self.assertEqual(bucket_percentile([0, 0, 5, 5], 10, 0.9, 7), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
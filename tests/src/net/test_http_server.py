@@ -0,0 +1,155 @@
+import sys
+import os
+import json
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.net.http_server import HttpServer, MAX_BODY, MAX_LINE
+
+
+def handle_echo(body):
+    return 200, {"echo": body["value"]}
+
+
+async def _read_response(reader):
+    """Reads one response; returns (status, headers, parsed JSON body)."""
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers["content-length"]))
+    return status, headers, json.loads(body)
+
+
+def _request(method, path, body=None, close=False):
+    data = json.dumps(body).encode() if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: pico\r\nContent-Length: {len(data)}\r\n"
+    if close:
+        head += "Connection: close\r\n"
+    return (head + "\r\n").encode() + data
+
+
+class TestHttpServer(unittest.TestCase):
+    """Test cases for the asyncio device HTTP server."""
+
+    def run_with_server(self, client, routes=None, streams=None):
+        routes = routes or {
+            ("GET", "/health"): lambda body: (200, {"status": "ok"}),
+            ("POST", "/echo"): handle_echo,
+        }
+
+        async def run():
+            server = await HttpServer(routes, streams).start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                try:
+                    return await client(reader, writer)
+                finally:
+                    writer.close()
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        return asyncio.run(run())
+
+    def test_keep_alive_serves_several_requests(self):
+        """Test that one connection carries several requests."""
+        async def client(reader, writer):
+            results = []
+            for value in (1, 2, 3):
+                writer.write(_request("POST", "/echo", {"value": value}))
+                results.append(await _read_response(reader))
+            return results
+
+        results = self.run_with_server(client)
+        self.assertEqual([r[2]["echo"] for r in results], [1, 2, 3])
+        self.assertTrue(all(r[1]["connection"] == "keep-alive" for r in results))
+
+    def test_connection_close(self):
+        """Test that Connection: close is honoured after the response."""
+        async def client(reader, writer):
+            writer.write(_request("GET", "/health", close=True))
+            response = await _read_response(reader)
+            return response, await reader.read()
+
+        (status, headers, body), rest = self.run_with_server(client)
+        self.assertEqual((status, body), (200, {"status": "ok"}))
+        self.assertEqual(headers["connection"], "close")
+        self.assertEqual(rest, b"")
+
+    def test_errors(self):
+        """Test the status codes for unknown paths, wrong methods and bad bodies."""
+        cases = [
+            (_request("GET", "/nope"), 404),
+            (_request("GET", "/echo"), 405),
+            (_request("POST", "/echo", {"other": 1}), 400),
+            (b"POST /echo HTTP/1.1\r\nContent-Length: 3\r\n\r\n{x}", 400),
+            (f"POST /echo HTTP/1.1\r\nContent-Length: {MAX_BODY + 1}\r\n\r\n".encode(), 413),
+            (b"GARBAGE\r\n\r\n", 400),
+            (b"POST /echo HTTP/1.1\r\nContent-Length: ten\r\n\r\n", 400),
+            (b"POST /echo HTTP/1.1\r\nContent-Length: -1\r\n\r\n", 400),
+            (b"GET /health HTTP/1.1\r\nX-Long: " + b"a" * (MAX_LINE + 1) + b"\r\n\r\n", 431),
+        ]
+        for raw, expected in cases:
+            async def client(reader, writer, raw=raw):
+                writer.write(raw)
+                return await _read_response(reader)
+
+            with self.subTest(expected=expected):
+                self.assertEqual(self.run_with_server(client)[0], expected)
+
+    def test_unterminated_line_is_refused_at_the_cap(self):
+        """Test that a header that never ends is answered without waiting for a newline."""
+        async def client(reader, writer):
+            writer.write(b"GET /health HTTP/1.1\r\nX-Flood: " + b"a" * (4 * MAX_LINE))
+            return await asyncio.wait_for(_read_response(reader), 2)
+
+        self.assertEqual(self.run_with_server(client)[0], 431)
+
+    def test_body_after_headers_in_one_packet(self):
+        """Test that bytes read ahead with the headers are kept for the body."""
+        async def client(reader, writer):
+            writer.write(_request("POST", "/echo", {"value": 1}) +
+                         _request("POST", "/echo", {"value": 2}))
+            return [await _read_response(reader) for _ in range(2)]
+
+        results = self.run_with_server(client)
+        self.assertEqual([r[2]["echo"] for r in results], [1, 2])
+
+    def test_handler_exception_is_500(self):
+        """Test that a failing handler answers 500 instead of killing the server."""
+        def broken(body):
+            raise RuntimeError("boom")
+
+        async def client(reader, writer):
+            writer.write(_request("GET", "/broken"))
+            return await _read_response(reader)
+
+        self.assertEqual(self.run_with_server(client, {("GET", "/broken"): broken})[0], 500)
+
+    def test_stream_route_gets_writer(self):
+        """Test that stream routes take over the connection."""
+        async def stream(writer):
+            writer.write(b"HTTP/1.1 200 OK\r\n\r\ndata: 1\n\n")
+            await writer.drain()
+
+        async def client(reader, writer):
+            writer.write(_request("GET", "/events"))
+            return await reader.read()
+
+        out = self.run_with_server(client, {}, {("GET", "/events"): stream})
+        self.assertTrue(out.endswith(b"data: 1\n\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
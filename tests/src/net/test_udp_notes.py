@@ -0,0 +1,200 @@
+import sys
+import os
+import asyncio
+import socket
+import time
+import unittest
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.net.udp_notes import (NoteListener, NoteSender, SeqTracker, pack_command,
+                               unpack_command, CMD_NOTE, CMD_STOP, PACKET_SIZE, SEQ_MOD)
+
+
+def _command(seq, session=7):
+    return unpack_command(pack_command(CMD_NOTE, session, seq, 0, 440, 100, 32768))
+
+
+def _wait_for(listener, n, timeout=1.0):
+    """Polls listener until n datagrams have been read (loopback is not instant)."""
+    read = 0
+    deadline = time.monotonic() + timeout
+    while read < n and time.monotonic() < deadline:
+        read += listener.poll()
+        time.sleep(0.001)
+    return read
+
+
+class TestPacket(unittest.TestCase):
+    """Test cases for the note command wire format."""
+
+    def test_round_trip(self):
+        """Test that every field survives packing, including a 64-bit start time."""
+        data = pack_command(CMD_NOTE, 513, 42, 1700000000123, 523, 400, 16384)
+        self.assertEqual(len(data), PACKET_SIZE)
+        command = unpack_command(data)
+        self.assertEqual((command.cmd, command.session, command.seq, command.start_at_ms,
+                          command.freq, command.ms, command.duty_u16),
+                         (CMD_NOTE, 513, 42, 1700000000123, 523, 400, 16384))
+
+    def test_foreign_datagrams_rejected(self):
+        """Test that wrong sizes and wrong magic are not mistaken for notes."""
+        data = pack_command(CMD_STOP, 1, 1)
+        self.assertIsNone(unpack_command(data[:-1]))
+        self.assertIsNone(unpack_command(b"XX" + data[2:]))
+
+
+class TestSeqTracker(unittest.TestCase):
+    """Test cases for sequence-number loss detection."""
+
+    def test_gap_counts_lost_packets(self):
+        """Test that skipped sequence numbers are counted as lost."""
+        tracker = SeqTracker()
+        for seq in (1, 2, 5, 6):
+            self.assertTrue(tracker.accept(_command(seq)))
+        self.assertEqual(tracker.stats(),
+                         {"received": 4, "lost": 2, "stale": 0, "invalid": 0})
+
+    def test_duplicate_and_late_packets_dropped(self):
+        """Test that a repeated or reordered packet is refused, not played late."""
+        tracker = SeqTracker()
+        tracker.accept(_command(10))
+        self.assertFalse(tracker.accept(_command(10)))
+        self.assertFalse(tracker.accept(_command(9)))
+        self.assertEqual(tracker.stale, 2)
+
+    def test_sequence_wraps(self):
+        """Test that the 32-bit sequence wrapping around is not a gap."""
+        tracker = SeqTracker()
+        tracker.accept(_command(SEQ_MOD - 1))
+        self.assertTrue(tracker.accept(_command(0)))
+        self.assertEqual(tracker.lost, 0)
+
+    def test_new_session_restarts_count(self):
+        """Test that a restarted conductor (new session) is not treated as stale."""
+        tracker = SeqTracker()
+        tracker.accept(_command(500, session=1))
+        self.assertTrue(tracker.accept(_command(1, session=2)))
+        self.assertEqual((tracker.lost, tracker.stale), (0, 0))
+
+
+class TestLoopback(unittest.TestCase):
+    """Test cases for sending and receiving on the loopback interface."""
+
+    def setUp(self):
+        self.received = []
+        self.listener = NoteListener(self.received.append).bind("127.0.0.1", 0, group=None)
+        self.sender = NoteSender("127.0.0.1", self.listener.port, session=3)
+
+    def tearDown(self):
+        self.sender.close()
+        self.listener.close()
+
+    def test_notes_delivered_in_order(self):
+        """Test that notes and stop commands arrive with their fields intact."""
+        self.sender.note(440, 100, start_at_ms=123456)
+        self.sender.note(523.25, 200)
+        self.sender.stop()
+        self.assertEqual(_wait_for(self.listener, 3), 3)
+        self.assertEqual([(c.cmd, c.seq, c.freq, c.start_at_ms) for c in self.received],
+                         [(CMD_NOTE, 1, 440, 123456), (CMD_NOTE, 2, 523, 0),
+                          (CMD_STOP, 3, 0, 0)])
+
+    def test_loss_detected(self):
+        """Test that a note the listener never saw shows up as lost."""
+        self.sender.note(440, 100)
+        self.sender.seq += 1        # as if the next datagram were dropped on the way
+        self.sender.note(523, 100)
+        _wait_for(self.listener, 2)
+        self.assertEqual(len(self.received), 2)
+        self.assertEqual(self.listener.tracker.lost, 1)
+
+    def test_garbage_counted_invalid(self):
+        """Test that stray datagrams on the port are counted and ignored."""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b"hello", ("127.0.0.1", self.listener.port))
+        _wait_for(self.listener, 1)
+        self.assertEqual(self.received, [])
+        self.assertEqual(self.listener.tracker.invalid, 1)
+
+    def test_serve_in_event_loop(self):
+        """Test that serve() picks notes up without blocking the asyncio loop."""
+        async def scenario():
+            task = asyncio.create_task(self.listener.serve())
+            ticks = 0
+            self.sender.note(440, 100)
+            while not self.received and ticks < 200:
+                await asyncio.sleep(0.005)
+                ticks += 1
+            task.cancel()
+            return ticks
+
+        self.assertLess(asyncio.run(scenario()), 200)
+        self.assertEqual(self.received[0].freq, 440)
+
+    def test_serve_yields_under_a_flood(self):
+        """Test that a socket that always has packets waiting does not starve other tasks."""
+        ticks = []
+        polls = []      # how many ticks had run at each poll
+
+        def flood():
+            polls.append(len(ticks))
+            return 1 if len(polls) < 20 else 0
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0)
+
+        async def scenario():
+            self.listener.poll = flood
+            task = asyncio.create_task(self.listener.serve())
+            asyncio.create_task(ticker())
+            await asyncio.sleep(0.02)
+            task.cancel()
+
+        asyncio.run(scenario())
+        self.assertGreater(polls[5], 0)
+
+    def test_send_cost_independent_of_listeners(self):
+        """Test that one note reaches several listeners on one multicast datagram."""
+        group = "239.255.42.99"
+        listeners = []
+        try:
+            for _ in range(3):
+                listener = NoteListener(self.received.append)
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if hasattr(socket, "SO_REUSEPORT"):
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                sock.bind(("", 0 if not listeners else listeners[0].port))
+                mreq = socket.inet_aton(group) + socket.inet_aton("127.0.0.1")
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+                sock.setblocking(False)
+                listener.sock = sock
+                listeners.append(listener)
+            sender = NoteSender(group, listeners[0].port)
+            sender.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                   socket.inet_aton("127.0.0.1"))
+            sender.note(440, 100)
+            sender.close()
+        except OSError as e:
+            for listener in listeners:
+                listener.close()
+            self.skipTest(f"no multicast on loopback here: {e}")
+        try:
+            for listener in listeners:
+                _wait_for(listener, 1, timeout=0.5)
+        finally:
+            for listener in listeners:
+                listener.close()
+        if not self.received:
+            self.skipTest("multicast not routed on loopback here")
+        self.assertEqual(len(self.received), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
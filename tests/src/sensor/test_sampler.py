@@ -0,0 +1,57 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.sensor.sampler import Sampler, FILTER_MEDIAN
+
+
+class TestSampler(unittest.TestCase):
+    """Test cases for the ring-buffer sampler."""
+
+    def test_reads_adc(self):
+        """Test that sample() stores what the ADC returns."""
+        adc = MagicMock()
+        adc.read_u16.side_effect = [100, 200, 300]
+        sampler = Sampler(adc, size=8, window=2)
+        for _ in range(3):
+            sampler.sample()
+        self.assertEqual(sampler.latest(), 300)
+        self.assertEqual(sampler.history(), [100, 200, 300])
+
+    def test_empty_sampler_primes_itself(self):
+        """Test that asking for a value before any sample reads the ADC once."""
+        adc = MagicMock()
+        adc.read_u16.return_value = 1234
+        sampler = Sampler(adc)
+        self.assertEqual(sampler.filtered(), 1234)
+        self.assertEqual(sampler.count, 1)
+
+    def test_moving_average_wraps(self):
+        """Test the running-sum average across ring buffer wrap-around."""
+        sampler = Sampler(MagicMock(), size=5, window=3)
+        for raw in range(1, 13):
+            sampler.push(raw * 10)
+            expected = sum(sampler.history(3)) // min(raw, 3)
+            self.assertEqual(sampler.mean(), expected)
+        self.assertEqual(sampler.history(), [80, 90, 100, 110, 120])
+
+    def test_median_rejects_spikes(self):
+        """Test that the median filter ignores a single outlier."""
+        sampler = Sampler(MagicMock(), size=16, window=5, filter_mode=FILTER_MEDIAN)
+        for raw in (1000, 1010, 65535, 990, 1005):
+            sampler.push(raw)
+        self.assertEqual(sampler.filtered(), 1005)
+        self.assertLess(sampler.filtered(), sampler.mean())
+
+    def test_window_must_fit(self):
+        """Test that the filter window cannot exceed the buffer."""
+        with self.assertRaises(ValueError):
+            Sampler(MagicMock(), size=4, window=8)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.sensor.triggers import TriggerRule, TriggerEngine, EDGE_FALLING, EDGE_RISING
+
+
+class TestTriggerEngine(unittest.TestCase):
+    """Test cases for the table-driven trigger engine."""
+
+    def test_one_shot_with_hysteresis(self):
+        """Test the bright-peak behaviour: fire on entry, re-arm only once clearly dimmer."""
+        engine = TriggerEngine([TriggerRule("wii", "wii", threshold=2200, rearm=6000)])
+        fired = [engine.update(adc) is not None
+                 for adc in (9000, 2100, 2000, 3000, 2100, 7000, 2100)]
+        # fires at the first entry, not again until the reading passed 6000
+        self.assertEqual(fired, [False, True, False, False, False, False, True])
+
+    def test_no_fire_or_rearm_while_busy(self):
+        """Test that nothing fires or re-arms while a pattern is playing."""
+        rule = TriggerRule("wii", "wii", threshold=2200, rearm=6000)
+        engine = TriggerEngine([rule])
+        self.assertIsNotNone(engine.update(2000))
+        engine.update(9000, busy=True)
+        self.assertFalse(rule.armed)
+        engine.update(9000)
+        self.assertTrue(rule.armed)
+
+        # entering the bin while busy does not fire later on: it needs a fresh edge
+        self.assertIsNone(engine.update(2000, busy=True))
+        self.assertIsNone(engine.update(2000))
+
+    def test_rising_edge(self):
+        """Test a darkness gesture."""
+        engine = TriggerEngine([TriggerRule("dark", "low", threshold=50000, rearm=30000,
+                                            edge=EDGE_RISING)])
+        fired = [engine.update(adc) for adc in (10000, 55000, 40000, 20000, 52000)]
+        self.assertEqual([r.name if r else None for r in fired],
+                         [None, "dark", None, None, "dark"])
+
+    def test_first_matching_rule_wins(self):
+        """Test that one sample starts at most one pattern."""
+        bright = TriggerRule("bright", "a", threshold=3000, rearm=6000, edge=EDGE_FALLING)
+        brighter = TriggerRule("brighter", "b", threshold=2000, rearm=6000, edge=EDGE_FALLING)
+        engine = TriggerEngine([brighter, bright])
+
+        self.assertIs(engine.update(1500), brighter)
+        self.assertTrue(bright.armed)
+        self.assertIsNone(engine.update(1500))   # no new edge for bright
+
+    def test_rearm_must_be_past_threshold(self):
+        """Test that a rule without hysteresis is rejected."""
+        with self.assertRaises(ValueError):
+            TriggerRule("bad", "x", threshold=5000, rearm=4000, edge=EDGE_FALLING)
+
+if __name__ == '__main__':
+    unittest.main()
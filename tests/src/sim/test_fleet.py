@@ -0,0 +1,141 @@
+import sys
+import os
+import io
+import json
+import subprocess
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock, patch
+
+import requests
+
+sys.modules['machine'] = MagicMock()
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..', '..')
+sys.path.insert(0, ROOT)
+
+from src import conductor, dashboard
+from src.sim import bench
+from src.sim.fleet import SimDevice, SimFleet
+
+
+class TestSimFleet(unittest.TestCase):
+    """Test cases for the simulated device fleet."""
+
+    def test_device_speaks_the_api(self):
+        """Test the contract endpoints on one simulated device."""
+        with SimFleet(1) as fleet:
+            base = f"http://{fleet.ips[0]}"
+            health = requests.get(base + "/health", timeout=1).json()
+            sensor = requests.get(base + "/sensor", timeout=1).json()
+            tone = requests.post(base + "/tone", json={"freq": 440, "ms": 100}, timeout=1)
+            missing = requests.get(base + "/nope", timeout=1)
+        self.assertEqual(health["status"], "ok")
+        self.assertTrue(0.0 <= sensor["norm"] <= 1.0)
+        self.assertEqual(tone.status_code, 202)
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(len(fleet.devices[0].onsets), 1)
+
+    def test_latency_is_applied(self):
+        """Test that requests are held for the configured latency."""
+        device = SimDevice(latency_ms=50).start()
+        try:
+            start = time.perf_counter()
+            requests.get(f"http://{device.address}/health", timeout=1)
+            elapsed = time.perf_counter() - start
+        finally:
+            device.stop()
+        self.assertGreaterEqual(elapsed, 0.05)
+
+    def test_lost_requests_never_play(self):
+        """Test that a fully lossy device drops the conductor's notes."""
+        with SimFleet(3, loss=1.0) as fleet:
+            latencies = conductor.fan_out("/tone", {"freq": 440, "ms": 50}, ips=fleet.ips)
+        self.assertTrue(all(t is None for t in latencies.values()))
+        self.assertEqual(fleet.onsets(), [None, None, None])
+        self.assertEqual(sum(d.dropped for d in fleet.devices), 3)
+
+    def test_dashboard_polls_fleet(self):
+        """Test that the dashboard sees every simulated device in one /status each."""
+        with SimFleet(4) as fleet:
+            statuses = dashboard.poll_all(fleet.ips)
+        self.assertEqual([s["status"] for s in statuses], ["ok"] * 4)
+        self.assertTrue(all(d.requests == 1 for d in fleet.devices))
+
+    def test_dashboard_finds_slow_boards(self):
+        """Test that /metrics from the fleet aggregates and ranks the slowest device."""
+        with SimFleet(3) as fleet:
+            fleet.devices[1].latency_ms = 30
+            for _ in range(3):
+                dashboard.poll_all(fleet.ips)
+            per_device = dashboard.poll_metrics(fleet.ips + ["127.0.0.1:9"])
+        fleet_metrics = dashboard.aggregate_metrics(per_device)
+        self.assertIsNone(per_device["127.0.0.1:9"])
+        self.assertEqual(fleet_metrics["handler_us"]["count"], 12)
+        slowest = dashboard.slowest_devices(per_device, key="handler_us", n=1)
+        self.assertEqual(slowest[0][0], fleet.ips[1])
+        self.assertGreaterEqual(slowest[0][1], 30000)
+
+    def test_metrics_dashboard_shows_fleet_and_slow_boards(self):
+        """Test the dashboard's metrics mode against a fleet with one board down."""
+        out = io.StringIO()
+        with SimFleet(2) as fleet, redirect_stdout(out):
+            dashboard.run_metrics_dashboard(fleet.ips + ["127.0.0.1:9"], rounds=1)
+        text = out.getvalue()
+        for key in dashboard.METRIC_KEYS:
+            self.assertIn(key, text)
+        self.assertIn("Slowest tick p99", text)
+        self.assertIn("Reporting: 2/3 (no /metrics: 127.0.0.1:9)", text)
+
+    def test_dashboard_reuses_one_connection_per_device(self):
+        """Test that repeated refreshes poll each device over a single kept-alive socket."""
+        with SimFleet(8) as fleet:
+            for _ in range(10):
+                dashboard.poll_all(fleet.ips)
+            connections = [d.connections for d in fleet.devices]
+        self.assertEqual(connections, [1] * 8)
+
+
+class TestBench(unittest.TestCase):
+    """Test cases for the benchmark suite."""
+
+    def test_summarize(self):
+        """Test the summary statistics."""
+        summary = bench.summarize([4, 1, 3, 2])
+        self.assertEqual((summary["count"], summary["mean"], summary["max"]), (4, 2.5, 4))
+        self.assertEqual(summary["p50"], 2)
+        self.assertEqual(bench.summarize([]), {"count": 0})
+
+    def test_results_are_json(self):
+        """Test a small end-to-end run producing JSON-serialisable results."""
+        with patch("builtins.print"):
+            results = bench.run_all(devices=3, latency_ms=1, jitter_ms=2, notes=2, rounds=2,
+                                    store_events=200)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.json")
+            with open(path, "w") as f:
+                json.dump(results, f)
+            with open(path) as f:
+                loaded = json.load(f)
+        self.assertEqual(loaded["onset_skew_ms"]["count"], 2)
+        self.assertEqual(loaded["onset_skew_ms"]["missed_onsets"], 0)
+        self.assertEqual(loaded["dashboard_refresh_ms"]["offline_results"], 0)
+        self.assertGreater(loaded["store"]["bin"]["load_events_per_s"], 0)
+
+    def test_command_line_runs_without_firmware(self):
+        """Test `python -m src.sim.bench` in a fresh interpreter with no machine module."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.json")
+            proc = subprocess.run(
+                [sys.executable, "-m", "src.sim.bench", "--devices", "2", "--latency-ms", "0",
+                 "--jitter-ms", "0", "--notes", "1", "--rounds", "1", "--store-events", "100",
+                 "--out", path],
+                cwd=ROOT, capture_output=True, text=True, timeout=60)
+            self.assertEqual(proc.returncode, 0, proc.stderr)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["fleet"]["devices"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
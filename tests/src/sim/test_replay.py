@@ -0,0 +1,124 @@
+import sys
+import os
+import asyncio
+import time
+import unittest
+from itertools import groupby
+from unittest.mock import MagicMock, patch
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src import main
+from src.sim.replay import VirtualTimeLoop, replay_trace
+
+RATE = main.SAMPLE_RATE_HZ
+DIM = 20000
+BRIGHT = main.LOW_PEAK_ADC
+
+
+def trace_of(*segments):
+    """[(reading, seconds), ...] -> a trace sampled at SAMPLE_RATE_HZ."""
+    trace = []
+    for reading, seconds in segments:
+        trace.extend([reading] * int(seconds * RATE))
+    return trace
+
+
+class TestVirtualTimeLoop(unittest.TestCase):
+    """Test cases for the virtual-time event loop."""
+
+    def test_sleep_costs_no_wall_time(self):
+        """Test that an hour-long sleep returns at once with the clock advanced."""
+        loop = VirtualTimeLoop()
+        try:
+            start = time.perf_counter()
+            loop.run_until_complete(asyncio.sleep(3600))
+            self.assertLess(time.perf_counter() - start, 1)
+            self.assertAlmostEqual(loop.time(), 3600)
+        finally:
+            loop.close()
+
+
+class TestReplay(unittest.TestCase):
+    """Test cases for replaying ADC traces through the firmware loop."""
+
+    def test_bright_flash_fires_trigger_once(self):
+        """Test that one flash plays the trigger melody, then the scale resumes."""
+        trace = trace_of((DIM, 2), (BRIGHT, 1), (DIM, 12))
+        with patch("builtins.print"):
+            result = replay_trace(trace)
+
+        self.assertEqual([name for _, name in result.triggers], ["wii"])
+        fired_ms = result.triggers[0][0]
+        self.assertAlmostEqual(fired_ms, 2000, delta=100)
+
+        melody = main.melody_to_notes(main.WII_MELODY)
+        melody_ms = sum(ms for _, ms in melody)
+        sounding = result.sounding()
+        during = [f for t, f in sounding if fired_ms <= t < fired_ms + melody_ms and f]
+        # repeated notes run together: the buzzer is only rewritten when the pitch changes
+        self.assertEqual(during, [f for f, _ in groupby(f for f, _ in melody)])
+        # the scale plays again once the melody has finished
+        scale = main.lux_to_freq_lut(DIM, main.build_lux_table(main.MIN_LIGHT, main.MAX_LIGHT))
+        self.assertEqual(sounding[-1][1], int(scale))
+        self.assertGreater(sounding[-1][0], fired_ms + melody_ms)
+
+    def test_instrumentation_uses_virtual_time(self):
+        """Test that tick jitter and onset lateness are measured on the virtual clock."""
+        with patch("builtins.print"):
+            result = replay_trace(trace_of((DIM, 2), (BRIGHT, 1), (DIM, 12)))
+        jitter = result.metrics["tick_jitter_us"]
+        onsets = result.metrics["onset_late_us"]
+        self.assertGreater(jitter.count, 200)
+        self.assertGreater(onsets.count, 0)
+        # The virtual loop wakes on time: lateness is rounding, not wall-clock time
+        self.assertLessEqual(jitter.max, 1000)
+        self.assertLessEqual(onsets.max, 1000)
+
+    def test_long_trace_runs_fast(self):
+        """Test that ten minutes of light data replay far faster than real time."""
+        trace = trace_of((DIM, 300), (main.MAX_LIGHT, 300))
+        result = replay_trace(trace)
+        self.assertEqual(result.virtual_s, 600)
+        self.assertGreater(result.speedup, 100)
+        self.assertAlmostEqual(result.adc_reads, 600 * RATE, delta=2)
+        self.assertEqual(result.triggers, [])
+        # 12000 scale ticks at two light levels: only the pitch changes reach the PWM
+        self.assertLessEqual(len(result.writes), 4)
+
+    def test_firmware_crash_is_raised(self):
+        """Test that an exception ending the firmware loop fails the replay."""
+        with patch.object(main, "lux_to_freq_lut", side_effect=RuntimeError("boom")):
+            with self.assertRaisesRegex(RuntimeError, "boom"):
+                replay_trace(trace_of((DIM, 1)))
+        self.assertAlmostEqual(main.ticks_ms(), time.perf_counter() * 1000, delta=50)
+
+    def test_missing_pattern_keeps_loop_running(self):
+        """Test that a rule naming a pattern that is not saved does not end the loop."""
+        rule = main.TriggerRule("missing", "no_such_pattern", threshold=BRIGHT + 200,
+                                rearm=main.REARM_ABOVE)
+        with patch("builtins.print"), patch.object(main, "_pattern_store", None), \
+                patch.object(main, "PATTERN_DIR", "/nonexistent/patterns"):
+            result = replay_trace(trace_of((DIM, 1), (BRIGHT, 1), (main.MAX_LIGHT, 5)),
+                                  rules=[rule])
+        self.assertEqual([name for _, name in result.triggers], ["missing"])
+        self.assertGreater(result.writes[-1][0], 2000)
+
+    def test_firmware_globals_restored(self):
+        """Test that the replay leaves main's sampler, player and clock untouched."""
+        def state():
+            return (main.sampler, main.player, main.ticks_ms, main.ticks_us, main.buzzer_pin,
+                    main.buzzer, main.sample_loop, main.tick_jitter)
+
+        before = state()
+        replay_trace(trace_of((DIM, 1)))
+        after = state()
+        self.assertEqual(before, after)
+        # and the tick clock is back on real time
+        self.assertAlmostEqual(main.ticks_ms(), time.perf_counter() * 1000, delta=50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+import tempfile
+import unittest
+import shutil
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.storage.note_event import NoteEvent, EVENT_SIZE
+from src.storage.journal import RecordingJournal, CHUNK_HEADER_SIZE
+from src.storage.pattern_store import PatternStore
+
+
+class TestRecordingJournal(unittest.TestCase):
+    """Test cases for the append-only recording journal."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "take1.jrn")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _events(self, n, start=0):
+        return [NoteEvent((start + i) * 50, 60 + i % 12, 0.5, i % 2) for i in range(n)]
+
+    def test_chunks_are_written_as_they_fill(self):
+        """Test that full chunks reach the file before close()."""
+        journal = RecordingJournal(self.path, chunk_size=8)
+        for event in self._events(20):
+            journal.append(event)
+
+        self.assertEqual(os.path.getsize(self.path), 2 * (CHUNK_HEADER_SIZE + 8 * EVENT_SIZE))
+        self.assertEqual(len(list(RecordingJournal.iter_events(self.path))), 16)
+
+        journal.close()
+        events = list(RecordingJournal.iter_events(self.path))
+        self.assertEqual([e.timestamp_ms for e in events], [i * 50 for i in range(20)])
+
+    def test_torn_chunk_is_dropped_and_repaired(self):
+        """Test that a half-written chunk loses only itself, and appends continue after it."""
+        with RecordingJournal(self.path, chunk_size=4) as journal:
+            for event in self._events(8):
+                journal.append(event)
+        # Simulate power loss part-way through writing a third chunk
+        with open(self.path, "ab") as f:
+            f.write(b"JC\x04\x00\x00\x00\x00\x00" + b"\x01" * 10)
+        self.assertEqual(len(list(RecordingJournal.iter_events(self.path))), 8)
+
+        with RecordingJournal(self.path, chunk_size=4) as journal:
+            for event in self._events(4, start=8):
+                journal.append(event)
+
+        events = list(RecordingJournal.iter_events(self.path))
+        self.assertEqual([e.timestamp_ms for e in events], [i * 50 for i in range(12)])
+
+    def test_corrupted_chunk_stops_reading(self):
+        """Test that a chunk failing its CRC is not trusted."""
+        with RecordingJournal(self.path, chunk_size=4) as journal:
+            for event in self._events(8):
+                journal.append(event)
+        with open(self.path, "r+b") as f:
+            f.seek(CHUNK_HEADER_SIZE * 2 + 4 * EVENT_SIZE + 1)
+            f.write(b"\xff")
+
+        self.assertEqual(len(list(RecordingJournal.iter_events(self.path))), 4)
+
+    def test_compact_into_pattern(self):
+        """Test compacting a journal into a regular pattern."""
+        store = PatternStore(os.path.join(self.temp_dir, "patterns"))
+        journal = RecordingJournal(self.path, chunk_size=16)
+        for event in self._events(40):
+            journal.append(event)
+        journal.compact(store, "take1", {"source": "journal"}, remove=True)
+
+        metadata, events = store.load("take1")
+        self.assertEqual(metadata, {"source": "journal"})
+        self.assertEqual(len(events), 40)
+        self.assertEqual(events[-1].timestamp_ms, 39 * 50)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_append_after_compact_remove_raises(self):
+        """Test that a journal compacted away refuses new events instead of losing them."""
+        store = PatternStore(os.path.join(self.temp_dir, "patterns"))
+        with RecordingJournal(self.path, chunk_size=4) as journal:
+            journal.append(NoteEvent(0, 60, 0.5))
+            journal.compact(store, "take1", {}, remove=True)
+            with self.assertRaisesRegex(ValueError, "closed"):
+                journal.append(NoteEvent(50, 62, 0.5))
+        self.assertEqual(len(store.load("take1")[1]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,7 @@ from unittest.mock import MagicMock
 sys.modules['machine'] = MagicMock()
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
-from src.storage.note_event import NoteEvent
+from src.storage.note_event import NoteEvent, EVENT_SIZE, events_to_notes, iter_notes
 
 
 class TestNoteEvent(unittest.TestCase):
@@ -46,5 +46,39 @@ class TestNoteEvent(unittest.TestCase):
         self.assertEqual(event.magnitude, 0.9)
         self.assertEqual(event.channel, 3)
 
+    def test_pack_round_trip(self):
+        """Test packing into and out of the fixed-width binary record."""
+        event = NoteEvent(timestamp_ms=123456, pitch=-5, magnitude=0.25, channel=7)
+        packed = event.pack()
+        self.assertEqual(len(packed), EVENT_SIZE)
+
+        loaded = NoteEvent.unpack_from(b"xx" + packed, 2)
+        self.assertEqual(loaded.to_dict(), event.to_dict())
+
+    def test_pack_keeps_magnitudes_float32_cannot_hold(self):
+        """Test that 0.8 (0.800000011920929 as float32) comes back as 0.8."""
+        for magnitude in (0.8, 0.1, 0.333333, 0.999999):
+            loaded = NoteEvent.unpack_from(NoteEvent(0, 60, magnitude).pack())
+            self.assertEqual(loaded.magnitude, magnitude)
+        # finer than MAGNITUDE_DIGITS: close, not exact
+        loaded = NoteEvent.unpack_from(NoteEvent(0, 60, 1 / 3).pack())
+        self.assertAlmostEqual(loaded.magnitude, 1 / 3, places=6)
+
+    def test_iter_notes_reads_one_event_ahead(self):
+        """Test that each note is yielded as soon as the event after it is read."""
+        read = []
+
+        def events():
+            for event in (NoteEvent(0, 69, 1.0), NoteEvent(250, 60, 0.0),
+                          NoteEvent(300, 81, 0.5)):
+                read.append(event.timestamp_ms)
+                yield event
+
+        notes = iter_notes(events(), last_ms=100)
+        self.assertEqual(next(notes), (440, 250))
+        self.assertEqual(read, [0, 250])
+        self.assertEqual(list(notes), [(0, 50), (880, 100)])
+        self.assertEqual(events_to_notes([]), [])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,66 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+from src.storage.note_event import NoteEvent
+from src.storage.note_event_buffer import NoteEventBuffer
+
+
+class TestNoteEventBuffer(unittest.TestCase):
+    """Test cases for the struct-of-arrays NoteEvent container."""
+
+    def setUp(self):
+        self.events = [NoteEvent(i * 100, 60 + i, 0.5, i % 4) for i in range(10)]
+        self.buf = NoteEventBuffer.from_events(self.events)
+
+    def test_round_trip(self):
+        """Test bulk conversion to and from NoteEvents."""
+        self.assertEqual(len(self.buf), 10)
+        self.assertEqual([e.to_dict() for e in self.buf.to_events()],
+                         [e.to_dict() for e in self.events])
+
+    def test_magnitudes_round_trip(self):
+        """Test that float32 columns give back the magnitudes that were stored."""
+        buf = NoteEventBuffer.from_events([NoteEvent(0, 60, 0.8), NoteEvent(1, 60, 0.3)])
+        self.assertEqual([e.magnitude for e in buf], [0.8, 0.3])
+        self.assertEqual(buf[0].magnitude, 0.8)
+
+    def test_indexing(self):
+        """Test single-event access, including negative indices."""
+        self.assertEqual(self.buf[3].pitch, 63)
+        self.assertEqual(self.buf[-1].timestamp_ms, 900)
+        with self.assertRaises(IndexError):
+            self.buf[10]
+
+    def test_slice_is_a_view(self):
+        """Test that slices share columns with the buffer instead of copying."""
+        view = self.buf[2:6]
+        self.assertEqual(len(view), 4)
+        self.assertEqual([e.pitch for e in view], [62, 63, 64, 65])
+        self.assertIs(view._ts, self.buf._ts)
+
+        nested = view[1:-1]
+        self.assertEqual([e.timestamp_ms for e in nested], [300, 400])
+        self.assertEqual(list(nested.timestamps()), [300, 400])
+
+        with self.assertRaises(TypeError):
+            view.append(0, 60, 1.0)
+        with self.assertRaises(ValueError):
+            self.buf[::2]
+
+    def test_columns(self):
+        """Test zero-copy column access."""
+        self.assertEqual(list(self.buf.channels()), [i % 4 for i in range(10)])
+        self.assertEqual(list(self.buf[8:].magnitudes()), [0.5, 0.5])
+
+    def test_note_event_has_no_dict(self):
+        """Test that NoteEvent is slotted."""
+        self.assertFalse(hasattr(NoteEvent(0, 60, 1.0), "__dict__"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import sys
 import os
+import json
 import tempfile
 import unittest
 import shutil
+import unittest.mock
 from unittest.mock import MagicMock
 
 
@@ -101,5 +103,272 @@ class TestPatternStore(unittest.TestCase):
         self.assertEqual(metadata["version"], 2)
         self.assertEqual(events[0].pitch, 72)
 
+
+class TestPatternStoreIndex(unittest.TestCase):
+    """Test cases for the pattern metadata index."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = PatternStore(self.temp_dir)
+        self.store.save("slow", {"tempo": 80, "device": "pico-1"},
+                        [NoteEvent(0, 60, 1.0), NoteEvent(750, 72, 1.0)])
+        self.store.save("fast", {"tempo": 140, "device": "pico-1"},
+                        [NoteEvent(0, 48, 1.0), NoteEvent(200, 55, 1.0), NoteEvent(400, 50, 1.0)],
+                        fmt="bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_pattern_info(self):
+        """Test the summary fields cached for each pattern."""
+        info = self.store.pattern_info("fast")
+        self.assertEqual(info["metadata"], {"tempo": 140, "device": "pico-1"})
+        self.assertEqual(info["format"], "bin")
+        self.assertEqual(info["events"], 3)
+        self.assertEqual(info["duration_ms"], 400)
+        self.assertEqual((info["pitch_min"], info["pitch_max"]), (48, 55))
+
+    def test_find_patterns(self):
+        """Test filtering by metadata fields and by index predicates."""
+        self.assertEqual(sorted(self.store.find_patterns(device="pico-1")), ["fast", "slow"])
+        self.assertEqual(self.store.find_patterns(tempo=80), ["slow"])
+        self.assertEqual(self.store.find_patterns(tempo=100), [])
+        self.assertEqual(self.store.find_patterns(lambda info: info["duration_ms"] > 500),
+                         ["slow"])
+
+    def test_listing_does_not_open_patterns(self):
+        """Test that listing and searching are answered from the index file alone."""
+        fresh = PatternStore(self.temp_dir)
+        real_open = open
+        opened = []
+
+        def tracking_open(path, *args, **kwargs):
+            opened.append(os.path.basename(path))
+            return real_open(path, *args, **kwargs)
+
+        with unittest.mock.patch("builtins.open", tracking_open):
+            self.assertEqual(sorted(fresh.list_patterns()), ["fast", "slow"])
+            self.assertEqual(fresh.find_patterns(tempo=140), ["fast"])
+        self.assertEqual(set(opened), {"patterns.idx"})
+
+    def test_delete_updates_index(self):
+        """Test that deleting removes the index entry too."""
+        self.store.delete("slow")
+        self.assertEqual(PatternStore(self.temp_dir).list_patterns(), ["fast"])
+
+    def test_two_stores_share_the_index(self):
+        """Test that saves through different stores on one directory are all listed."""
+        a = PatternStore(self.temp_dir)
+        b = PatternStore(self.temp_dir)
+        a.list_patterns()
+        a.save("p1", {}, [NoteEvent(0, 60, 1.0)])
+        b.save("p2", {}, [NoteEvent(0, 62, 1.0)])
+        self.assertEqual(sorted(a.list_patterns()), ["fast", "p1", "p2", "slow"])
+        self.assertEqual(sorted(b.list_patterns()), ["fast", "p1", "p2", "slow"])
+
+    def test_copied_in_pattern_is_indexed(self):
+        """Test that a file copied into the directory by hand is listed and searchable."""
+        self.store.list_patterns()
+        with open(os.path.join(self.temp_dir, "copied.json"), "w") as f:
+            json.dump({"metadata": {"tempo": 99},
+                       "events": [NoteEvent(0, 64, 1.0).to_dict()]}, f)
+        os.remove(os.path.join(self.temp_dir, "slow.json"))
+        self.assertEqual(sorted(self.store.list_patterns()), ["copied", "fast"])
+        self.assertEqual(self.store.find_patterns(tempo=99), ["copied"])
+        self.assertEqual(self.store.pattern_info("copied")["events"], 1)
+
+    def test_missing_index_is_rebuilt(self):
+        """Test that a store without an index file rebuilds it from the patterns."""
+        os.remove(os.path.join(self.temp_dir, "patterns.idx"))
+        fresh = PatternStore(self.temp_dir)
+        self.assertEqual(sorted(fresh.list_patterns()), ["fast", "slow"])
+        self.assertEqual(fresh.pattern_info("slow")["events"], 2)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "patterns.idx")))
+
+
+class TestPatternStoreSafetyAndCache(unittest.TestCase):
+    """Test cases for atomic saves and the LRU load cache."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = PatternStore(self.temp_dir, fmt="bin", cache_events=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _count_opens(self, fn):
+        real_open = open
+        opened = []
+
+        def tracking_open(path, *args, **kwargs):
+            opened.append(os.path.basename(path))
+            return real_open(path, *args, **kwargs)
+
+        with unittest.mock.patch("builtins.open", tracking_open):
+            result = fn()
+        return result, opened
+
+    def test_interrupted_save_keeps_previous_version(self):
+        """Test that a save failing part-way leaves the old pattern loadable."""
+        self.store.save("song", {"version": 1}, [NoteEvent(0, 60, 1.0)])
+
+        def failing_events():
+            yield NoteEvent(0, 72, 1.0)
+            raise RuntimeError("power lost")
+
+        for fmt in ("bin", "json"):
+            with self.assertRaises(RuntimeError):
+                self.store.save("song", {"version": 2}, failing_events(), fmt=fmt)
+            metadata, events = PatternStore(self.temp_dir).load("song")
+            self.assertEqual(metadata, {"version": 1})
+            self.assertEqual(events[0].pitch, 60)
+
+    def test_batched_binary_write(self):
+        """Test binary saves that span several write batches."""
+        events = [NoteEvent(i, i % 100, 0.5) for i in range(150)]
+        self.store.save("long", {}, events)
+        loaded = PatternStore(self.temp_dir, cache_events=0).load("long")[1]
+        self.assertEqual([e.pitch for e in loaded], [e.pitch for e in events])
+
+    def test_repeated_load_reads_flash_once(self):
+        """Test that a cached pattern is served without opening its file."""
+        self.store.save("riff", {"tempo": 100}, [NoteEvent(0, 60, 1.0), NoteEvent(10, 62, 1.0)])
+        self.store.load("riff")
+
+        (metadata, events), opened = self._count_opens(lambda: self.store.load("riff"))
+        self.assertEqual(opened, [])
+        self.assertEqual(len(events), 2)
+        streamed, opened = self._count_opens(lambda: list(self.store.iter_events("riff", 5)))
+        self.assertEqual(opened, [])
+        self.assertEqual([e.pitch for e in streamed], [62])
+
+        # Callers get their own containers
+        metadata["tempo"] = 1
+        events.clear()
+        self.assertEqual(self.store.load("riff")[0], {"tempo": 100})
+        self.assertEqual(len(self.store.load("riff")[1]), 2)
+
+    def test_save_and_delete_invalidate(self):
+        """Test that saving or deleting a pattern drops its cached copy."""
+        self.store.save("riff", {}, [NoteEvent(0, 60, 1.0)])
+        self.store.load("riff")
+        self.store.save("riff", {}, [NoteEvent(0, 64, 1.0)])
+        self.assertEqual(self.store.load("riff")[1][0].pitch, 64)
+
+        self.store.delete("riff")
+        with self.assertRaises(OSError):
+            self.store.load("riff")
+
+    def test_cache_is_bounded(self):
+        """Test least-recently-used eviction once the event budget is exceeded."""
+        for name in ("a", "b", "c"):
+            self.store.save(name, {}, [NoteEvent(i, 60, 1.0) for i in range(4)])
+        self.store.load("a")
+        self.store.load("b")
+        self.store.load("a")          # b is now the least recently used
+        self.store.load("c")          # 12 events > 10: evicts b
+
+        _, opened = self._count_opens(lambda: (self.store.load("a"), self.store.load("c")))
+        self.assertEqual(opened, [])
+        _, opened = self._count_opens(lambda: self.store.load("b"))
+        self.assertEqual(opened, ["b.pat"])
+
+
+class TestPatternStoreBinary(unittest.TestCase):
+    """Test cases for the packed binary pattern format."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = PatternStore(self.temp_dir, fmt="bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_save_and_load_binary(self):
+        """Test a binary round trip, including float32 magnitudes and channels."""
+        metadata = {"name": "Binary", "tempo": 96}
+        events = [NoteEvent(i * 125, 48 + i % 24, 0.1 * (i % 10), i % 4) for i in range(500)]
+
+        self.store.save("packed", metadata, events)
+        loaded_metadata, loaded_events = self.store.load("packed")
+
+        self.assertEqual(loaded_metadata, metadata)
+        self.assertEqual(len(loaded_events), 500)
+        for original, loaded in zip(events, loaded_events):
+            self.assertEqual(loaded.timestamp_ms, original.timestamp_ms)
+            self.assertEqual(loaded.pitch, original.pitch)
+            self.assertAlmostEqual(loaded.magnitude, original.magnitude, places=6)
+            self.assertEqual(loaded.channel, original.channel)
+
+    def test_binary_matches_json_magnitudes(self):
+        """Test that binary and JSON saves load back the same magnitudes."""
+        events = [NoteEvent(0, 60, 0.8), NoteEvent(10, 62, 0.35), NoteEvent(20, 64, 0.07)]
+        self.store.save("bin", {}, events)
+        self.store.save("json", {}, events, fmt="json")
+        fresh = PatternStore(self.temp_dir, cache_events=0)
+        self.assertEqual([e.to_dict() for e in fresh.load("bin")[1]],
+                         [e.to_dict() for e in fresh.load("json")[1]])
+        self.assertEqual([e.magnitude for e in fresh.iter_events("bin")], [0.8, 0.35, 0.07])
+
+    def test_binary_is_smaller_than_json(self):
+        """Test that the packed format is much smaller than JSON."""
+        events = [NoteEvent(i * 125, 60, 0.5) for i in range(1000)]
+        self.store.save("packed", {}, events)
+        self.store.save("verbose", {}, events, fmt="json")
+
+        packed = os.path.getsize(os.path.join(self.temp_dir, "packed.pat"))
+        verbose = os.path.getsize(os.path.join(self.temp_dir, "verbose.json"))
+        self.assertLess(packed * 4, verbose)
+
+    def test_auto_detects_existing_json(self):
+        """Test that JSON patterns still load from a binary store."""
+        PatternStore(self.temp_dir).save("legacy", {"v": 1}, [NoteEvent(0, 60, 1.0)])
+
+        metadata, events = self.store.load("legacy")
+        self.assertEqual(metadata, {"v": 1})
+        self.assertEqual(events[0].pitch, 60)
+
+    def test_resave_switches_format(self):
+        """Test that re-saving in another format leaves a single copy."""
+        PatternStore(self.temp_dir).save("song", {}, [NoteEvent(0, 60, 1.0)])
+        self.store.save("song", {}, [NoteEvent(0, 72, 1.0)])
+
+        self.assertEqual(self.store.list_patterns(), ["song"])
+        self.assertEqual(self.store.load("song")[1][0].pitch, 72)
+        self.store.delete("song")
+        self.assertFalse(self.store.exists("song"))
+
+    def test_iter_events_matches_load(self):
+        """Test streaming a pattern across several chunk boundaries."""
+        events = [NoteEvent(i * 10, 60 + i % 12, 0.5, i % 3) for i in range(200)]
+        self.store.save("stream", {"tempo": 120}, events)
+
+        streamed = list(self.store.iter_events("stream", chunk_size=16))
+        loaded = self.store.load("stream")[1]
+        self.assertEqual([e.to_dict() for e in streamed], [e.to_dict() for e in loaded])
+
+    def test_iter_events_seeks_to_timestamp(self):
+        """Test starting playback part-way through a pattern."""
+        events = [NoteEvent(i * 10, 60, 0.5) for i in range(200)]
+        self.store.save("stream", {}, events)
+
+        streamed = list(self.store.iter_events("stream", start_ms=1005))
+        self.assertEqual(streamed[0].timestamp_ms, 1010)
+        self.assertEqual(len(streamed), 99)
+        self.assertEqual(list(self.store.iter_events("stream", start_ms=5000)), [])
+
+    def test_iter_events_json(self):
+        """Test that JSON patterns can be iterated too."""
+        events = [NoteEvent(i * 10, 60, 0.5) for i in range(20)]
+        self.store.save("legacy", {}, events, fmt="json")
+
+        streamed = list(self.store.iter_events("legacy", start_ms=100))
+        self.assertEqual([e.timestamp_ms for e in streamed], list(range(100, 200, 10)))
+
+    def test_unknown_format(self):
+        """Test that an unknown format name is rejected."""
+        with self.assertRaises(ValueError):
+            PatternStore(self.temp_dir, fmt="xml")
+
 if __name__ == '__main__':
     unittest.main()
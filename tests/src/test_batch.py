@@ -0,0 +1,70 @@
+import sys
+import os
+import random
+import subprocess
+import unittest
+from array import array
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, ROOT)
+
+from src import midi_to_freq, lux_to_freq, C_MAJOR_MIDI
+from src import midi_to_freq_batch, lux_to_freq_batch
+from src import batch
+
+
+class TestBatchFunctions(unittest.TestCase):
+    """Test cases for the batch lux/MIDI mappings."""
+
+    def setUp(self):
+        rng = random.Random(463)
+        self.readings = [rng.randint(1, 65535) for _ in range(5000)]
+
+    def _expected(self, readings, theMin, theMax, use_log):
+        return [lux_to_freq(x, theMin, theMax, use_log) for x in readings]
+
+    def test_lux_batch_matches_scalar(self):
+        """Test that array.array input gives exactly the scalar results."""
+        readings = array("H", self.readings)
+        freqs, midi = lux_to_freq_batch(readings, 2000, 40000)
+
+        self.assertEqual(list(freqs), self._expected(self.readings, 2000, 40000, True))
+        self.assertTrue(all(m in C_MAJOR_MIDI for m in midi))
+        self.assertEqual([midi_to_freq(m) for m in midi], list(freqs))
+
+    def test_lux_batch_linear_and_non_integer(self):
+        """Test the linear scale and readings the step table does not cover."""
+        readings = [0, 1000.5, 2000, 39999.9, 70000, 25000]
+        freqs, _ = lux_to_freq_batch(readings, 1000, 50000, use_log=False)
+        self.assertEqual(list(freqs), self._expected(readings, 1000, 50000, False))
+
+    def test_midi_batch_matches_scalar(self):
+        """Test midi_to_freq_batch against midi_to_freq."""
+        notes = list(range(128)) + [130]
+        self.assertEqual(list(midi_to_freq_batch(notes)), [midi_to_freq(m) for m in notes])
+
+    @unittest.skipIf(batch.np is None, "NumPy not installed")
+    def test_numpy_matches_scalar(self):
+        """Test that ndarray input is vectorised and still exact."""
+        np = batch.np
+        readings = np.array(self.readings + [1500.25], dtype=np.float64)
+        freqs, midi = lux_to_freq_batch(readings, 2000, 40000)
+
+        self.assertIsInstance(freqs, np.ndarray)
+        self.assertEqual(freqs.tolist(), self._expected(readings.tolist(), 2000, 40000, True))
+        self.assertEqual(midi_to_freq_batch(midi).tolist(), freqs.tolist())
+
+    def test_imports_without_firmware(self):
+        """Test that the batch API loads in a fresh interpreter with no machine module."""
+        code = ("import sys, src.batch; "
+                "print(src.batch.midi_to_freq_batch([69]).tolist(), 'src.main' in sys.modules)")
+        proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                              text=True, timeout=60)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.split(), ["[440.0]", "False"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,256 @@
+import sys
+import os
+import json
+import random
+import threading
+import time
+import unittest
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src import conductor
+from src import main
+from src.storage.note_event import NoteEvent
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Minimal device stand-in that records every POST it receives."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.server.received.append((self.path, body))
+        time.sleep(self.server.delay)
+        reply = b'{"playing": true}'
+        self.send_response(202)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def do_GET(self):
+        if self.path != "/time":
+            self.send_error(404)
+            return
+        # Random inbound queueing delay makes the path asymmetric, like a busy network
+        time.sleep(random.random() * self.server.jitter)
+        if self.server.time_replies:
+            reply = self.server.time_replies.pop(0)
+        else:
+            reply = json.dumps(main.handle_time()[1]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in(delay=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.received = []
+    server.delay = delay
+    server.jitter = 0.0
+    server.time_replies = []   # raw /time bodies to send before the real ones
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    return server
+
+
+class TestConductorFanOut(unittest.TestCase):
+    """Test cases for the conductor's concurrent fan-out."""
+
+    def setUp(self):
+        self.servers = [start_stand_in(delay=0.05) for _ in range(8)]
+        self.ips = [f"127.0.0.1:{s.server_address[1]}" for s in self.servers]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def test_fan_out_reaches_every_device(self):
+        """Test that every device receives the payload and reports a latency."""
+        latencies = conductor.fan_out("/tone", {"freq": 440, "ms": 100}, ips=self.ips, timeout=1)
+
+        self.assertEqual(set(latencies), set(self.ips))
+        self.assertTrue(all(t is not None for t in latencies.values()))
+        for server in self.servers:
+            self.assertEqual(server.received, [("/tone", {"freq": 440, "ms": 100})])
+
+    def test_parallel_is_not_serialized(self):
+        """Test that slow devices are contacted concurrently, not one after another."""
+        start = time.perf_counter()
+        conductor.fan_out("/tone", {"freq": 440, "ms": 100}, ips=self.ips, timeout=1)
+        elapsed = time.perf_counter() - start
+
+        # Sequentially this would take at least 8 * 50ms
+        self.assertLess(elapsed, 0.3)
+
+    def test_unreachable_device_reports_none(self):
+        """Test that a device that refuses connections gets a None latency."""
+        server = start_stand_in()
+        dead_ip = f"127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+        latencies = conductor.fan_out("/tone", {}, ips=[dead_ip], timeout=0.5)
+        self.assertIsNone(latencies[dead_ip])
+
+    def test_slow_reply_reports_timed_out(self):
+        """Test that a device replying after the timeout is marked, not timed at it."""
+        slow = start_stand_in(delay=0.3)
+        try:
+            ips = self.ips + [f"127.0.0.1:{slow.server_address[1]}"]
+            latencies = conductor.fan_out("/tone", {"freq": 440}, ips=ips, timeout=0.15)
+        finally:
+            slow.shutdown()
+            slow.server_close()
+        self.assertEqual(latencies[ips[-1]], conductor.TIMED_OUT)
+        self.assertLess(conductor.latency_spread_ms(latencies), 100)
+
+    def test_latency_spread(self):
+        """Test the first-to-last spread calculation."""
+        self.assertAlmostEqual(conductor.latency_spread_ms({"a": 0.010, "b": 0.013}), 3.0)
+        self.assertEqual(conductor.latency_spread_ms({"a": None}), 0.0)
+        self.assertAlmostEqual(conductor.latency_spread_ms(
+            {"a": 0.010, "b": 0.013, "c": conductor.TIMED_OUT}), 3.0)
+
+
+class TestScheduledPlayback(unittest.TestCase):
+    """Test cases for uploading whole songs with a start time."""
+
+    def test_song_to_notes(self):
+        """Test conversion of (freq, ms) tuples to /melody notes."""
+        notes = conductor.song_to_notes([(262, 400), (392, 800)])
+        self.assertEqual(notes, [{"freq": 262, "ms": 400}, {"freq": 392, "ms": 800}])
+
+    def test_pattern_to_notes(self):
+        """Test that note lengths come from timestamps and silent events are rests."""
+        events = [NoteEvent(0, 69, 1.0), NoteEvent(250, 60, 0.0), NoteEvent(400, 81, 0.5)]
+        notes = conductor.pattern_to_notes(events, last_ms=300)
+        self.assertEqual(notes, [
+            {"freq": 440, "ms": 250},
+            {"freq": 0, "ms": 150},
+            {"freq": 880, "ms": 300},
+        ])
+
+    def test_schedule_uploads_once_per_device(self):
+        """Test that scheduling sends a single /melody with a future start time."""
+        server = start_stand_in()
+        try:
+            ip = f"127.0.0.1:{server.server_address[1]}"
+            with unittest.mock.patch.object(conductor, "PICO_IPS", [ip]):
+                before = int(time.time() * 1000)
+                start_at_ms, latencies = conductor.schedule_song_on_all_picos(
+                    conductor.song_to_notes(conductor.SONG), gap_ms=20, lead_ms=500
+                )
+            self.assertIsNotNone(latencies[ip])
+            self.assertGreaterEqual(start_at_ms, before + 500)
+            self.assertEqual(len(server.received), 1)
+            path, body = server.received[0]
+            self.assertEqual(path, "/melody")
+            self.assertEqual(body["start_at_ms"], start_at_ms)
+            self.assertEqual(body["gap_ms"], 20)
+            self.assertEqual(len(body["notes"]), len(conductor.SONG))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestUdpPlayback(unittest.TestCase):
+    """Test cases for sending notes as datagrams."""
+
+    def test_play_note_udp_reaches_firmware_listener(self):
+        """Test that one datagram from the conductor is queued by the device firmware."""
+        listener = main.NoteListener(main.handle_note_command).bind("127.0.0.1", 0, None)
+        sender = conductor.NoteSender("127.0.0.1", listener.port)
+        # Synced, as after sync_clock(): the device's shared clock reads the conductor's
+        main.handle_clock_set({"offset_ms": int(time.time() * 1000) - main.ticks_ms()})
+        try:
+            with unittest.mock.patch.object(conductor, "_note_sender", sender), \
+                    unittest.mock.patch.object(main, "player") as player:
+                seq, start_at_ms = conductor.play_note_udp(440, 300, lead_ms=50)
+                for _ in range(100):
+                    if listener.poll():
+                        break
+                    time.sleep(0.005)
+            self.assertEqual(seq, 1)
+            self.assertGreater(start_at_ms, time.time() * 1000 - 1000)
+            player.enqueue.assert_called_once_with([(440, 300)], start_at_ms=start_at_ms,
+                                                   duty_u16=32768, owner=main.OWNER_REMOTE)
+        finally:
+            main.handle_clock_set({"offset_ms": 0})
+            main._clock_synced = False
+            sender.close()
+            listener.close()
+
+
+class TestClockSync(unittest.TestCase):
+    """Test cases for the NTP-style clock estimator."""
+
+    def test_estimator_prefers_low_rtt_samples(self):
+        """Test that slow, asymmetric samples do not skew the offset."""
+        est = conductor.ClockEstimator(keep_fraction=0.25)
+        # True offset is 1000ms. Fast symmetric samples...
+        for i in range(4):
+            t0 = i * 10.0
+            est.add_sample(t0, t0 - 1000 + 1, t0 - 1000 + 1, t0 + 2)
+        # ...and slow ones with a 40ms inbound queueing delay
+        for i in range(12):
+            t0 = 100 + i * 10.0
+            est.add_sample(t0, t0 - 1000 + 41, t0 - 1000 + 41, t0 + 42)
+
+        self.assertAlmostEqual(est.offset_ms(), 1000, delta=0.01)
+        self.assertAlmostEqual(est.min_rtt_ms(), 2)
+
+    def test_estimator_drift(self):
+        """Test drift estimation from samples spanning several seconds."""
+        est = conductor.ClockEstimator(keep_fraction=1.0)
+        for i in range(10):
+            t0 = i * 1000.0
+            device = t0 - 500 - t0 * 50e-6   # device runs 50ppm slow
+            est.add_sample(t0, device, device, t0)
+
+        self.assertAlmostEqual(est.drift_ppm(), 50, delta=0.1)
+        self.assertAlmostEqual(est.offset_ms(), 500 + 9000 * 50e-6, delta=0.01)
+
+    def test_sync_clock_against_stand_in(self):
+        """Test the full exchange against a local stand-in using the device handler."""
+        server = start_stand_in()
+        server.jitter = 0.01
+        try:
+            ip = f"127.0.0.1:{server.server_address[1]}"
+            est = conductor.sync_clock(ip, samples=16)
+            expected = time.time() * 1000 - main.ticks_ms()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(len(est.samples), 16)
+        self.assertAlmostEqual(est.offset_ms(), expected, delta=5)
+        self.assertEqual(server.received[-1][0], "/clock")
+        self.assertEqual(server.received[-1][1]["offset_ms"], round(est.offset_ms()))
+
+    def test_sync_clock_skips_bad_replies(self):
+        """Test that a non-JSON or incomplete /time reply only loses that sample."""
+        server = start_stand_in()
+        server.time_replies = [b"<html>busy</html>", b'{"t1": 5}']
+        try:
+            with unittest.mock.patch("builtins.print"):
+                est = conductor.sync_clock(f"127.0.0.1:{server.server_address[1]}", samples=6)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(len(est.samples), 4)
+        self.assertEqual(server.received[-1][0], "/clock")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+import sys
+import os
+import asyncio
+import io
+import json
+import re
+import threading
+import time
+import unittest
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+
+sys.modules['machine'] = MagicMock()
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src import dashboard
+from src import main
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Device stand-in serving /health and /sensor, and /status when enabled."""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        time.sleep(self.server.delay)
+        health = {"status": "ok", "device_id": "pico-w-TEST", "api": "1.0.0"}
+        sensor = {"raw": 733, "norm": 0.72, "lux_est": 120.4}
+        if self.path == "/health":
+            reply = health
+        elif self.path == "/sensor":
+            reply = sensor
+        elif self.path == "/status" and self.server.combined:
+            reply = dict(health, **sensor)
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in(combined=True, delay=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.paths = []
+    server.combined = combined
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    return server
+
+
+class TestDashboardPolling(unittest.TestCase):
+    """Test cases for the parallel dashboard poller."""
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def _start(self, **kwargs):
+        server = start_stand_in(**kwargs)
+        self.servers.append(server)
+        return f"127.0.0.1:{server.server_address[1]}"
+
+    def test_combined_status_is_one_request(self):
+        """Test that a device with /status is polled in a single round trip."""
+        ip = self._start(combined=True)
+        status = dashboard.get_device_status(ip)
+
+        self.assertEqual(status["status"], "ok")
+        self.assertEqual(status["device_id"], "pico-w-TEST")
+        self.assertEqual(status["norm"], 0.72)
+        self.assertEqual(self.servers[0].paths, ["/status"])
+
+    def test_falls_back_without_status_endpoint(self):
+        """Test the /health + /sensor fallback, remembered after the first 404."""
+        ip = self._start(combined=False)
+        dashboard.get_device_status(ip)
+        status = dashboard.get_device_status(ip)
+
+        self.assertEqual(status["norm"], 0.72)
+        self.assertEqual(self.servers[0].paths,
+                         ["/status", "/health", "/sensor", "/health", "/sensor"])
+
+    def test_poll_all_is_parallel_and_ordered(self):
+        """Test that refresh time does not grow with the number of slow devices."""
+        ips = [self._start(delay=0.1) for _ in range(20)]
+        dashboard.poll_all(ips)   # warm up connections and worker threads
+
+        start = time.perf_counter()
+        statuses = dashboard.poll_all(ips)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual([s["ip"] for s in statuses], ips)
+        self.assertTrue(all(s["status"] == "ok" for s in statuses))
+        # Sequentially this would take 20 * 100ms
+        self.assertLess(elapsed, 0.6)
+
+    def test_offline_device(self):
+        """Test that an unreachable device is reported offline."""
+        ip = self._start()
+        self.servers.pop().server_close()
+        status = dashboard.get_device_status(ip)
+        self.assertTrue(status["status"].startswith("Offline"))
+
+
+class TestDashboardEvents(unittest.TestCase):
+    """Test cases for multiplexed /events ingestion."""
+
+    def test_streams_from_many_devices(self):
+        """Test that one event loop follows several device streams at once."""
+        adc = MagicMock()
+        adc.read_u16.return_value = main.MIN_LIGHT
+
+        async def device(reader, writer):
+            while (await reader.readline()).strip():
+                pass
+            await main.stream_events(writer, interval_ms=10)
+
+        async def scenario():
+            servers = [await asyncio.start_server(device, "127.0.0.1", 0) for _ in range(3)]
+            ips = [f"127.0.0.1:{s.sockets[0].getsockname()[1]}" for s in servers]
+            received = {ip: [] for ip in ips}
+            done = asyncio.Event()
+
+            def on_event(ip, event):
+                received[ip].append(event)
+                if all(len(events) >= 5 for events in received.values()):
+                    done.set()
+
+            streams = asyncio.ensure_future(dashboard.stream_all(ips, on_event))
+            started = time.perf_counter()
+            await asyncio.wait_for(done.wait(), timeout=2)
+            elapsed = time.perf_counter() - started
+            streams.cancel()
+            for server in servers:
+                server.close()
+            return received, elapsed
+
+        with unittest.mock.patch.object(main, "sampler", main.Sampler(adc)):
+            received, elapsed = asyncio.run(scenario())
+
+        self.assertLess(elapsed, 0.5)
+        for events in received.values():
+            self.assertEqual(events[0]["norm"], 1.0)
+            self.assertIn("ts", events[0])
+
+    def test_reports_stream_errors(self):
+        """Test that a refused connection is reported through on_error."""
+        server = start_stand_in()
+        ip = f"127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+        errors = []
+
+        async def scenario():
+            task = asyncio.ensure_future(
+                dashboard.stream_device(ip, lambda *a: None, lambda ip, e: errors.append(e)))
+            await asyncio.sleep(0.1)
+            task.cancel()
+
+        asyncio.run(scenario())
+        self.assertIsInstance(errors[0], OSError)
+
+
+class TestIncrementalRenderer(unittest.TestCase):
+    """Test cases for the cell-diffing terminal renderer."""
+
+    def _status(self, ip, norm, state="ok"):
+        return {"ip": ip, "device_id": "pico-w-TEST", "status": state, "norm": norm}
+
+    def test_first_frame_draws_everything(self):
+        """Test that the first frame draws the header and every cell."""
+        out = io.StringIO()
+        renderer = dashboard.IncrementalRenderer(out=out)
+        redrawn = renderer.render([self._status("10.0.0.1", 0.5), self._status("10.0.0.2", 0.1)])
+
+        self.assertEqual(redrawn, 10)
+        self.assertIn("Pico Orchestra Dashboard", out.getvalue())
+        self.assertNotIn("\n10.0.0.1", out.getvalue())   # rows are cursor-addressed
+
+    def test_only_changed_cells_are_redrawn(self):
+        """Test that an unchanged device costs nothing and a changed one only its cells."""
+        out = io.StringIO()
+        renderer = dashboard.IncrementalRenderer(out=out, history_len=4)
+        frame = [self._status("10.0.0.1", 0.5), self._status("10.0.0.2", 0.1)]
+        renderer.render(frame)
+
+        out.truncate(0)
+        out.seek(0)
+        self.assertEqual(renderer.render(frame), 0)
+        self.assertEqual(out.getvalue(), "")
+
+        frame[1] = self._status("10.0.0.2", 0.9)
+        self.assertEqual(renderer.render(frame), 2)   # sparkline + value
+        self.assertIn("0.90", out.getvalue())
+        self.assertNotIn("10.0.0.1", out.getvalue())
+
+    def test_shrinking_fleet_clears_rows(self):
+        """Test that rows for devices that disappeared are erased."""
+        out = io.StringIO()
+        renderer = dashboard.IncrementalRenderer(out=out)
+        renderer.render([self._status("10.0.0.1", 0.5), self._status("10.0.0.2", 0.1)])
+        renderer.render([self._status("10.0.0.1", 0.5)])
+        self.assertIn("\x1b[6;1H\x1b[2K", out.getvalue())
+
+    def test_history_grows_per_reading_not_per_frame(self):
+        """Test that redrawing the same reading does not add to the sparkline."""
+        renderer = dashboard.IncrementalRenderer(out=io.StringIO())
+        frame = [self._status("10.0.0.1", 0.5)]
+        for _ in range(5):
+            renderer.render(frame)
+        renderer.render([self._status("10.0.0.1", 0.5)])    # next poll, same level
+        frame[0]["norm"] = 0.7                              # streamed update in place
+        renderer.render(frame)
+        self.assertEqual(list(renderer.history["10.0.0.1"]), [0.5, 0.5, 0.7])
+
+    def test_rows_clipped_to_terminal_height(self):
+        """Test that a fleet taller than the terminal is cut off with a count."""
+        out = io.StringIO()
+        renderer = dashboard.IncrementalRenderer(out=out, lines=10)
+        renderer.render([self._status(f"10.0.0.{i}", 0.5) for i in range(1, 31)])
+        frame = out.getvalue()
+        self.assertIn("10.0.0.4", frame)
+        self.assertNotIn("10.0.0.5", frame)
+        self.assertIn("\x1b[9;1H\x1b[2K... 26 more devices", frame)
+        rows = {int(y) for y in re.findall(r"\x1b\[(\d+);\d+H", frame)}
+        self.assertLessEqual(max(rows), 10)
+
+        # Room for everyone again: the note makes way for the next device
+        renderer.lines = 40
+        out.truncate(0)
+        out.seek(0)
+        renderer.render([self._status(f"10.0.0.{i}", 0.5) for i in range(1, 6)])
+        self.assertIn("\x1b[9;1H\x1b[2K", out.getvalue())
+        self.assertIn("10.0.0.5", out.getvalue())
+
+    def test_sparkline(self):
+        """Test sparkline scaling and padding."""
+        self.assertEqual(dashboard.sparkline([0.0, 1.0], width=4), "  ▁█")
+        self.assertEqual(dashboard.sparkline([0.5] * 6, width=3), "▅▅▅")
+
+if __name__ == '__main__':
+    unittest.main()
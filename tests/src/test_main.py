@@ -1,13 +1,18 @@
 import sys
 import os
+import asyncio
+import tempfile
+import time
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 
 sys.modules['machine'] = MagicMock()
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from src import midi_to_freq, lux_to_freq
+from src import main
+from src.storage.note_event import NoteEvent, events_to_notes
 
 class TestMainFunctions(unittest.TestCase):
     """Test cases for main.py functions."""
@@ -69,5 +74,362 @@ class TestMainFunctions(unittest.TestCase):
         expected_min = midi_to_freq(48)  # Should clamp to min (lowest note)
         self.assertAlmostEqual(freq_above, expected_min, delta=1.0)
 
+
+class TestSensorHandlers(unittest.TestCase):
+    """Test cases for the sampled /sensor endpoints."""
+
+    def test_sensor_reports_latest_raw_and_filtered_norm(self):
+        """Test that raw is the latest sample while norm comes from the filtered value."""
+        sampler = main.Sampler(MagicMock(), size=16, window=4)
+        for raw in (main.MIN_LIGHT, main.MIN_LIGHT, main.MIN_LIGHT, main.MAX_LIGHT):
+            sampler.push(raw)
+        with patch.object(main, "sampler", sampler):
+            _, reading = main.handle_sensor()
+            _, history = main.handle_sensor_history()
+
+        self.assertEqual(reading["raw"], main.MAX_LIGHT)
+        self.assertEqual(reading["norm"], 0.75)
+        self.assertEqual(history["samples"][-1], main.MAX_LIGHT)
+        self.assertEqual(history["rate_hz"], main.SAMPLE_RATE_HZ)
+
+class TestTriggerPatterns(unittest.TestCase):
+    """Test cases for the notes a trigger rule plays."""
+
+    def test_wii_rule_is_in_the_table(self):
+        """Test that the bright-peak Wii trigger is the default rule."""
+        rule = main.TRIGGER_RULES[0]
+        self.assertIs(rule.pattern, main.WII_MELODY)
+        self.assertEqual(rule.threshold, main.LOW_PEAK_ADC + main.PEAK_MARGIN)
+        self.assertEqual(rule.rearm, main.REARM_ABOVE)
+
+    def test_melody_notes_last_at_least_a_beat(self):
+        """Test (MIDI, beats) conversion, keeping the one-beat minimum."""
+        notes = main.melody_to_notes([(69, 0.5), (None, 2)], beat_sec=0.5)
+        self.assertEqual(notes, [(440, 500), (0, 1000)])
+
+    def test_saved_pattern_by_name(self):
+        """Test that a rule can name a PatternStore pattern."""
+        store = MagicMock()
+        store.iter_events.return_value = iter([NoteEvent(0, 81, 1.0)])
+        with patch.object(main, "_pattern_store", store):
+            self.assertEqual(list(main.pattern_notes("gesture")), [(880, 400)])
+        store.iter_events.assert_called_once_with("gesture")
+
+    def test_saved_pattern_streams_from_flash(self):
+        """Test that a saved pattern is read as it plays, not loaded whole up front."""
+        events = [NoteEvent(i * 100, 60 + i % 12, 1.0) for i in range(500)]
+        with tempfile.TemporaryDirectory() as tmp:
+            store = main.PatternStore(tmp, fmt="bin")
+            store.save("long", {}, events)
+            store = main.PatternStore(tmp, fmt="bin")   # fresh: nothing cached
+            with patch.object(main, "_pattern_store", store), \
+                    patch.object(store, "load", side_effect=AssertionError("loaded whole")):
+                notes = main.pattern_notes("long")
+                self.assertNotIsInstance(notes, list)
+                self.assertEqual(list(notes), events_to_notes(events))
+
+    def test_missing_pattern_does_not_raise(self):
+        """Test that a rule naming a pattern that is not saved is skipped and reported."""
+        rule = main.TriggerRule("missing", "no_such_pattern", threshold=100, rearm=200)
+        store = MagicMock()
+        store.iter_events.side_effect = OSError(2, "No such pattern", "no_such_pattern")
+        store.exists.return_value = False
+        with patch.object(main, "_pattern_store", store), \
+                patch.object(main, "player") as player, \
+                patch.object(main, "buzzer") as buzzer:
+            player.busy = False
+            self.assertFalse(main.start_trigger(rule))
+            self.assertEqual(main.missing_trigger_patterns([rule, main.TRIGGER_RULES[0]]),
+                             ["no_such_pattern"])
+        player.enqueue.assert_not_called()
+        buzzer.mute.assert_not_called()
+
+    def test_trigger_mutes_scale_but_not_remote_playback(self):
+        """Test that a trigger only silences the buzzer when the player is idle."""
+        rule = main.TRIGGER_RULES[0]
+        for busy, mutes in ((False, 1), (True, 0)):
+            with patch.object(main, "player") as player, \
+                    patch.object(main, "buzzer") as buzzer:
+                player.busy = busy
+                main.start_trigger(rule)
+            self.assertEqual(buzzer.mute.call_count, mutes)
+            player.enqueue.assert_called_once()
+
+class TestLuxTable(unittest.TestCase):
+    """Test cases for the precomputed lux -> frequency mapping."""
+
+    def _assert_matches(self, theMin, theMax, use_log):
+        table = main.build_lux_table(theMin, theMax, use_log)
+        for x in range(1, main.ADC_MAX + 1):
+            expected = lux_to_freq(x, theMin, theMax, use_log)
+            self.assertEqual(main.lux_to_freq_lut(x, table), expected, f"reading {x}")
+
+    def test_matches_lux_to_freq_log(self):
+        """Test that every 16-bit reading maps exactly as lux_to_freq does (log)."""
+        self._assert_matches(2000, 40000, True)
+
+    def test_matches_lux_to_freq_linear(self):
+        """Test that every 16-bit reading maps exactly as lux_to_freq does (linear)."""
+        self._assert_matches(1000, 50000, False)
+
+    def test_table_is_small(self):
+        """Test that the table holds one entry per scale step."""
+        starts, freqs = main.build_lux_table(2000, 40000)
+        self.assertEqual(len(starts), len(main.C_MAJOR_MIDI))
+        self.assertEqual(starts, sorted(starts))
+        self.assertEqual(main.lux_to_freq_lut(0, (starts, freqs)), freqs[0])
+
+class TestScheduledMelody(unittest.TestCase):
+    """Test cases for clock-scheduled melody playback."""
+
+    def test_notes_start_on_absolute_deadlines(self):
+        """Test that each note starts at its offset from the shared start time."""
+        pwm = MagicMock()
+        onsets = []
+        pwm.freq.side_effect = lambda f: onsets.append((f, main.clock_ms()))
+        notes = [(440, 30), (0, 20), (523, 30)]
+
+        async def scenario():
+            start_at = main.clock_ms() + 40
+            main.handle_melody({"notes": [{"freq": f, "ms": ms} for f, ms in notes],
+                                "gap_ms": 10, "start_at_ms": start_at})
+            await main.player._task
+            return start_at
+
+        main.handle_clock_set({"offset_ms": 0})
+        try:
+            with patch.object(main.player, "output", main.PwmActuator(pwm)):
+                start_at = asyncio.run(scenario())
+        finally:
+            main._clock_synced = False
+
+        self.assertEqual([f for f, _ in onsets], [440, 523])
+        # 440 at +0, rest at +40, 523 at +70 (each note plus a 10ms gap)
+        self.assertAlmostEqual(onsets[0][1] - start_at, 0, delta=15)
+        self.assertAlmostEqual(onsets[1][1] - start_at, 70, delta=15)
+        pwm.duty_u16.assert_called_with(0)
+        self.assertFalse(main.player.busy)
+
+    def test_unsynced_device_refuses_start_time(self):
+        """Test that a start time is refused, not slept on, until the clock is synced."""
+        body = {"notes": [{"freq": 440, "ms": 100}], "start_at_ms": time.time() * 1000 + 500}
+        with patch.object(main, "player") as player:
+            status, reply = main.handle_melody(body)
+        self.assertEqual(status, 409)
+        self.assertIn("error", reply)
+        player.play.assert_not_called()
+
+    def test_start_time_too_far_ahead_refused(self):
+        """Test that a synced device refuses a start more than a minute out."""
+        main.handle_clock_set({"offset_ms": 0})
+        try:
+            with patch.object(main, "player") as player:
+                status, _ = main.handle_melody({"notes": [{"freq": 440, "ms": 100}],
+                                                "start_at_ms": main.clock_ms() + 120000})
+        finally:
+            main._clock_synced = False
+        self.assertEqual(status, 400)
+        player.play.assert_not_called()
+
+    def test_handle_melody_replaces_running_melody(self):
+        """Test that a new /melody cancels the one already playing."""
+        async def scenario():
+            with patch.object(main.player, "output", main.PwmActuator(MagicMock())) as out:
+                pwm = out.pwm
+                status, reply = main.handle_melody({"notes": [{"freq": 440, "ms": 1000}]})
+                first = main.player._task
+                await asyncio.sleep(0.01)
+                main.handle_melody({"notes": [{"freq": 523, "ms": 10}], "gap_ms": 0})
+                await asyncio.sleep(0.05)
+                return status, reply, first, pwm
+
+        status, reply, first, pwm = asyncio.run(scenario())
+        self.assertEqual(status, 202)
+        self.assertEqual(reply, {"queued": 1})
+        self.assertTrue(first.cancelled())
+        pwm.freq.assert_called_with(523)
+
+    def test_enqueue_and_stop(self):
+        """Test that "enqueue" melodies wait their turn and /stop drops them."""
+        async def scenario():
+            with patch.object(main.player, "output", main.PwmActuator(MagicMock())) as out:
+                pwm = out.pwm
+                main.handle_melody({"notes": [{"freq": 440, "ms": 30}]})
+                main.handle_melody({"notes": [{"freq": 523, "ms": 30}], "enqueue": True})
+                await asyncio.sleep(0.01)
+                queued = main.player.queued()
+                main.handle_stop()
+                await asyncio.sleep(0.05)
+                return queued, pwm
+
+        queued, pwm = asyncio.run(scenario())
+        self.assertEqual(queued, 1)
+        pwm.freq.assert_called_once_with(440)
+        self.assertFalse(main.player.busy)
+
+
+class TestUdpNotes(unittest.TestCase):
+    """Test cases for note commands received over UDP."""
+
+    def test_untimed_note_plays_now_and_stop_silences(self):
+        """Test that a note without a start time preempts like /tone."""
+        command = MagicMock(cmd=main.CMD_NOTE, start_at_ms=0, freq=440, ms=100,
+                            duty_u16=16384)
+        with patch.object(main, "player") as player:
+            main.handle_note_command(command)
+            main.handle_note_command(MagicMock(cmd=main.CMD_STOP))
+        player.play.assert_called_once_with([(440, 100)], duty_u16=16384,
+                                            owner=main.OWNER_REMOTE)
+        player.stop.assert_called_once_with()
+
+    def test_timed_notes_queue_and_overflow_is_counted(self):
+        """Test that timed notes queue up and a full queue is reported in /metrics."""
+        command = MagicMock(cmd=main.CMD_NOTE, start_at_ms=5000, freq=440, ms=100,
+                            duty_u16=16384)
+        before = main.note_overflow
+        main.handle_clock_set({"offset_ms": 0})
+        try:
+            with patch.object(main, "player") as player:
+                player.enqueue.return_value = False
+                main.handle_note_command(command)
+        finally:
+            main._clock_synced = False
+        player.enqueue.assert_called_once()
+        self.assertEqual(main.handle_metrics()[1]["udp"]["overflow"], before + 1)
+
+    def test_timed_note_refused_until_clock_synced(self):
+        """Test that an unsynced device drops a timed note instead of queueing it."""
+        command = MagicMock(cmd=main.CMD_NOTE, start_at_ms=int(time.time() * 1000) + 50,
+                            freq=440, ms=100, duty_u16=16384)
+        before = main.note_refused
+        with patch.object(main, "player") as player:
+            main.handle_note_command(command)
+        player.enqueue.assert_not_called()
+        self.assertEqual(main.handle_metrics()[1]["udp"]["refused"], before + 1)
+
+
+class TestClockHandlers(unittest.TestCase):
+    """Test cases for the device side of clock sync."""
+
+    def tearDown(self):
+        main.handle_clock_set({"offset_ms": 0})
+        main._clock_synced = False
+
+    def test_clock_set_moves_shared_clock(self):
+        """Test that the pushed offset is applied to clock_ms()."""
+        status, reply = main.handle_clock_set({"offset_ms": 250000})
+        self.assertEqual(status, 200)
+        self.assertTrue(reply["synced"])
+        self.assertAlmostEqual(main.clock_ms() - main.ticks_ms(), 250000, delta=1)
+        self.assertEqual(main.handle_clock_get()[1]["offset_ms"], 250000)
+
+    def test_time_reports_local_ticks(self):
+        """Test that /time stamps come from the local tick clock."""
+        _, reply = main.handle_time()
+        self.assertLessEqual(reply["t1"], reply["t2"])
+        self.assertAlmostEqual(reply["t2"], main.ticks_ms(), delta=5)
+
+
+class TestStatusHandlers(unittest.TestCase):
+    """Test cases for the /health, /sensor and /status handlers."""
+
+    def test_sensor_fields(self):
+        """Test that bright (low ADC) readings normalise high."""
+        bright = main.sensor_reading(main.MIN_LIGHT)
+        dark = main.sensor_reading(main.MAX_LIGHT)
+        self.assertEqual(bright["norm"], 1.0)
+        self.assertEqual(dark["norm"], 0.0)
+        self.assertGreater(bright["lux_est"], dark["lux_est"])
+        self.assertEqual(bright["raw"], main.MIN_LIGHT)
+
+    def test_status_combines_health_and_sensor(self):
+        """Test that /status carries both sets of fields."""
+        adc = MagicMock()
+        adc.read_u16.return_value = 10000
+        with patch.object(main, "sampler", main.Sampler(adc)):
+            status, reply = main.handle_status()
+        self.assertEqual(status, 200)
+        self.assertEqual(reply["status"], "ok")
+        self.assertEqual(reply["api"], main.API_VERSION)
+        self.assertEqual(reply["raw"], 10000)
+
+
+class TestDeviceService(unittest.TestCase):
+    """Test cases for the device API served over HTTP."""
+
+    def test_tone_returns_at_once_and_sampling_continues(self):
+        """Test that POST /tone answers 202 before the tone ends, without stalling sampling."""
+        adc = MagicMock()
+        adc.read_u16.return_value = 10000
+
+        async def scenario():
+            server = await main.http_server.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            sampler_task = asyncio.create_task(main.sample_loop())
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            body = b'{"freq": 440, "ms": 300}'
+            started = time.time()
+            writer.write(b"POST /tone HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body)
+                         + body)
+            status_line = await reader.readline()
+            elapsed = time.time() - started
+            before = len(main.sampler.history())
+            await asyncio.sleep(0.1)
+            sampled = len(main.sampler.history()) - before
+            writer.close()
+            sampler_task.cancel()
+            main.player.stop()
+            server.close()
+            await server.wait_closed()
+            return status_line, elapsed, sampled
+
+        pwm = MagicMock()
+        with patch.object(main.player, "output", main.PwmActuator(pwm)), \
+                patch.object(main, "sampler", main.Sampler(adc)):
+            status_line, elapsed, sampled = asyncio.run(scenario())
+        self.assertIn(b" 202 ", status_line)
+        self.assertLess(elapsed, 0.2)
+        self.assertGreater(sampled, 5)
+        pwm.freq.assert_called_with(440)
+        pwm.duty_u16.assert_any_call(32768)
+
+    def test_routes_cover_contract(self):
+        """Test that every endpoint in the API contract is routed."""
+        for route in [("GET", "/health"), ("GET", "/sensor"), ("POST", "/tone"),
+                      ("POST", "/melody"), ("GET", "/status"), ("GET", "/time")]:
+            self.assertIn(route, main.ROUTES)
+        self.assertIn(("GET", "/events"), main.STREAMS)
+        self.assertEqual(main.duty_to_u16(0.5), 32768)
+        self.assertEqual(main.duty_to_u16(1.0), 65535)
+
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for the on-device instrumentation."""
+
+    def test_metrics_report_histograms(self):
+        """Test that /metrics carries every histogram and timed handlers are counted."""
+        before = main.handler_time.count
+        main.timed(main.handle_health)()
+        status, reply = main.handle_metrics()
+        self.assertEqual(status, 200)
+        self.assertEqual(main.handler_time.count, before + 1)
+        for key in ("tick_jitter_us", "tick_work_us", "handler_us", "onset_late_us"):
+            self.assertIn("p99", reply[key])
+        self.assertEqual(reply["tick_ms"], main.TICK_MS)
+        self.assertEqual(set(reply["pwm"]), {"writes", "requests"})
+
+    def test_player_records_onset_lateness(self):
+        """Test that every note start is recorded against its deadline."""
+        hist = main.Histogram()
+        player = main.Player(main.PwmActuator(MagicMock()), onset_hist=hist)
+
+        async def scenario():
+            player.play([(440, 10), (0, 10), (523, 10)])
+            await player._task
+
+        asyncio.run(scenario())
+        self.assertEqual(hist.count, 3)
+        self.assertLess(hist.percentile(0.5), 20000)
+
 if __name__ == '__main__':
     unittest.main()